@@ -0,0 +1,46 @@
+"""add analytics rollups
+
+Revision ID: add_analytics_rollups
+Revises: add_statistics_counters
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_analytics_rollups'
+down_revision = 'add_statistics_counters'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Агрегаты по часовым и дневным интервалам
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('bucket', sa.String(), nullable=False),
+        sa.Column('scope', sa.String(), nullable=False),
+        sa.Column('scope_id', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('completions', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('answers', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('correct_answers', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('bucket', 'scope', 'scope_id', 'bucket_start')
+    )
+
+    # Отметки обработанных событий по источникам
+    op.create_table(
+        'analytics_watermarks',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('high_water', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+    )
+
+    # Индекс для выборки новых завершений после отметки
+    # (ix_user_question_progress_answered_at уже создан в recreate_all_tables)
+    op.create_index('ix_user_lesson_progress_completed_at', 'user_lesson_progress', ['completed_at'])
+
+def downgrade():
+    op.drop_index('ix_user_lesson_progress_completed_at', table_name='user_lesson_progress')
+    op.drop_table('analytics_watermarks')
+    op.drop_table('analytics_rollups')
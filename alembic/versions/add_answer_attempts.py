@@ -0,0 +1,73 @@
+"""add answer attempts
+
+Revision ID: add_answer_attempts
+Revises: add_question_stats
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_answer_attempts'
+down_revision = 'add_question_stats'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # История попыток секционируется по времени ответа (партиции следующих месяцев создает приложение,
+        # все остальное попадает в партицию по умолчанию)
+        op.execute("""
+            CREATE TABLE answer_attempts (
+                id BIGSERIAL NOT NULL,
+                user_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                is_correct BOOLEAN NOT NULL,
+                answer JSON,
+                answered_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+                PRIMARY KEY (id, answered_at)
+            ) PARTITION BY RANGE (answered_at)
+        """)
+        op.execute("CREATE TABLE answer_attempts_default PARTITION OF answer_attempts DEFAULT")
+        # Месяцы переносимой истории получают свои партиции до заполнения: иначе строки попадут
+        # в партицию по умолчанию, и CREATE TABLE ... PARTITION OF для этих месяцев будет падать
+        first_answered = bind.execute(sa.text("SELECT min(answered_at) FROM user_question_progress")).scalar()
+        if first_answered is not None:
+            month = date(first_answered.year, first_answered.month, 1)
+            current = datetime.now(timezone.utc).date().replace(day=1)
+            while month <= current:
+                upper = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+                op.execute(
+                    f"CREATE TABLE answer_attempts_y{month.year}m{month.month:02d} PARTITION OF answer_attempts "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                )
+                month = upper
+    else:
+        op.create_table(
+            'answer_attempts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('question_id', sa.Integer(), nullable=False),
+            sa.Column('is_correct', sa.Boolean(), nullable=False),
+            sa.Column('answer', sa.JSON(), nullable=True),
+            sa.Column('answered_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    op.create_index('ix_answer_attempts_user_answered', 'answer_attempts', ['user_id', 'answered_at'])
+    op.create_index('ix_answer_attempts_question_answered', 'answer_attempts', ['question_id', 'answered_at'])
+
+    # История начинается с последних известных ответов
+    op.execute("""
+        INSERT INTO answer_attempts (user_id, question_id, is_correct, answered_at)
+        SELECT user_id, question_id, is_correct, answered_at FROM user_question_progress
+        ORDER BY answered_at
+    """)
+
+def downgrade():
+    op.drop_index('ix_answer_attempts_question_answered', table_name='answer_attempts')
+    op.drop_index('ix_answer_attempts_user_answered', table_name='answer_attempts')
+    op.drop_table('answer_attempts')
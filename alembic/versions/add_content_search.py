@@ -0,0 +1,47 @@
+"""add full-text search indexes for lessons, theory and questions
+
+Revision ID: add_content_search
+Revises: add_theory_size
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_content_search'
+down_revision = 'add_theory_size'
+branch_labels = None
+depends_on = None
+
+# Копия models.SEARCH_INDEXES на момент миграции
+TOKENIZER = "unicode61 remove_diacritics 2"
+INDEXES = (
+    ("lessons_fts", "lessons", ("title",)),
+    ("lesson_blocks_fts", "lesson_blocks", ("theory_text",)),
+    ("questions_fts", "questions", ("text", "general_explanation")),
+)
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for fts_table, content_table, columns in INDEXES:
+        names = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        delete = f"INSERT INTO {fts_table}({fts_table}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+        insert = f"INSERT INTO {fts_table}(rowid, {names}) VALUES (new.id, {new_values});"
+        op.execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5({names}, content='{content_table}', "
+                   f"content_rowid='id', tokenize='{TOKENIZER}')")
+        op.execute(f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {content_table} BEGIN {insert} END")
+        op.execute(f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {content_table} BEGIN {delete} END")
+        op.execute(f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {names} ON {content_table} BEGIN {delete} {insert} END")
+        # Индекс существующего контента строится из таблицы контента
+        op.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for fts_table, _, _ in INDEXES:
+        for suffix in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {fts_table}")
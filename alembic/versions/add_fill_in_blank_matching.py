@@ -0,0 +1,27 @@
+"""add fill in blank matching settings
+
+Revision ID: add_fill_in_blank_matching
+Revises: recreate_all_tables
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_fill_in_blank_matching'
+down_revision = 'recreate_all_tables'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Настройки проверки вопросов с вводом текста
+    op.add_column('questions', sa.Column('accepted_answers', sa.JSON(), nullable=True))
+    op.add_column('questions', sa.Column('answer_max_typos', sa.Integer(), nullable=True))
+    op.add_column('questions', sa.Column('answer_ignore_word_order', sa.Boolean(), nullable=False, server_default='false'))
+
+def downgrade():
+    with op.batch_alter_table('questions') as batch_op:
+        batch_op.drop_column('answer_ignore_word_order')
+        batch_op.drop_column('answer_max_typos')
+        batch_op.drop_column('accepted_answers')
@@ -0,0 +1,24 @@
+"""add keyset pagination indexes
+
+Revision ID: add_keyset_pagination_indexes
+Revises: add_xp_events
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_keyset_pagination_indexes'
+down_revision = 'add_xp_events'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Страницы модулей дисциплины и уроков модуля выбираются по (order, id) после курсора
+    op.create_index('ix_modules_discipline_order_id', 'modules', ['discipline_id', 'order', 'id'])
+    op.create_index('ix_lessons_module_order_id', 'lessons', ['module_id', 'order', 'id'])
+
+def downgrade():
+    op.drop_index('ix_lessons_module_order_id', table_name='lessons')
+    op.drop_index('ix_modules_discipline_order_id', table_name='modules')
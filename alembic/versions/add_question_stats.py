@@ -0,0 +1,40 @@
+"""add question stats
+
+Revision ID: add_question_stats
+Revises: add_analytics_rollups
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_question_stats'
+down_revision = 'add_analytics_rollups'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Показатели трудности вопросов (пересчитываются пакетной задачей)
+    op.create_table(
+        'question_stats',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('lesson_id', sa.Integer(), nullable=False),
+        sa.Column('funnel_position', sa.Integer(), nullable=False),
+        sa.Column('answers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('correct_answers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('learners', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('p_value', sa.Float(), nullable=True),
+        sa.Column('discrimination', sa.Float(), nullable=True),
+        sa.Column('reach_rate', sa.Float(), nullable=True),
+        sa.Column('drop_off_rate', sa.Float(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['lesson_id'], ['lessons.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('question_id')
+    )
+    op.create_index(op.f('ix_question_stats_lesson_id'), 'question_stats', ['lesson_id'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_question_stats_lesson_id'), table_name='question_stats')
+    op.drop_table('question_stats')
@@ -0,0 +1,29 @@
+"""add user resume pointers
+
+Revision ID: add_resume_pointers
+Revises: add_review_schedule
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_resume_pointers'
+down_revision = 'add_review_schedule'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Указатели для уже пройденных уроков строит POST /admin/resume-pointers/rebuild
+    op.create_table(
+        'user_resume_pointers',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('discipline_id', sa.Integer(), sa.ForeignKey('disciplines.id'), primary_key=True),
+        sa.Column('module_id', sa.Integer(), nullable=True),
+        sa.Column('lesson_id', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table('user_resume_pointers')
@@ -0,0 +1,33 @@
+"""add spaced-repetition schedule to user question progress
+
+Revision ID: add_review_schedule
+Revises: add_content_search
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_review_schedule'
+down_revision = 'add_content_search'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('user_question_progress') as batch_op:
+        batch_op.add_column(sa.Column('ease', sa.Float(), server_default='2.5', nullable=False))
+        batch_op.add_column(sa.Column('interval_days', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('repetitions', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('due_at', sa.DateTime(timezone=True), nullable=True))
+    # Уже отвеченные вопросы сразу попадают в очередь: расписание строится с первого повторения
+    op.execute("UPDATE user_question_progress SET due_at = answered_at")
+    op.create_index('ix_user_question_progress_user_due', 'user_question_progress', ['user_id', 'due_at'])
+
+def downgrade():
+    op.drop_index('ix_user_question_progress_user_due', table_name='user_question_progress')
+    with op.batch_alter_table('user_question_progress') as batch_op:
+        batch_op.drop_column('due_at')
+        batch_op.drop_column('repetitions')
+        batch_op.drop_column('interval_days')
+        batch_op.drop_column('ease')
@@ -0,0 +1,47 @@
+"""add statistics counters
+
+Revision ID: add_statistics_counters
+Revises: add_fill_in_blank_matching
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_statistics_counters'
+down_revision = 'add_fill_in_blank_matching'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Накопительные счетчики для панели администратора
+    op.create_table(
+        'stat_counters',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+    # Дневные счетчики событий
+    op.create_table(
+        'stat_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'key')
+    )
+
+    # Уникальные активные ученики по дням
+    op.create_table(
+        'stat_daily_learners',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'user_id')
+    )
+
+def downgrade():
+    op.drop_table('stat_daily_learners')
+    op.drop_table('stat_daily')
+    op.drop_table('stat_counters')
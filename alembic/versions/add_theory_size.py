@@ -0,0 +1,24 @@
+"""add theory size to lesson blocks
+
+Revision ID: add_theory_size
+Revises: add_keyset_pagination_indexes
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_theory_size'
+down_revision = 'add_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Длина теории в байтах UTF-8: по ней длинная теория не встраивается в JSON урока и отдается по Range
+    op.add_column('lesson_blocks', sa.Column('theory_size', sa.Integer(), nullable=True))
+    op.execute("UPDATE lesson_blocks SET theory_size = length(CAST(theory_text AS BLOB)) WHERE theory_text IS NOT NULL")
+
+def downgrade():
+    with op.batch_alter_table('lesson_blocks') as batch_op:
+        batch_op.drop_column('theory_size')
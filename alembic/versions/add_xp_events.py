@@ -0,0 +1,57 @@
+"""add xp events
+
+Revision ID: add_xp_events
+Revises: add_answer_attempts
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_xp_events'
+down_revision = 'add_answer_attempts'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Журнал начислений XP для рейтингов
+    op.create_table(
+        'xp_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('discipline_id', sa.Integer(), nullable=True),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('awarded_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_xp_events_awarded_user', 'xp_events', ['awarded_at', 'user_id'])
+    op.create_index('ix_xp_events_discipline_user', 'xp_events', ['discipline_id', 'user_id'])
+
+    # Восстанавливаем начисления по имеющемуся прогрессу: XP за завершения уроков
+    # (10 за первое, 5 за второе, по 3 за последующие) и по 1 за каждый верный ответ
+    op.execute("""
+        INSERT INTO xp_events (user_id, discipline_id, amount, awarded_at)
+        SELECT p.user_id, m.discipline_id,
+               10 + CASE WHEN p.attempts >= 2 THEN 5 ELSE 0 END
+                  + CASE WHEN p.attempts > 2 THEN 3 * (p.attempts - 2) ELSE 0 END,
+               p.completed_at
+        FROM user_lesson_progress p
+        JOIN lessons l ON l.id = p.lesson_id
+        JOIN modules m ON m.id = l.module_id
+    """)
+    op.execute("""
+        INSERT INTO xp_events (user_id, discipline_id, amount, awarded_at)
+        SELECT a.user_id, m.discipline_id, 1, a.answered_at
+        FROM answer_attempts a
+        JOIN questions q ON q.id = a.question_id
+        JOIN lesson_blocks b ON b.id = q.lesson_block_id
+        JOIN lessons l ON l.id = b.lesson_id
+        JOIN modules m ON m.id = l.module_id
+        WHERE a.is_correct
+    """)
+
+def downgrade():
+    op.drop_index('ix_xp_events_discipline_user', table_name='xp_events')
+    op.drop_index('ix_xp_events_awarded_user', table_name='xp_events')
+    op.drop_table('xp_events')
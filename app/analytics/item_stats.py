@@ -0,0 +1,164 @@
+# app/analytics/item_stats.py
+from typing import Dict
+
+import numpy as np
+
+# --- Векторные расчеты по массивам ответов ---
+# Все функции принимают плоские массивы одинаковой длины (одна позиция - один ответ)
+# с уже сжатыми индексами вопросов/пользователей (0..n-1) и не содержат циклов Python.
+
+# Идентификаторы до этого значения индексируются таблицей подстановки (O(n)) вместо сортировки
+DENSE_ID_LIMIT = 1 << 22
+
+
+def compact_index(ids: np.ndarray) -> tuple:
+    """
+    Переводит произвольные идентификаторы в плотные индексы
+
+    Args:
+        ids: Массив неотрицательных идентификаторов
+
+    Returns:
+        (число индексов, индекс каждого элемента); небольшие идентификаторы (первичные ключи)
+        используются как индексы напрямую, иначе - позиция среди уникальных значений
+    """
+    if len(ids) == 0:
+        return 0, ids.astype(np.int64)
+    max_id = int(ids.max())
+    if max_id <= DENSE_ID_LIMIT:
+        return max_id + 1, ids.astype(np.int64)
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    return len(unique_ids), inverse
+
+
+def position_in(ids: np.ndarray, universe: np.ndarray) -> np.ndarray:
+    """
+    Позиция каждого идентификатора в массиве universe
+
+    Args:
+        ids: Искомые идентификаторы
+        universe: Массив различных неотрицательных идентификаторов
+
+    Returns:
+        Массив позиций (-1, если идентификатора нет в universe)
+    """
+    if len(universe) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    max_id = int(universe.max())
+    if max_id <= DENSE_ID_LIMIT:
+        lookup = np.full(max_id + 1, -1, dtype=np.int64)
+        lookup[universe] = np.arange(len(universe))
+        in_range = ids <= max_id
+        return np.where(in_range, lookup[np.where(in_range, ids, 0)], -1)
+    sorter = np.argsort(universe)
+    found = np.minimum(np.searchsorted(universe, ids, sorter=sorter), len(universe) - 1)
+    return np.where(universe[sorter[found]] == ids, sorter[found], -1)
+
+
+def distinct_pair_counts(group_index: np.ndarray, user_index: np.ndarray, n_groups: int, n_users: int) -> np.ndarray:
+    """
+    Число различных пользователей в каждой группе (вопросе, уроке)
+
+    Args:
+        group_index: Индекс группы для каждого ответа
+        user_index: Индекс пользователя для каждого ответа
+        n_groups: Количество групп
+        n_users: Количество пользователей
+
+    Returns:
+        Массив длины n_groups
+    """
+    pairs = np.unique(group_index.astype(np.int64) * n_users + user_index)
+    return np.bincount(pairs // n_users, minlength=n_groups)
+
+
+def question_statistics(question_index: np.ndarray, user_index: np.ndarray, correct: np.ndarray,
+                        n_questions: int, min_answers: int) -> Dict[str, np.ndarray]:
+    """
+    Трудность (p-value) и дискриминативность (точечно-бисериальная корреляция) вопросов
+
+    Дискриминативность - корреляция правильности ответа на вопрос с долей правильных
+    ответов того же пользователя на остальные вопросы (скорректированная item-rest
+    корреляция). Все суммы по вопросам считаются через np.bincount.
+
+    Args:
+        question_index: Индекс вопроса для каждого ответа
+        user_index: Индекс пользователя для каждого ответа
+        correct: 1/0 (или True/False) для каждого ответа
+        n_questions: Количество вопросов
+        min_answers: Минимум ответов для расчета дискриминативности
+
+    Returns:
+        Словарь массивов длины n_questions: answers, correct_answers, p_value, discrimination
+        (NaN там, где показатель не определен)
+    """
+    correct = correct.astype(np.float64)
+    answers = np.bincount(question_index, minlength=n_questions)
+    correct_answers = np.bincount(question_index, weights=correct, minlength=n_questions)
+
+    user_answers = np.bincount(user_index)
+    user_correct = np.bincount(user_index, weights=correct)
+    rest_count = user_answers[user_index] - 1
+    has_rest = rest_count > 0
+    x = correct[has_rest]
+    y = (user_correct[user_index][has_rest] - x) / rest_count[has_rest]
+    q = question_index[has_rest]
+
+    n = np.bincount(q, minlength=n_questions).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_value = correct_answers / answers
+        mean_x = np.bincount(q, weights=x, minlength=n_questions) / n
+        mean_y = np.bincount(q, weights=y, minlength=n_questions) / n
+        covariance = np.bincount(q, weights=x * y, minlength=n_questions) / n - mean_x * mean_y
+        variance_x = mean_x * (1 - mean_x)
+        variance_y = np.bincount(q, weights=y * y, minlength=n_questions) / n - mean_y ** 2
+        discrimination = covariance / np.sqrt(variance_x * variance_y)
+    undefined = (n < min_answers) | ~(variance_x > 0) | ~(variance_y > 1e-12)
+    discrimination[undefined] = np.nan
+
+    return {
+        "answers": answers,
+        "correct_answers": correct_answers.astype(np.int64),
+        "p_value": p_value,
+        "discrimination": np.clip(discrimination, -1.0, 1.0),
+    }
+
+
+def positions_within_groups(sorted_groups: np.ndarray) -> np.ndarray:
+    """
+    Порядковый номер элемента внутри своей группы
+
+    Args:
+        sorted_groups: Отсортированный массив групп (например, урок каждого вопроса в порядке прохождения)
+
+    Returns:
+        Массив позиций, начиная с 0 в каждой группе
+    """
+    return np.arange(len(sorted_groups)) - np.searchsorted(sorted_groups, sorted_groups, side="left")
+
+
+def lesson_funnels(question_learners: np.ndarray, question_lesson: np.ndarray, positions: np.ndarray,
+                   lesson_learners: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Воронка прохождения вопросов урока
+
+    Args:
+        question_learners: Число пользователей, ответивших на вопрос (вопросы в порядке прохождения урока)
+        question_lesson: Индекс урока каждого вопроса (отсортирован)
+        positions: Позиция вопроса в уроке (см. positions_within_groups)
+        lesson_learners: Число пользователей, ответивших хотя бы на один вопрос урока
+
+    Returns:
+        Словарь массивов: reach_rate - доля учеников урока, дошедших до вопроса;
+        drop_off_rate - доля ответивших на предыдущий вопрос, но не на этот (NaN для первого)
+    """
+    question_learners = question_learners.astype(np.float64)
+    # Сдвиг на один вопрос; при пустой раскладке массив тоже пустой
+    previous = np.full_like(question_learners, np.nan)
+    previous[1:] = question_learners[:-1]
+    previous[positions == 0] = np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        reach_rate = question_learners / lesson_learners[question_lesson]
+        drop_off_rate = 1 - question_learners / previous
+    drop_off_rate[~(previous > 0)] = np.nan
+    return {"reach_rate": np.nan_to_num(reach_rate, nan=0.0), "drop_off_rate": drop_off_rate}
@@ -13,4 +13,90 @@ XP_FOR_CORRECT_ANSWER = 1
 
 # --- Константы для кэширования ---
 CACHE_TTL = 300  # 5 минут в секундах
-MAX_CACHE_SIZE = 1000 
\ No newline at end of file
+MAX_CACHE_SIZE = 1000 
+
+# --- Константы для проверки ответов с вводом текста ---
+FILL_IN_BLANK_DEFAULT_MAX_TYPOS = 1 # Опечаток по умолчанию, если у вопроса не задано своё значение
+FILL_IN_BLANK_TYPO_MIN_LENGTH = 6 # Более короткие ответы по умолчанию проверяются без опечаток
+FILL_IN_BLANK_MAX_TYPOS_LIMIT = 3
+
+# --- Константы для идемпотентных запросов ---
+IDEMPOTENCY_KEY_TTL = 3600 # 1 час в секундах
+IDEMPOTENCY_MAX_KEYS = 10000
+
+# --- Константы для массового импорта/экспорта контента ---
+BULK_IMPORT_BATCH_SIZE = 500 # Уроков в одном пакете INSERT
+BULK_IMPORT_MAX_REPORTED_ERRORS = 100
+
+# --- Константы для статистики админ-панели ---
+STATISTICS_RECONCILE_INTERVAL = 3600 # Период сверки счетчиков, в секундах
+STATISTICS_DAILY_WINDOW_DAYS = 30 # Сколько последних дней отдавать в панель
+STATISTICS_LEARNER_RETENTION_DAYS = 90 # Сколько дней хранить отметки активности учеников
+
+# --- Константы для аналитики обучения ---
+ANALYTICS_ROLLUP_INTERVAL = 300 # Период свертки новых событий, в секундах
+ANALYTICS_ROLLUP_LAG_SECONDS = 5 # События моложе этого не сворачиваются (еще не закоммиченные транзакции)
+ANALYTICS_BATCH_SIZE = 10000 # Строк в одном пакете чтения событий и колоночного экспорта
+ANALYTICS_MAX_SERIES_POINTS = 5000
+
+# --- Константы для статистики трудности вопросов ---
+QUESTION_STATS_INTERVAL = 86400 # Период пересчета, в секундах
+QUESTION_STATS_MIN_ANSWERS = 20 # Минимум ответов для расчета дискриминативности
+
+# --- Константы для истории попыток ответа ---
+ANSWER_ATTEMPTS_BATCH_SIZE = 5000 # Строк в одном пакете выгрузки/удаления/пересборки
+ANSWER_ATTEMPTS_PARTITION_MONTHS_AHEAD = 2 # На сколько месяцев вперед создавать партиции (PostgreSQL)
+ANSWER_ATTEMPTS_MAINTENANCE_INTERVAL = 86400 # Период обслуживания партиций, в секундах
+ANSWER_ATTEMPTS_HISTORY_LIMIT = 100 # Максимум попыток в ответе пользователю
+
+# --- Константы для рейтингов ---
+LEADERBOARD_REFRESH_INTERVAL = 600 # Период перестроения рейтингов из БД, в секундах
+LEADERBOARD_MAX_LIMIT = 100 # Максимум строк в одном ответе
+LEADERBOARD_MAX_NEIGHBOURS = 25 # Максимум соседей сверху и снизу для "мое место"
+
+# --- Константы для потоковой выгрузки пользователей и прогресса ---
+EXPORT_BATCH_SIZE = 5000 # Строк в одном пакете чтения серверного курсора
+EXPORT_CHUNK_ROWS = 1000 # Строк в одном фрагменте тела потокового ответа
+
+# --- Константы для бюджета SQL-запросов (разработка и тесты) ---
+QUERY_BUDGET_DEFAULT = 20 # Запросов на HTTP-запрос для маршрутов без @query_budget
+QUERY_BUDGET_N_PLUS_ONE_THRESHOLD = 10 # Повторов одной формы запроса, начиная с которых это N+1
+
+# --- Константы для сжатия ответов ---
+COMPRESSION_MINIMUM_SIZE = 1024 # Тела меньше этого размера (байт) не сжимаются
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+COMPRESSION_ZSTD_LEVEL = 3
+COMPRESSION_CACHE_TTL = 600 # Время жизни сжатого варианта, в секундах
+COMPRESSION_CACHE_MAX_ENTRIES = 256
+COMPRESSION_CACHE_MAX_BODY = 1024 * 1024 # Тела крупнее сжимаются без кэширования
+COMPRESSION_THREADPOOL_MIN_SIZE = 64 * 1024 # С этого размера сжатие выполняется в пуле потоков
+
+# --- Константы для длинных текстов теории ---
+THEORY_INLINE_MAX_BYTES = 64 * 1024 # Теория крупнее (в байтах UTF-8) не встраивается в JSON урока
+THEORY_CHUNK_BYTES = 64 * 1024 # Фрагмент потоковой отдачи теории
+
+# --- Константы для полнотекстового поиска ---
+SEARCH_MAX_TERMS = 8 # Слов запроса, учитываемых в поиске
+SEARCH_MIN_STEM = 4 # Окончание отбрасывается, только если остается основа не короче
+SEARCH_MAX_LIMIT = 50 # Наибольший размер страницы результатов
+SEARCH_SNIPPET_TOKENS = 16 # Слов во фрагменте текста вокруг совпадения
+# Множители bm25 по видам совпадений: название урока важнее совпадения в теории
+SEARCH_WEIGHT_LESSON = 2.0
+SEARCH_WEIGHT_THEORY = 1.0
+SEARCH_WEIGHT_QUESTION = 1.0
+
+# --- Константы для подсказок по названиям ---
+SUGGEST_REFRESH_INTERVAL = 600 # Период перестроения индекса названий из БД, в секундах
+SUGGEST_MAX_LIMIT = 20 # Максимум подсказок в одном ответе
+
+# --- Константы для интервального повторения (SM-2) ---
+REVIEW_INITIAL_EASE = 2.5 # Начальный множитель интервала
+REVIEW_MIN_EASE = 1.3 # Нижняя граница множителя
+REVIEW_QUALITY_CORRECT = 4 # Оценка ответа по шкале SM-2 (0-5): правильный ответ
+REVIEW_QUALITY_INCORRECT = 1 # Неправильный ответ
+REVIEW_FIRST_INTERVAL_DAYS = 1 # Интервал после первого правильного ответа подряд
+REVIEW_SECOND_INTERVAL_DAYS = 6 # Интервал после второго
+REVIEW_MAX_INTERVAL_DAYS = 365 # Верхняя граница интервала
+REVIEW_RELEARN_MINUTES = 10 # Через сколько повторить вопрос после ошибки
+REVIEW_QUEUE_MAX_LIMIT = 100 # Максимум вопросов в одном ответе очереди
@@ -0,0 +1,150 @@
+# app/crud/content_diff.py
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+from .utils import insert_returning_ids
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Поля вопроса, которые сравниваются и обновляются диффом
+QUESTION_FIELDS = (
+    "text", "question_type", "general_explanation", "correct_answer_text",
+    "accepted_answers", "answer_max_typos", "answer_ignore_word_order"
+)
+OPTION_FIELDS = ("text", "is_correct")
+
+# --- Набор изменений ---
+@dataclass
+class NewQuestion:
+    row: Dict[str, Any]
+    options: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class QuestionChangeset:
+    """Изменения вопросов и вариантов ответа, вычисленные за один проход."""
+    question_inserts: List[NewQuestion] = field(default_factory=list)
+    question_updates: List[Dict[str, Any]] = field(default_factory=list)
+    question_deletes: List[int] = field(default_factory=list)
+    option_inserts: List[Dict[str, Any]] = field(default_factory=list)
+    option_updates: List[Dict[str, Any]] = field(default_factory=list)
+    option_deletes: List[int] = field(default_factory=list)
+    # Вопросы, чьи проверяющие нужно сбросить после применения
+    touched_question_ids: Set[int] = field(default_factory=set)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.question_inserts or self.question_updates or self.question_deletes
+                    or self.option_inserts or self.option_updates or self.option_deletes)
+
+
+def _changed_fields(existing: Dict[str, Any], incoming: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    return {key: incoming[key] for key in fields if key in incoming and incoming[key] != existing.get(key)}
+
+# --- Загрузка текущего состояния (только нужные столбцы, без ORM-графа) ---
+def load_questions_state(db: Session, block_id: Optional[int] = None, question_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """Returns {question_id: {field: value, "options": {option_id: {field: value}}}}."""
+    query = select(models.Question.id, *(getattr(models.Question, name) for name in QUESTION_FIELDS))
+    if block_id is not None:
+        query = query.where(models.Question.lesson_block_id == block_id)
+    if question_ids is not None:
+        query = query.where(models.Question.id.in_(question_ids))
+    state = {row.id: {**row._asdict(), "options": {}} for row in db.execute(query)}
+    if state:
+        option_rows = db.execute(
+            select(models.QuestionOption.id, models.QuestionOption.question_id, *(getattr(models.QuestionOption, name) for name in OPTION_FIELDS))
+            .where(models.QuestionOption.question_id.in_(state.keys()))
+        )
+        for row in option_rows:
+            state[row.question_id]["options"][row.id] = row._asdict()
+    return state
+
+# --- Вычисление диффа ---
+def diff_options(changeset: QuestionChangeset, question_id: int, existing_options: Dict[int, Dict[str, Any]], incoming: List[schemas.QuestionOptionUpdate]) -> None:
+    kept_ids = set()
+    for option in incoming:
+        data = option.model_dump(exclude_unset=True, exclude={"id"})
+        if option.id is not None and option.id in existing_options:
+            kept_ids.add(option.id)
+            changed = _changed_fields(existing_options[option.id], data, OPTION_FIELDS)
+            if changed:
+                changeset.option_updates.append({"id": option.id, **changed})
+                changeset.touched_question_ids.add(question_id)
+        else:
+            changeset.option_inserts.append({"question_id": question_id, "text": option.text, "is_correct": option.is_correct})
+            changeset.touched_question_ids.add(question_id)
+    removed = existing_options.keys() - kept_ids
+    if removed:
+        changeset.option_deletes.extend(removed)
+        changeset.touched_question_ids.add(question_id)
+
+def diff_question(changeset: QuestionChangeset, question_id: int, existing: Dict[str, Any], incoming: schemas.QuestionUpdate) -> None:
+    data = incoming.model_dump(exclude_unset=True, exclude={"options", "id"})
+    changed = _changed_fields(existing, data, QUESTION_FIELDS)
+    if changed:
+        changeset.question_updates.append({"id": question_id, **changed})
+        changeset.touched_question_ids.add(question_id)
+    if incoming.options is not None:
+        diff_options(changeset, question_id, existing["options"], incoming.options)
+
+def diff_block_questions(block_id: int, existing: Dict[int, Dict[str, Any]], incoming: List[schemas.QuestionUpdate]) -> QuestionChangeset:
+    """
+    Diffs the full list of a block's questions against the stored state.
+
+    Questions with a known id are updated, questions without an id are created,
+    stored questions missing from the payload are deleted together with their options.
+    Ids that belong to other blocks are ignored.
+    """
+    changeset = QuestionChangeset()
+    kept_ids = set()
+    for question in incoming:
+        if question.id is not None:
+            if question.id in existing:
+                kept_ids.add(question.id)
+                diff_question(changeset, question.id, existing[question.id], question)
+            else:
+                logger.warning(f"Question {question.id} does not belong to block {block_id}, ignoring it in update")
+            continue
+        row = {"lesson_block_id": block_id, **{name: getattr(question, name) for name in QUESTION_FIELDS}}
+        options = [{"text": option.text, "is_correct": option.is_correct} for option in question.options or []]
+        changeset.question_inserts.append(NewQuestion(row=row, options=options))
+
+    removed = existing.keys() - kept_ids
+    changeset.question_deletes.extend(removed)
+    changeset.touched_question_ids.update(removed)
+    return changeset
+
+# --- Применение диффа ---
+def apply_changeset(db: Session, changeset: QuestionChangeset) -> None:
+    """
+    Applies the changeset with a handful of bulk statements in the current transaction.
+    The caller commits (or rolls back).
+    """
+    if changeset.question_deletes or changeset.option_deletes:
+        db.execute(
+            delete(models.QuestionOption).where(
+                models.QuestionOption.question_id.in_(changeset.question_deletes) | models.QuestionOption.id.in_(changeset.option_deletes)
+            ).execution_options(synchronize_session=False)
+        )
+    if changeset.question_deletes:
+        db.execute(
+            delete(models.Question).where(models.Question.id.in_(changeset.question_deletes)).execution_options(synchronize_session=False)
+        )
+    if changeset.question_updates:
+        db.execute(update(models.Question), changeset.question_updates)
+    if changeset.option_updates:
+        db.execute(update(models.QuestionOption), changeset.option_updates)
+
+    option_rows = list(changeset.option_inserts)
+    if changeset.question_inserts:
+        new_ids = insert_returning_ids(db, models.Question, [new_question.row for new_question in changeset.question_inserts])
+        for question_id, new_question in zip(new_ids, changeset.question_inserts):
+            option_rows.extend({"question_id": question_id, **option} for option in new_question.options)
+    if option_rows:
+        db.execute(insert(models.QuestionOption), option_rows)
@@ -0,0 +1,114 @@
+# app/crud/content_view.py
+from typing import Any, FrozenSet, List, NamedTuple, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy.orm import load_only, selectinload
+
+import models
+import schemas
+from core.serialization import sparse_model
+from app.exceptions.crud_exceptions import InvalidInputException
+
+
+class _Level(NamedTuple):
+    model: Any
+    schema: Type[BaseModel]
+    children: Optional[str] # Отношение к следующему уровню дерева
+    keys: Tuple[str, ...] # Столбцы, нужные всегда: ключи, связи с родителем, порядок
+
+# --- Уровни дерева контента сверху вниз ---
+LEVELS = (
+    _Level(models.Discipline, schemas.Discipline, "modules", ("id",)),
+    _Level(models.Module, schemas.Module, "lessons", ("id", "discipline_id", "order")),
+    _Level(models.Lesson, schemas.Lesson, "blocks", ("id", "module_id", "order")),
+    _Level(models.LessonBlock, schemas.LessonBlock, "questions", ("id", "lesson_id", "order_in_lesson")),
+    _Level(models.Question, schemas.Question, "options", ("id", "lesson_block_id")),
+    _Level(models.QuestionOption, schemas.QuestionOption, None, ("id", "question_id")),
+)
+
+
+class ContentView(NamedTuple):
+    """Какую часть дерева отдать: уровни ниже запрошенной сущности и поля каждого уровня (None - все)."""
+    depth: int
+    fields: Optional[FrozenSet[str]] = None
+
+    def wants(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+
+def _levels_from(model) -> Tuple[_Level, ...]:
+    index = next(i for i, level in enumerate(LEVELS) if level.model is model)
+    return LEVELS[index:]
+
+def parse_view(model, fields: Optional[str] = None, depth: Optional[int] = None) -> Optional[ContentView]:
+    """
+    Builds a view from the fields= (comma separated) and depth= query parameters.
+
+    Returns None when neither is given: the full tree, as before.
+    """
+    if fields is None and depth is None:
+        return None
+    levels = _levels_from(model)
+    max_depth = len(levels) - 1
+    if depth is None:
+        depth = max_depth
+    elif depth < 0:
+        raise InvalidInputException("Параметр depth не может быть отрицательным.")
+    depth = min(depth, max_depth)
+
+    selected = None
+    if fields is not None:
+        selected = frozenset(name.strip() for name in fields.split(",") if name.strip())
+        known = {name for level in levels[:depth + 1] for name in level.schema.model_fields if name != level.children}
+        unknown = selected - known
+        if unknown:
+            raise InvalidInputException(f"Неизвестные поля: {', '.join(sorted(unknown))}. Допустимые: {', '.join(sorted(known))}.")
+    return ContentView(depth, selected)
+
+# Атрибуты модели, из которых берутся поля схемы с другим именем; None - атрибут в ответ не идет
+_FIELD_OF_ATTRIBUTE = {
+    "theory_inline": "theory_text",
+    "theory_text": None,
+}
+
+def _load_only(level: _Level, view: ContentView):
+    columns = []
+    for name in level.model.__mapper__.column_attrs.keys():
+        field = _FIELD_OF_ATTRIBUTE.get(name, name)
+        if name in level.keys or (field is not None and view.wants(field)):
+            columns.append(name)
+    return load_only(*(getattr(level.model, name) for name in columns))
+
+def _children_loader(levels: Tuple[_Level, ...], index: int, view: ContentView):
+    # Уровень index грузится пакетно через отношение родителя, со своими столбцами и своими детьми
+    parent = levels[index - 1]
+    options = [_load_only(levels[index], view)]
+    if index < view.depth:
+        options.append(_children_loader(levels, index + 1, view))
+    return selectinload(getattr(parent.model, parent.children)).options(*options)
+
+def load_options(model, view: Optional[ContentView], default: List) -> List:
+    """Loader options for the view: only the selected columns and the levels up to view.depth."""
+    if view is None:
+        return default
+    levels = _levels_from(model)
+    options = [_load_only(levels[0], view)]
+    if view.depth > 0:
+        options.append(_children_loader(levels, 1, view))
+    return options
+
+def response_schema(schema: Type[BaseModel], view: Optional[ContentView]) -> Type[BaseModel]:
+    """Response model for the view; the full schema when there is no view."""
+    if view is None:
+        return schema
+    return sparse_model(schema, view.fields, view.depth)
+
+# --- Проверки для CRUD (view=None - полное дерево) ---
+def wants(view: Optional[ContentView], field: str) -> bool:
+    return view is None or view.wants(field)
+
+def reaches(view: Optional[ContentView], depth: int) -> bool:
+    return view is None or view.depth >= depth
+
+# Только id запрошенной сущности - для проверки существования родителя
+IDS_ONLY = ContentView(0, frozenset())
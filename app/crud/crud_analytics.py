@@ -0,0 +1,251 @@
+# app/crud/crud_analytics.py
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.exceptions.crud_exceptions import InvalidInputException, DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Источники событий, интервалы и разрезы ---
+SOURCE_COMPLETIONS = "lesson_completions" # user_lesson_progress.completed_at
+SOURCE_ANSWERS = "question_answers" # answer_attempts.answered_at
+SOURCES = (SOURCE_COMPLETIONS, SOURCE_ANSWERS)
+
+BUCKET_HOUR = "hour"
+BUCKET_DAY = "day"
+BUCKET_LENGTHS = {BUCKET_HOUR: timedelta(hours=1), BUCKET_DAY: timedelta(days=1)}
+
+SCOPE_DISCIPLINE = "discipline"
+SCOPE_MODULE = "module"
+SCOPE_LESSON = "lesson"
+SCOPE_QUESTION = "question"
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Столбцы колоночного экспорта: (имя, тип)
+EXPORT_COLUMNS = [
+    ("bucket", "string"), ("scope", "string"), ("scope_id", "int64"), ("bucket_start", "timestamp"),
+    ("completions", "int64"), ("answers", "int64"), ("correct_answers", "int64"),
+]
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает наивные значения (в UTC), PostgreSQL - с часовым поясом
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _dialect_insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def _bucket_starts(moment: datetime) -> Tuple[Tuple[str, datetime], Tuple[str, datetime]]:
+    hour = _as_utc(moment).replace(minute=0, second=0, microsecond=0)
+    return (BUCKET_HOUR, hour), (BUCKET_DAY, hour.replace(hour=0))
+
+def _accuracy(answers: int, correct: int) -> int:
+    return round(correct / answers * 100) if answers > 0 else 0
+
+# --- Свертка событий ---
+def _source_query(source: str, low: datetime, high: datetime):
+    if source == SOURCE_COMPLETIONS:
+        progress = models.UserLessonProgress
+        return select(
+            progress.completed_at, models.Module.discipline_id, models.Lesson.module_id, progress.lesson_id
+        ).join(models.Lesson, models.Lesson.id == progress.lesson_id)\
+         .join(models.Module, models.Module.id == models.Lesson.module_id)\
+         .where(progress.completed_at > low, progress.completed_at <= high)
+    attempt = models.AnswerAttempt
+    return select(
+        attempt.answered_at, models.Module.discipline_id, models.Lesson.module_id, models.LessonBlock.lesson_id,
+        attempt.question_id, attempt.is_correct
+    ).join(models.Question, models.Question.id == attempt.question_id)\
+     .join(models.LessonBlock, models.LessonBlock.id == models.Question.lesson_block_id)\
+     .join(models.Lesson, models.Lesson.id == models.LessonBlock.lesson_id)\
+     .join(models.Module, models.Module.id == models.Lesson.module_id)\
+     .where(attempt.answered_at > low, attempt.answered_at <= high)
+
+def _aggregate(db: Session, source: str, low: datetime, high: datetime) -> Tuple[Dict[Tuple[str, str, int, datetime], List[int]], int]:
+    """Streams the source events in (low, high] and sums them per (bucket, scope, scope_id, bucket_start)."""
+    totals: Dict[Tuple[str, str, int, datetime], List[int]] = {}
+    events = 0
+    query = _source_query(source, low, high).execution_options(yield_per=constants.ANALYTICS_BATCH_SIZE)
+    for row in db.execute(query):
+        events += 1
+        if source == SOURCE_COMPLETIONS:
+            moment, discipline_id, module_id, lesson_id = row
+            scopes = ((SCOPE_DISCIPLINE, discipline_id), (SCOPE_MODULE, module_id), (SCOPE_LESSON, lesson_id))
+            delta = (1, 0, 0)
+        else:
+            moment, discipline_id, module_id, lesson_id, question_id, is_correct = row
+            scopes = ((SCOPE_DISCIPLINE, discipline_id), (SCOPE_MODULE, module_id), (SCOPE_LESSON, lesson_id), (SCOPE_QUESTION, question_id))
+            delta = (0, 1, int(is_correct))
+        for bucket, bucket_start in _bucket_starts(moment):
+            for scope, scope_id in scopes:
+                counts = totals.setdefault((bucket, scope, scope_id, bucket_start), [0, 0, 0])
+                counts[0] += delta[0]
+                counts[1] += delta[1]
+                counts[2] += delta[2]
+    return totals, events
+
+def _upsert_buckets(db: Session, totals: Dict[Tuple[str, str, int, datetime], List[int]]) -> None:
+    if not totals:
+        return
+    rollup = models.AnalyticsRollup
+    stmt = _dialect_insert(db)(rollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[rollup.bucket, rollup.scope, rollup.scope_id, rollup.bucket_start],
+        set_={
+            "completions": rollup.completions + stmt.excluded.completions,
+            "answers": rollup.answers + stmt.excluded.answers,
+            "correct_answers": rollup.correct_answers + stmt.excluded.correct_answers,
+        }
+    )
+    db.execute(stmt, [
+        {"bucket": bucket, "scope": scope, "scope_id": scope_id, "bucket_start": bucket_start,
+         "completions": completions, "answers": answers, "correct_answers": correct}
+        for (bucket, scope, scope_id, bucket_start), (completions, answers, correct) in totals.items()
+    ])
+
+def _stored_watermarks(db: Session) -> Dict[str, datetime]:
+    return dict(db.execute(select(models.AnalyticsWatermark.source, models.AnalyticsWatermark.high_water)).all())
+
+def get_watermarks(db: Session) -> Dict[str, datetime]:
+    stored = _stored_watermarks(db)
+    return {source: _as_utc(stored[source]) if source in stored else EPOCH for source in SOURCES}
+
+def _advance_watermark(db: Session, source: str, stored: Optional[datetime], high: datetime) -> bool:
+    """Moves the mark from the value this run started at; False if another run moved it first."""
+    watermark = models.AnalyticsWatermark
+    if stored is None:
+        stmt = _dialect_insert(db)(watermark).values(source=source, high_water=high)
+        result = db.execute(stmt.on_conflict_do_nothing(index_elements=[watermark.source]))
+    else:
+        result = db.execute(
+            update(watermark).where(watermark.source == source, watermark.high_water == stored)
+            .values(high_water=high).execution_options(synchronize_session=False)
+        )
+    return result.rowcount == 1
+
+def run_rollup(db: Session) -> Dict[str, Any]:
+    """
+    Folds events newer than each source's high-water mark into hourly and daily buckets.
+
+    Buckets and the new mark of a source are committed together, so a failed run is simply
+    repeated by the next one. Events younger than ANALYTICS_ROLLUP_LAG_SECONDS are left for
+    the next run to avoid skipping rows of transactions that have not committed yet.
+    Every answer attempt is counted; a lesson progress row rewritten by a repeated completion
+    is counted again at its new time. Runs in other processes are excluded by the database:
+    the mark only moves from the value this run read, otherwise its buckets are rolled back.
+    """
+    try:
+        high = datetime.now(timezone.utc) - timedelta(seconds=constants.ANALYTICS_ROLLUP_LAG_SECONDS)
+        stored = _stored_watermarks(db)
+        watermarks = {source: _as_utc(stored[source]) if source in stored else EPOCH for source in SOURCES}
+        processed = {}
+        for source in SOURCES:
+            low = watermarks[source]
+            if low >= high:
+                processed[source] = 0
+                continue
+            totals, processed[source] = _aggregate(db, source, low, high)
+            _upsert_buckets(db, totals)
+            # Свертки в разных процессах (воркеры, периодическая задача и эндпоинт) могли прочитать одну отметку:
+            # отметка сдвигается условно, и проигравшая свертка откатывает свои суммы вместе с ней
+            if not _advance_watermark(db, source, stored.get(source), high):
+                db.rollback()
+                logger.info(f"Analytics rollup of {source} was done by another run, skipping")
+                processed[source] = 0
+                watermarks[source] = get_watermarks(db)[source]
+                continue
+            db.commit()
+            watermarks[source] = high
+        logger.info(f"Analytics rollup processed events: {processed}")
+        return {"processed_events": processed, "high_water": watermarks}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error running analytics rollup: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось выполнить свертку аналитики: {str(e)}")
+
+# --- Чтение агрегатов ---
+def _resolve_range(bucket: str, start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    length = BUCKET_LENGTHS[bucket]
+    start = _as_utc(start) if start else end - length * (constants.STATISTICS_DAILY_WINDOW_DAYS if bucket == BUCKET_DAY else 48)
+    if start >= end:
+        raise InvalidInputException("Начало периода должно быть раньше его конца.")
+    if (end - start) / length > constants.ANALYTICS_MAX_SERIES_POINTS:
+        raise InvalidInputException(f"Период слишком длинный: не более {constants.ANALYTICS_MAX_SERIES_POINTS} интервалов '{bucket}'.")
+    return start, end
+
+def get_series(db: Session, scope: str, scope_id: int, bucket: str = BUCKET_DAY,
+               start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Returns the non-empty buckets of one discipline/module/lesson/question in [start, end), oldest first."""
+    start, end = _resolve_range(bucket, start, end)
+    rollup = models.AnalyticsRollup
+    rows = db.execute(
+        select(rollup.bucket_start, rollup.completions, rollup.answers, rollup.correct_answers)
+        .where(rollup.bucket == bucket, rollup.scope == scope, rollup.scope_id == scope_id,
+               rollup.bucket_start >= start, rollup.bucket_start < end)
+        .order_by(rollup.bucket_start)
+    )
+    return [
+        {
+            "bucket_start": _as_utc(bucket_start),
+            "completions": completions,
+            "answers": answers,
+            "correct_answers": correct,
+            "accuracy_percentage": _accuracy(answers, correct)
+        }
+        for bucket_start, completions, answers, correct in rows
+    ]
+
+def get_scope_totals(db: Session, scope: str, bucket: str = BUCKET_DAY, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    """Sums the buckets of [start, end) per entity of the scope, most answered first."""
+    start, end = _resolve_range(bucket, start, end)
+    rollup = models.AnalyticsRollup
+    answers = func.sum(rollup.answers)
+    rows = db.execute(
+        select(rollup.scope_id, func.sum(rollup.completions), answers, func.sum(rollup.correct_answers))
+        .where(rollup.bucket == bucket, rollup.scope == scope, rollup.bucket_start >= start, rollup.bucket_start < end)
+        .group_by(rollup.scope_id)
+        .order_by(answers.desc(), rollup.scope_id)
+        .offset(skip).limit(limit)
+    )
+    return [
+        {
+            "scope_id": scope_id,
+            "completions": completions,
+            "answers": answers,
+            "correct_answers": correct,
+            "accuracy_percentage": _accuracy(answers, correct)
+        }
+        for scope_id, completions, answers, correct in rows
+    ]
+
+# --- Колоночный экспорт ---
+def iter_rollup_columns(db: Session, bucket: Optional[str] = None, scope: Optional[str] = None,
+                        start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        batch_size: int = constants.ANALYTICS_BATCH_SIZE) -> Iterator[Dict[str, list]]:
+    """Yields the rollup rows as column batches ({column: [values]}) of up to batch_size rows."""
+    rollup = models.AnalyticsRollup
+    query = select(*(getattr(rollup, name) for name, _ in EXPORT_COLUMNS))
+    if bucket:
+        query = query.where(rollup.bucket == bucket)
+    if scope:
+        query = query.where(rollup.scope == scope)
+    if start:
+        query = query.where(rollup.bucket_start >= start)
+    if end:
+        query = query.where(rollup.bucket_start < end)
+    query = query.order_by(rollup.bucket, rollup.scope, rollup.scope_id, rollup.bucket_start)
+
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        columns = [list(values) for values in zip(*rows)]
+        columns[3] = [_as_utc(value) for value in columns[3]]
+        yield {name: values for (name, _), values in zip(EXPORT_COLUMNS, columns)}
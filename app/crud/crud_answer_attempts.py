@@ -0,0 +1,199 @@
+# app/crud/crud_answer_attempts.py
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from . import constants, crud_review
+from app.exceptions.crud_exceptions import DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "answer_attempts_y" # answer_attempts_y2026m10
+_REBUILT_COLUMNS = ("is_correct", "answered_at", "ease", "interval_days", "repetitions", "due_at")
+
+def _dialect_insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _month_start(day: date, months_ahead: int = 0) -> date:
+    month_index = day.year * 12 + day.month - 1 + months_ahead
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+# --- Путь записи (в транзакции вызывающего кода, без commit) ---
+def record_attempt(db: Session, user_id: int, question_id: int, is_correct: bool, answer: Any, answered_at: datetime,
+                   schedule: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Appends the attempt and folds it into the latest-state row of user_question_progress.
+    schedule (crud_review.next_schedule) is written by the same upsert.
+    """
+    db.execute(insert(models.AnswerAttempt).values(
+        user_id=user_id, question_id=question_id, is_correct=is_correct, answer=answer, answered_at=answered_at
+    ))
+    progress = models.UserQuestionProgress
+    stmt = _dialect_insert(db)(progress).values(
+        user_id=user_id, question_id=question_id, is_correct=is_correct, answered_at=answered_at, **(schedule or {})
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[progress.user_id, progress.question_id],
+        set_={"is_correct": stmt.excluded.is_correct, "answered_at": stmt.excluded.answered_at,
+              **{column: getattr(stmt.excluded, column) for column in (schedule or {})}}
+    ))
+
+# --- Чтение ---
+def get_user_attempts(db: Session, user_id: int, question_id: Optional[int] = None,
+                      limit: int = constants.ANSWER_ATTEMPTS_HISTORY_LIMIT) -> List[models.AnswerAttempt]:
+    """Most recent attempts of a user first (served by the (user_id, answered_at) index)."""
+    query = select(models.AnswerAttempt).where(models.AnswerAttempt.user_id == user_id)
+    if question_id is not None:
+        query = query.where(models.AnswerAttempt.question_id == question_id)
+    query = query.order_by(models.AnswerAttempt.answered_at.desc(), models.AnswerAttempt.id.desc()).limit(limit)
+    return db.execute(query).scalars().all()
+
+def iter_attempt_records(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         batch_size: int = constants.ANSWER_ATTEMPTS_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Streams attempts in [start, end) as plain dicts, e.g. for archiving before purge_attempts_before()."""
+    attempt = models.AnswerAttempt
+    query = select(attempt.id, attempt.user_id, attempt.question_id, attempt.is_correct, attempt.answer, attempt.answered_at)
+    if start is not None:
+        query = query.where(attempt.answered_at >= start)
+    if end is not None:
+        query = query.where(attempt.answered_at < end)
+    query = query.order_by(attempt.answered_at, attempt.id).execution_options(yield_per=batch_size)
+    for row in db.execute(query):
+        yield row._asdict()
+
+# --- Обслуживание: партиции и архивирование ---
+def ensure_partitions(db: Session, months_ahead: int = constants.ANSWER_ATTEMPTS_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    Creates monthly partitions from the current month up to months_ahead (PostgreSQL only).
+    Rows of a new month already in answer_attempts_default are moved into its partition.
+    Returns the names of the partitions that were created.
+    """
+    if not _is_postgresql(db):
+        return []
+    created = []
+    try:
+        existing = set(db.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'answer_attempts'::regclass"
+        )).scalars())
+        today = datetime.now(timezone.utc).date()
+        for offset in range(months_ahead + 1):
+            lower, upper = _month_start(today, offset), _month_start(today, offset + 1)
+            name = f"{PARTITION_PREFIX}{lower.year}m{lower.month:02d}"
+            if name in existing:
+                continue
+            # Строки месяца могли попасть в партицию по умолчанию (например, если обслуживание не запускалось),
+            # и тогда CREATE TABLE ... PARTITION OF падает: таблица создается отдельно, строки переносятся
+            # из партиции по умолчанию, и только после этого она присоединяется
+            bounds = {"lower": lower, "upper": upper}
+            db.execute(text(f"CREATE TABLE {name} (LIKE answer_attempts INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            db.execute(text(
+                "WITH moved AS (DELETE FROM answer_attempts_default "
+                "WHERE answered_at >= :lower AND answered_at < :upper RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            db.execute(text(
+                f"ALTER TABLE answer_attempts ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            created.append(name)
+        db.commit()
+        if created:
+            logger.info(f"Created answer_attempts partitions: {created}")
+        return created
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating answer_attempts partitions: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось создать партиции истории ответов: {str(e)}")
+
+def purge_attempts_before(db: Session, cutoff: datetime, batch_size: int = constants.ANSWER_ATTEMPTS_BATCH_SIZE) -> int:
+    """
+    Deletes attempts older than cutoff; user_question_progress keeps the latest state.
+
+    On PostgreSQL whole monthly partitions below the cutoff are dropped, the rest
+    is deleted in batches of batch_size with a commit after each batch.
+    Returns the number of deleted attempts.
+    """
+    deleted = 0
+    try:
+        if _is_postgresql(db):
+            cutoff_month = _month_start(cutoff.date())
+            partitions = db.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'answer_attempts'::regclass AND c.relname LIKE :prefix"
+            ), {"prefix": PARTITION_PREFIX + "%"}).scalars().all()
+            for name in partitions:
+                year, month = name[len(PARTITION_PREFIX):].split("m")
+                if _month_start(date(int(year), int(month), 1), 1) <= cutoff_month:
+                    deleted += db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                    db.execute(text(f"ALTER TABLE answer_attempts DETACH PARTITION {name}"))
+                    db.execute(text(f"DROP TABLE {name}"))
+                    db.commit()
+                    logger.info(f"Dropped answer_attempts partition {name}")
+
+        attempt = models.AnswerAttempt
+        while True:
+            ids = select(attempt.id).where(attempt.answered_at < cutoff).limit(batch_size).scalar_subquery()
+            result = db.execute(delete(attempt).where(attempt.id.in_(ids)).execution_options(synchronize_session=False))
+            db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        logger.info(f"Purged {deleted} answer attempts older than {cutoff}")
+        return deleted
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error purging answer attempts: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось удалить старую историю ответов: {str(e)}")
+
+def rebuild_question_progress(db: Session, batch_size: int = constants.ANSWER_ATTEMPTS_BATCH_SIZE) -> int:
+    """
+    Re-derives user_question_progress from the history: the latest attempt of every (user, question) pair
+    gives is_correct/answered_at, and the SM-2 schedule is replayed over all attempts of the pair
+    (crud_review.next_schedule, as record_attempt does). Pairs whose history was purged keep their stored state.
+    Returns the number of upserted rows.
+    """
+    attempt = models.AnswerAttempt
+    progress = models.UserQuestionProgress
+    query = select(attempt.user_id, attempt.question_id, attempt.is_correct, attempt.answered_at)\
+        .order_by(attempt.user_id, attempt.question_id, attempt.answered_at, attempt.id)\
+        .execution_options(yield_per=batch_size)
+    stmt = _dialect_insert(db)(progress)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[progress.user_id, progress.question_id],
+        set_={column: getattr(stmt.excluded, column) for column in _REBUILT_COLUMNS}
+    )
+    rows = 0
+    try:
+        batch, pair = [], None
+        for row in db.execute(query):
+            if (row.user_id, row.question_id) != pair:
+                if len(batch) >= batch_size:
+                    db.execute(stmt, batch)
+                    rows += len(batch)
+                    batch = []
+                pair, state = (row.user_id, row.question_id), None
+                batch.append({"user_id": row.user_id, "question_id": row.question_id})
+            # Состояние пары сворачивается по ее попыткам в порядке ответа
+            schedule = crud_review.next_schedule(state, row.is_correct, row.answered_at)
+            state = SimpleNamespace(**schedule)
+            batch[-1].update(schedule, is_correct=row.is_correct, answered_at=row.answered_at)
+        if batch:
+            db.execute(stmt, batch)
+            rows += len(batch)
+        db.commit()
+        logger.info(f"Rebuilt {rows} user_question_progress rows from answer attempts")
+        return rows
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding question progress: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось пересобрать прогресс по вопросам: {str(e)}")
@@ -0,0 +1,372 @@
+# app/crud/crud_bulk.py
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, selectinload, undefer
+
+import models
+import schemas
+from . import constants
+from .utils import insert_returning_ids
+from . import crud_statistics
+from . import crud_suggest
+from app.exceptions.crud_exceptions import InvalidInputException, DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Формат обмена контентом ---
+# Поток записей (NDJSON - по одной на строку), каждая с полем "type":
+#   {"type": "discipline", "title", "description"}
+#   {"type": "module", "discipline", "title", "description", "order"}
+#   {"type": "lesson", "discipline", "module", "title", "order", "blocks": [...]}
+# JSON-дерево дисциплин (discipline -> modules -> lessons -> blocks) разворачивается в тот же поток.
+
+RECORD_DISCIPLINE = "discipline"
+RECORD_MODULE = "module"
+RECORD_LESSON = "lesson"
+
+def iter_ndjson_records(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields (line_number, record) from NDJSON lines, skipping blank lines."""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            raise InvalidInputException(f"Строка {line_number}: некорректный JSON ({e.msg}).")
+
+def _tree_entries(value: Any, where: str, field: str) -> List[Any]:
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise InvalidInputException(f"{where}: поле {field} должно быть списком.")
+    return value
+
+def iter_tree_records(tree: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Flattens a JSON discipline tree (object or list of objects) into import records.
+
+    Entries that are not objects are passed through as is and reported by the importer
+    as invalid records; their subtrees are skipped.
+    """
+    if not isinstance(tree, (dict, list)):
+        raise InvalidInputException("JSON-дерево должно быть объектом дисциплины или списком дисциплин.")
+    disciplines = tree if isinstance(tree, list) else [tree]
+    record_number = 0
+    for discipline in disciplines:
+        record_number += 1
+        if not isinstance(discipline, dict):
+            yield record_number, discipline
+            continue
+        yield record_number, {
+            "type": RECORD_DISCIPLINE,
+            "title": discipline.get("title"),
+            "description": discipline.get("description")
+        }
+        for module in _tree_entries(discipline.get("modules"), f"Запись {record_number}", "modules"):
+            record_number += 1
+            if not isinstance(module, dict):
+                yield record_number, module
+                continue
+            yield record_number, {
+                "type": RECORD_MODULE,
+                "discipline": discipline.get("title"),
+                **{k: v for k, v in module.items() if k != "lessons"}
+            }
+            for lesson in _tree_entries(module.get("lessons"), f"Запись {record_number}", "lessons"):
+                record_number += 1
+                if not isinstance(lesson, dict):
+                    yield record_number, lesson
+                    continue
+                yield record_number, {
+                    "type": RECORD_LESSON,
+                    "discipline": discipline.get("title"),
+                    "module": module.get("title"),
+                    **lesson
+                }
+
+
+class _ContentImporter:
+    """Batches lesson graphs and writes them with multi-row INSERT ... RETURNING statements."""
+
+    def __init__(self, db: Session, atomic: bool, batch_size: int, progress: Optional[Callable[[schemas.ContentImportReport], None]]):
+        self.db = db
+        self.atomic = atomic
+        self.batch_size = batch_size
+        self.progress = progress
+        self.report = schemas.ContentImportReport()
+        self.discipline_ids: Dict[str, int] = {}
+        self.module_ids: Dict[Tuple[int, str], int] = {}
+        self.lesson_titles: Dict[int, Set[str]] = {}
+        self.new_discipline_ids: Set[int] = set() # Созданы этим импортом: их модули искать в базе не нужно
+        self.pending: List[Tuple[int, int, schemas.ContentImportLesson]] = []
+
+    # --- Ошибки ---
+    def _fail(self, record_number: int, message: str, failed_records: int = 1) -> None:
+        if self.atomic:
+            raise InvalidInputException(f"Запись {record_number}: {message}")
+        if len(self.report.errors) < constants.BULK_IMPORT_MAX_REPORTED_ERRORS:
+            self.report.errors.append(f"Запись {record_number}: {message}")
+        self.report.failed_records += failed_records
+
+    # --- Дисциплины и модули (немногочисленны, пишутся сразу) ---
+    def _discipline_id(self, title: str, description: Optional[str] = None) -> int:
+        if title in self.discipline_ids:
+            return self.discipline_ids[title]
+        discipline_id = self.db.execute(
+            select(models.Discipline.id).where(models.Discipline.title == title)
+        ).scalar()
+        if discipline_id is None:
+            discipline_id = self.db.execute(
+                insert(models.Discipline).returning(models.Discipline.id),
+                {"title": title, "description": description}
+            ).scalar_one()
+            self.report.disciplines += 1
+            self.new_discipline_ids.add(discipline_id)
+            self._commit_if_incremental()
+        self.discipline_ids[title] = discipline_id
+        return discipline_id
+
+    def _module_id(self, discipline_id: int, record: schemas.ContentImportModule) -> int:
+        key = (discipline_id, record.title)
+        if key in self.module_ids:
+            return self.module_ids[key]
+        module_id = None
+        if discipline_id not in self.new_discipline_ids:
+            module_id = self.db.execute(
+                select(models.Module.id).where(models.Module.discipline_id == discipline_id, models.Module.title == record.title)
+            ).scalar()
+        if module_id is None:
+            module_id = self.db.execute(
+                insert(models.Module).returning(models.Module.id),
+                {"title": record.title, "description": record.description, "order": record.order or 0, "discipline_id": discipline_id}
+            ).scalar_one()
+            self.report.modules += 1
+            # В новом модуле уроков еще нет
+            self.lesson_titles[module_id] = set()
+            self._commit_if_incremental()
+        self.module_ids[key] = module_id
+        return module_id
+
+    def _existing_lesson_titles(self, module_id: int) -> Set[str]:
+        if module_id not in self.lesson_titles:
+            self.lesson_titles[module_id] = set(self.db.execute(
+                select(models.Lesson.title).where(models.Lesson.module_id == module_id)
+            ).scalars())
+        return self.lesson_titles[module_id]
+
+    def _commit_if_incremental(self) -> None:
+        if not self.atomic:
+            self.db.commit()
+
+    # --- Обработка записей ---
+    def add(self, record_number: int, record: Dict[str, Any]) -> None:
+        self.report.records += 1
+        if not isinstance(record, dict):
+            self._fail(record_number, "запись должна быть объектом JSON.")
+            return
+        record_type = record.get("type")
+        try:
+            if record_type == RECORD_DISCIPLINE:
+                discipline = schemas.DisciplineCreate.model_validate(record)
+                self._discipline_id(discipline.title, discipline.description)
+            elif record_type == RECORD_MODULE:
+                module = schemas.ContentImportModule.model_validate(record)
+                self._module_id(self._discipline_id(module.discipline), module)
+            elif record_type == RECORD_LESSON:
+                self._add_lesson(record_number, schemas.ContentImportLesson.model_validate(record))
+            else:
+                self._fail(record_number, f"неизвестный тип записи {record_type!r}.")
+        except ValidationError as e:
+            self._fail(record_number, f"ошибка валидации: {e.errors()[0].get('msg')} ({'.'.join(map(str, e.errors()[0].get('loc', ())))})")
+
+    def _add_lesson(self, record_number: int, lesson: schemas.ContentImportLesson) -> None:
+        discipline_id = self._discipline_id(lesson.discipline)
+        module_id = self._module_id(discipline_id, schemas.ContentImportModule(discipline=lesson.discipline, title=lesson.module))
+        titles = self._existing_lesson_titles(module_id)
+        if lesson.title in titles:
+            self.report.skipped_lessons += 1
+            return
+        titles.add(lesson.title)
+        self.pending.append((record_number, module_id, lesson))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            self._write_batch(batch)
+            self._commit_if_incremental()
+        except Exception as e:
+            if self.atomic:
+                raise
+            self.db.rollback()
+            for _, module_id, lesson in batch:
+                self.lesson_titles.get(module_id, set()).discard(lesson.title)
+            logger.error(f"Bulk import batch of {len(batch)} lessons failed: {e}", exc_info=True)
+            self._fail(batch[0][0], f"не удалось записать пакет из {len(batch)} уроков: {e}", failed_records=len(batch))
+            return
+        if self.progress:
+            self.progress(self.report)
+
+    def _write_batch(self, batch: List[Tuple[int, int, schemas.ContentImportLesson]]) -> None:
+        lesson_ids = insert_returning_ids(
+            self.db, models.Lesson,
+            [{"title": lesson.title, "order": lesson.order or 0, "module_id": module_id} for _, module_id, lesson in batch]
+        )
+
+        block_rows, blocks = [], []
+        for lesson_id, (_, _, lesson) in zip(lesson_ids, batch):
+            for block in lesson.blocks:
+                block_rows.append({
+                    "lesson_id": lesson_id,
+                    "order_in_lesson": block.order_in_lesson,
+                    "block_type": block.block_type,
+                    "theory_text": block.theory_text,
+                    "theory_size": models.utf8_size(block.theory_text)
+                })
+                blocks.append(block)
+        block_ids = insert_returning_ids(self.db, models.LessonBlock, block_rows)
+
+        question_rows, questions = [], []
+        for block_id, block in zip(block_ids, blocks):
+            if block.block_type != models.LessonBlockType.EXERCISE:
+                continue
+            for question in block.questions or []:
+                question_rows.append({
+                    "lesson_block_id": block_id,
+                    "text": question.text,
+                    "question_type": question.question_type,
+                    "general_explanation": question.general_explanation,
+                    "correct_answer_text": question.correct_answer_text,
+                    "accepted_answers": question.accepted_answers,
+                    "answer_max_typos": question.answer_max_typos,
+                    "answer_ignore_word_order": question.answer_ignore_word_order
+                })
+                questions.append(question)
+        question_ids = insert_returning_ids(self.db, models.Question, question_rows)
+
+        option_rows = [
+            {"question_id": question_id, "text": option.text, "is_correct": option.is_correct}
+            for question_id, question in zip(question_ids, questions)
+            for option in question.options
+        ]
+        if option_rows:
+            self.db.execute(insert(models.QuestionOption), option_rows)
+
+        crud_statistics.increment(self.db, crud_statistics.TOTAL_LESSONS, len(lesson_ids))
+        self.report.lessons += len(lesson_ids)
+        self.report.blocks += len(block_ids)
+        self.report.questions += len(question_ids)
+        self.report.options += len(option_rows)
+
+
+def import_content(
+    db: Session,
+    records: Iterable[Tuple[int, Dict[str, Any]]],
+    atomic: bool = True,
+    batch_size: int = constants.BULK_IMPORT_BATCH_SIZE,
+    progress: Optional[Callable[[schemas.ContentImportReport], None]] = None
+) -> schemas.ContentImportReport:
+    """
+    Streams content records into the database in batches.
+
+    Existing disciplines/modules (matched by title) are reused and lessons already present
+    in a module are skipped, so an interrupted incremental import can simply be re-run.
+    With atomic=True the whole import is one transaction and the first invalid record aborts it;
+    otherwise every batch is committed and invalid records are reported and skipped.
+    """
+    importer = _ContentImporter(db, atomic=atomic, batch_size=batch_size, progress=progress)
+    try:
+        for record_number, record in records:
+            importer.add(record_number, record)
+        importer.flush()
+        db.commit()
+        return importer.report
+    except InvalidInputException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error importing content: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось импортировать контент: {str(e)}")
+    finally:
+        # Пакетные вставки идут мимо CRUD-функций; без atomic часть пакетов могла быть сохранена и при ошибке
+        crud_suggest.invalidate()
+
+# --- Экспорт ---
+def iter_content_records(db: Session, batch_size: int = constants.BULK_IMPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yields the whole content tree as import records, loading lessons in batches of batch_size."""
+    for discipline in db.execute(select(models.Discipline).order_by(models.Discipline.id)).scalars():
+        yield {"type": RECORD_DISCIPLINE, "title": discipline.title, "description": discipline.description}
+
+    modules_query = select(models.Module, models.Discipline.title)\
+        .join(models.Discipline, models.Discipline.id == models.Module.discipline_id)\
+        .order_by(models.Module.discipline_id, models.Module.order, models.Module.id)
+    for module, discipline_title in db.execute(modules_query):
+        yield {
+            "type": RECORD_MODULE,
+            "discipline": discipline_title,
+            "title": module.title,
+            "description": module.description,
+            "order": module.order
+        }
+
+    lesson_order = (models.Module.discipline_id, models.Module.order, models.Module.id, models.Lesson.order, models.Lesson.id)
+    lesson_ids = db.execute(
+        select(models.Lesson.id)
+        .join(models.Module, models.Module.id == models.Lesson.module_id)
+        .order_by(*lesson_order)
+    ).scalars().all()
+    # Уроки с блоками грузятся пакетами по id, а не через yield_per: с обработчиком do_orm_execute
+    # на сессии (ревизия контента) SQLAlchemy не совмещает yield_per с selectinload
+    for start in range(0, len(lesson_ids), batch_size):
+        lessons_query = select(models.Lesson, models.Module.title, models.Discipline.title)\
+            .join(models.Module, models.Module.id == models.Lesson.module_id)\
+            .join(models.Discipline, models.Discipline.id == models.Module.discipline_id)\
+            .where(models.Lesson.id.in_(lesson_ids[start:start + batch_size]))\
+            .order_by(*lesson_order)\
+            .options(
+                selectinload(models.Lesson.blocks).options(
+                    # В выгрузку теория идет целиком, в том числе длинная
+                    undefer(models.LessonBlock.theory_text),
+                    selectinload(models.LessonBlock.questions).selectinload(models.Question.options)
+                )
+            )
+        for lesson, module_title, discipline_title in db.execute(lessons_query):
+            yield {
+                "type": RECORD_LESSON,
+                "discipline": discipline_title,
+                "module": module_title,
+                "title": lesson.title,
+                "order": lesson.order,
+                "blocks": [_block_record(block) for block in lesson.blocks]
+            }
+            # Уже выгруженные уроки не должны копиться в identity map
+            db.expunge(lesson)
+
+def _block_record(block: models.LessonBlock) -> Dict[str, Any]:
+    record = {"order_in_lesson": block.order_in_lesson, "block_type": block.block_type.value}
+    if block.block_type == models.LessonBlockType.THEORY:
+        record["theory_text"] = block.theory_text
+    else:
+        record["questions"] = [
+            {
+                "text": question.text,
+                "question_type": question.question_type.value,
+                "general_explanation": question.general_explanation,
+                "correct_answer_text": question.correct_answer_text,
+                "accepted_answers": question.accepted_answers,
+                "answer_max_typos": question.answer_max_typos,
+                "answer_ignore_word_order": question.answer_ignore_word_order,
+                "options": [{"text": option.text, "is_correct": option.is_correct} for option in question.options]
+            }
+            for question in block.questions
+        ]
+    return record
@@ -0,0 +1,87 @@
+# app/crud/crud_content_revision.py
+from datetime import datetime
+from itertools import chain
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Ревизия контента хранится строкой stat_counters: value растет на 1 за каждую транзакцию,
+# изменившую контент, updated_at - время последнего изменения
+CONTENT_REVISION = "content_revision"
+
+CONTENT_MODELS = (
+    models.Discipline, models.Module, models.Lesson,
+    models.LessonBlock, models.Question, models.QuestionOption,
+)
+CONTENT_TABLES = frozenset(model.__table__ for model in CONTENT_MODELS)
+
+# Флаг в session.info: ревизия уже увеличена в текущей транзакции
+_BUMPED = "content_revision_bumped"
+
+
+class ContentRevision(NamedTuple):
+    revision: int
+    revised_at: Optional[datetime]
+    completed_lessons: int # Уроки, пройденные пользователем: от них зависит прогресс в ответах
+    last_completed_at: Optional[datetime]
+
+
+# --- Увеличение ревизии (в транзакции, изменившей контент) ---
+def _bump(session: Session) -> None:
+    if session.info.get(_BUMPED):
+        return
+    connection = session.connection()
+    insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(models.StatCounter).values(key=CONTENT_REVISION, value=1, updated_at=func.now())
+    # Соединение, а не session.execute: обработчики вызываются внутри flush и выполнения ORM-запроса
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[models.StatCounter.key],
+        set_={"value": models.StatCounter.value + 1, "updated_at": func.now()}
+    ))
+    session.info[_BUMPED] = True
+
+def _after_flush(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.deleted, session.dirty):
+        if isinstance(obj, CONTENT_MODELS) and (obj not in session.dirty or session.is_modified(obj)):
+            _bump(session)
+            return
+
+def _do_orm_execute(orm_execute_state) -> None:
+    # Пакетные insert()/update()/delete() (импорт, дифф вопросов) идут мимо flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if getattr(orm_execute_state.statement, "table", None) in CONTENT_TABLES:
+            _bump(orm_execute_state.session)
+
+def _after_transaction_end(session: Session, transaction) -> None:
+    session.info.pop(_BUMPED, None)
+
+def track_content_changes(session_factory) -> None:
+    """Bumps the content revision in every transaction that writes disciplines, modules, lessons, blocks, questions or options."""
+    event.listen(session_factory, "after_flush", _after_flush)
+    event.listen(session_factory, "do_orm_execute", _do_orm_execute)
+    event.listen(session_factory, "after_transaction_end", _after_transaction_end)
+
+# Сессии SessionLocal отслеживаются в любом процессе: API, CLI (manage_content.py, create_superuser.py) и
+# фоновые задачи. Модуль импортируется из models.py, поэтому регистрация не зависит от импорта main.py
+track_content_changes(SessionLocal)
+
+# --- Чтение ---
+def get_revision(db: Session, user_id: Optional[int] = None) -> ContentRevision:
+    """Content revision plus the user's lesson completion state, in one round trip."""
+    counter = select(models.StatCounter).where(models.StatCounter.key == CONTENT_REVISION).subquery()
+    progress = models.UserLessonProgress
+    row = db.execute(select(
+        select(counter.c.value).scalar_subquery(),
+        select(counter.c.updated_at).scalar_subquery(),
+        select(func.count(progress.id)).where(progress.user_id == user_id).scalar_subquery(),
+        select(func.max(progress.completed_at)).where(progress.user_id == user_id).scalar_subquery(),
+    )).one()
+    return ContentRevision(row[0] or 0, row[1], row[2] or 0, row[3])
@@ -6,73 +6,79 @@ from sqlalchemy import select, and_
 
 import models
 import schemas
-from .utils import update_db_object
+from .utils import Page, paginate, update_db_object
 from . import crud_user_progress
+from . import content_view
+from app.grading import graders
+from . import crud_statistics
+from . import crud_suggest
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, DatabaseOperationException
 
 import logging
 logger = logging.getLogger(__name__)
 
 # --- CRUD для Дисциплин (Discipline) ---
-def get_discipline(db: Session, discipline_id: int, user_id: Optional[int] = None) -> models.Discipline:
+def _discipline_tree_options():
+    # Все, что отдает schemas.Discipline, одним пакетом запросов
+    return selectinload(models.Discipline.modules)\
+        .selectinload(models.Module.lessons)\
+        .selectinload(models.Lesson.blocks)\
+        .selectinload(models.LessonBlock.questions)\
+        .selectinload(models.Question.options)
+
+def get_discipline(db: Session, discipline_id: int, user_id: Optional[int] = None,
+                   view: Optional[content_view.ContentView] = None) -> models.Discipline:
     query = db.query(models.Discipline).filter(models.Discipline.id == discipline_id)
-    
-    if user_id:
-        # Eager load modules and their lessons
-        query = query.options(
-            selectinload(models.Discipline.modules)
-            .selectinload(models.Module.lessons)
-        )
-        discipline = query.first()
-        if not discipline:
-            raise NotFoundException(entity_name="Дисциплина", entity_id=discipline_id)
+    # Eager load the whole tree the schema returns (or only the part of the tree the view asks for)
+    query = query.options(*content_view.load_options(models.Discipline, view, [_discipline_tree_options()]))
+    discipline = query.first()
+    if not discipline:
+        raise NotFoundException(entity_name="Дисциплина", entity_id=discipline_id)
 
+    if user_id:
         # Augment with progress information (mimicking original logic)
-        # Discipline progress (total vs completed lessons in discipline)
-        discipline.progress = crud_user_progress.get_discipline_progress(db, user_id, discipline.id)
+        _add_progress(db, user_id, [discipline], view)
+    return discipline
 
-        for module_obj in discipline.modules:
-            # Module progress (total vs completed lessons in module)
-            module_obj.progress = crud_user_progress.get_module_progress(db, user_id, module_obj.id)
-            for lesson_obj in module_obj.lessons:
-                # Lesson completion status
-                lesson_obj.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson_obj.id)
-        return discipline
-    else:
-        # If no user_id, just load the discipline and its structure without progress
-        query = query.options(
-            selectinload(models.Discipline.modules)
-            .selectinload(models.Module.lessons)
-        )
-        discipline = query.first()
-        if not discipline:
-            raise NotFoundException(entity_name="Дисциплина", entity_id=discipline_id)
-        return discipline
+def _add_progress(db: Session, user_id: int, disciplines: List[models.Discipline], view: Optional[content_view.ContentView]) -> None:
+    # Прогресс считается только для уровней и полей, которые попадут в ответ, - одним запросом на уровень
+    if content_view.wants(view, "progress"):
+        # Discipline progress (completed modules and lessons in discipline)
+        progress = crud_user_progress.get_disciplines_progress(db, user_id, [disc.id for disc in disciplines])
+        for disc in disciplines:
+            disc.progress = progress[disc.id]
+    if not content_view.reaches(view, 1):
+        return
+    modules = [module_obj for disc in disciplines for module_obj in disc.modules]
+    if content_view.wants(view, "progress"):
+        # Module progress (total vs completed lessons in module)
+        progress = crud_user_progress.get_modules_progress(db, user_id, [module_obj.id for module_obj in modules])
+        for module_obj in modules:
+            module_obj.progress = progress[module_obj.id]
+    if not content_view.reaches(view, 2) or not content_view.wants(view, "is_completed_by_user"):
+        return
+    lessons = [lesson_obj for module_obj in modules for lesson_obj in module_obj.lessons]
+    completed = crud_user_progress.get_completed_lesson_ids(db, user_id, [lesson_obj.id for lesson_obj in lessons])
+    for lesson_obj in lessons:
+        # Lesson completion status
+        lesson_obj.is_completed_by_user = lesson_obj.id in completed
 
 def get_discipline_by_title(db: Session, title: str) -> Optional[models.Discipline]:
     return db.query(models.Discipline).filter(models.Discipline.title == title).first()
 
-def get_disciplines(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None) -> List[models.Discipline]:
-    query = db.query(models.Discipline).order_by(models.Discipline.id)
+def get_disciplines(db: Session, skip: int = 0, limit: int = 100, user_id: Optional[int] = None,
+                    cursor: Optional[str] = None, view: Optional[content_view.ContentView] = None) -> Page:
+    query = db.query(models.Discipline)
     
-    query = query.options(
-        selectinload(models.Discipline.modules)
-        .selectinload(models.Module.lessons)
-    )
+    # Грузим все дерево, которое отдает схема, пакетно - иначе блоки и вопросы догружаются по одному уроку.
+    # С view - только запрошенные уровни и столбцы
+    query = query.options(*content_view.load_options(models.Discipline, view, [_discipline_tree_options()]))
 
-    disciplines = query.offset(skip).limit(limit).all()
+    page = paginate(query, [models.Discipline.id], skip, limit, cursor)
     
     if user_id:
-        for disc in disciplines:
-            # Discipline progress
-            disc.progress = crud_user_progress.get_discipline_progress(db, user_id, disc.id)
-            for module_obj in disc.modules:
-                # Module progress
-                module_obj.progress = crud_user_progress.get_module_progress(db, user_id, module_obj.id)
-                for lesson_obj in module_obj.lessons:
-                    # Lesson completion status
-                    lesson_obj.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson_obj.id)
-    return disciplines
+        _add_progress(db, user_id, page.items, view)
+    return page
 
 def create_discipline(db: Session, discipline_data: schemas.DisciplineCreate) -> models.Discipline:
     try:
@@ -85,6 +91,7 @@ def create_discipline(db: Session, discipline_data: schemas.DisciplineCreate) ->
         db.add(db_discipline)
         db.commit()
         db.refresh(db_discipline)
+        crud_suggest.index_title(crud_suggest.KIND_DISCIPLINE, db_discipline.id, db_discipline.title)
         return db_discipline
     except DuplicateEntryException:
         raise
@@ -109,6 +116,7 @@ def update_discipline(db: Session, discipline_id: int, discipline_update: schema
         db.add(updated_discipline) # or just db.add(db_discipline) as it's the same object
         db.commit()
         db.refresh(updated_discipline)
+        crud_suggest.index_title(crud_suggest.KIND_DISCIPLINE, updated_discipline.id, updated_discipline.title)
         return updated_discipline
     except (NotFoundException, DuplicateEntryException):
         raise
@@ -123,8 +131,14 @@ def delete_discipline(db: Session, discipline_id: int) -> bool:
         if not db_discipline:
             raise NotFoundException(entity_name="Дисциплина для удаления", entity_id=discipline_id)
             
+        crud_statistics.record_content_removed(
+            db, models.Lesson.module_id.in_(select(models.Module.id).where(models.Module.discipline_id == discipline_id))
+        )
         db.delete(db_discipline)
         db.commit()
+        graders.clear_graders()
+        # Вместе с дисциплиной удалены ее модули и уроки
+        crud_suggest.invalidate()
         return True
     except NotFoundException:
         raise
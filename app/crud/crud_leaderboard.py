@@ -0,0 +1,176 @@
+# app/crud/crud_leaderboard.py
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from core.cache import Cache
+from core.ranking import RankedScores
+from app.exceptions.crud_exceptions import NotFoundException, InvalidInputException
+
+import logging
+logger = logging.getLogger(__name__)
+
+BOARD_GLOBAL = "global"
+BOARD_WEEKLY = "weekly"
+BOARD_DISCIPLINE = "discipline"
+
+# --- Рейтинги в памяти процесса ---
+# Каждый процесс держит свою копию: она строится из БД при первом обращении и периодически
+# (LEADERBOARD_REFRESH_INTERVAL), а между перестроениями обновляется при начислениях XP
+# в этом процессе. Начисления в других процессах становятся видны после перестроения.
+class _Boards:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.global_board = RankedScores()
+        self.weekly_board = RankedScores()
+        self.week_start: Optional[date] = None
+        self.discipline_boards: Dict[int, RankedScores] = {}
+
+_boards = _Boards()
+
+# Дисциплина вопроса не меняется при ответах - кэшируем, чтобы не делать join на каждый ответ
+_question_disciplines = Cache(ttl=constants.CACHE_TTL, max_size=constants.MAX_CACHE_SIZE * 10, name="question_disciplines")
+
+def _week_start(moment: datetime) -> date:
+    day = moment.astimezone(timezone.utc).date()
+    return day - timedelta(days=day.weekday())
+
+def load_boards(db: Session) -> None:
+    """Rebuilds all boards from users.xp_points and xp_events and swaps them in at once."""
+    now = datetime.now(timezone.utc)
+    week_start = _week_start(now)
+
+    global_board = RankedScores()
+    for user_id, xp in db.execute(select(models.User.id, models.User.xp_points).where(models.User.is_active == True)):
+        global_board.set(user_id, xp or 0)
+
+    active_users = select(models.User.id).where(models.User.is_active == True)
+    weekly_board = RankedScores()
+    week_start_at = datetime.combine(week_start, time.min, tzinfo=timezone.utc)
+    for user_id, xp in db.execute(
+        select(models.XpEvent.user_id, func.sum(models.XpEvent.amount))
+        .where(models.XpEvent.awarded_at >= week_start_at, models.XpEvent.user_id.in_(active_users))
+        .group_by(models.XpEvent.user_id)
+    ):
+        weekly_board.set(user_id, int(xp))
+
+    discipline_boards: Dict[int, RankedScores] = {}
+    for discipline_id, user_id, xp in db.execute(
+        select(models.XpEvent.discipline_id, models.XpEvent.user_id, func.sum(models.XpEvent.amount))
+        .where(models.XpEvent.discipline_id.isnot(None), models.XpEvent.user_id.in_(active_users))
+        .group_by(models.XpEvent.discipline_id, models.XpEvent.user_id)
+    ):
+        discipline_boards.setdefault(discipline_id, RankedScores()).set(user_id, int(xp))
+
+    with _boards.lock:
+        _boards.global_board = global_board
+        _boards.weekly_board = weekly_board
+        _boards.week_start = week_start
+        _boards.discipline_boards = discipline_boards
+        _boards.loaded = True
+    logger.info(f"Leaderboards rebuilt: {len(global_board)} users, {len(discipline_boards)} disciplines")
+
+def _ensure_loaded(db: Session) -> None:
+    if not _boards.loaded:
+        load_boards(db)
+
+# --- Начисление XP ---
+def question_discipline_id(db: Session, question_id: int) -> Optional[int]:
+    cached = _question_disciplines.get(question_id)
+    if cached is not None:
+        return cached
+    discipline_id = db.execute(
+        select(models.Module.discipline_id)
+        .join(models.Lesson, models.Lesson.module_id == models.Module.id)
+        .join(models.LessonBlock, models.LessonBlock.lesson_id == models.Lesson.id)
+        .join(models.Question, models.Question.lesson_block_id == models.LessonBlock.id)
+        .where(models.Question.id == question_id)
+    ).scalar()
+    if discipline_id is not None:
+        _question_disciplines.set(question_id, discipline_id)
+    return discipline_id
+
+def record_xp(db: Session, user_id: int, amount: int, discipline_id: Optional[int]) -> None:
+    """Appends the award to xp_events in the caller's transaction (no commit)."""
+    if amount:
+        db.execute(insert(models.XpEvent).values(user_id=user_id, discipline_id=discipline_id, amount=amount))
+
+def apply_xp(user_id: int, amount: int, discipline_id: Optional[int], total_xp: Optional[int] = None) -> None:
+    """Updates the in-memory boards after the award is committed; O(log n) per board."""
+    if not amount or not _boards.loaded:
+        return
+    with _boards.lock:
+        if total_xp is not None:
+            _boards.global_board.set(user_id, total_xp)
+        else:
+            _boards.global_board.increment(user_id, amount)
+
+        week_start = _week_start(datetime.now(timezone.utc))
+        if week_start != _boards.week_start:
+            # Началась новая неделя: недельный рейтинг начинается заново
+            _boards.weekly_board = RankedScores()
+            _boards.week_start = week_start
+        _boards.weekly_board.increment(user_id, amount)
+
+        if discipline_id is not None:
+            _boards.discipline_boards.setdefault(discipline_id, RankedScores()).increment(user_id, amount)
+
+# --- Чтение ---
+def _board(board: str, discipline_id: Optional[int]) -> RankedScores:
+    if board == BOARD_GLOBAL:
+        return _boards.global_board
+    if board == BOARD_WEEKLY:
+        if _boards.week_start != _week_start(datetime.now(timezone.utc)):
+            return RankedScores()
+        return _boards.weekly_board
+    if discipline_id is None:
+        raise InvalidInputException("Для рейтинга по дисциплине нужен discipline_id.")
+    return _boards.discipline_boards.get(discipline_id) or RankedScores()
+
+def _entries(db: Session, start: int, members: List[tuple]) -> List[Dict[str, Any]]:
+    names = dict(db.execute(
+        select(models.User.id, models.User.full_name).where(models.User.id.in_([user_id for user_id, _ in members]))
+    ).all()) if members else {}
+    return [
+        {"rank": start + offset + 1, "user_id": user_id, "full_name": names.get(user_id), "xp": xp}
+        for offset, (user_id, xp) in enumerate(members)
+    ]
+
+def get_top(db: Session, board: str = BOARD_GLOBAL, discipline_id: Optional[int] = None,
+            skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+    """Entries ranked skip+1 .. skip+limit (ranks are 1-based)."""
+    _ensure_loaded(db)
+    with _boards.lock:
+        members = _board(board, discipline_id).range(skip, skip + limit)
+    return _entries(db, skip, members)
+
+def get_around(db: Session, user_id: int, board: str = BOARD_GLOBAL, discipline_id: Optional[int] = None,
+               neighbours: int = 5) -> Dict[str, Any]:
+    """The user's rank plus up to `neighbours` entries above and below."""
+    _ensure_loaded(db)
+    if board == BOARD_GLOBAL and user_id not in _boards.global_board:
+        # Пользователь зарегистрирован после последнего перестроения
+        xp = db.execute(select(models.User.xp_points).where(models.User.id == user_id, models.User.is_active == True)).scalar()
+        if xp is not None:
+            with _boards.lock:
+                _boards.global_board.set(user_id, xp)
+    with _boards.lock:
+        ranked = _board(board, discipline_id)
+        position = ranked.rank(user_id)
+        if position is None:
+            raise NotFoundException(entity_name="Пользователь в рейтинге", entity_id=user_id)
+        start = max(position - neighbours, 0)
+        members = ranked.range(start, position + neighbours + 1)
+        total = len(ranked)
+    return {
+        "rank": position + 1,
+        "xp": members[position - start][1],
+        "total": total,
+        "entries": _entries(db, start, members)
+    }
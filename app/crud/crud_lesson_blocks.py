@@ -1,13 +1,16 @@
 # app/crud/crud_lesson_blocks.py
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import LargeBinary, cast, func, select
+from sqlalchemy.orm import Session, selectinload, undefer
 
 import models
 import schemas
 from .utils import update_db_object
 from core.cache import cached # Исправленный импорт
+from app.grading import graders
 from . import constants # Corrected import
+from . import content_diff
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 
 import logging
@@ -20,6 +23,7 @@ from . import crud_user_progress # Corrected import
 def get_lesson_block(db: Session, block_id: int, user_id: Optional[int] = None) -> models.LessonBlock:
     query = db.query(models.LessonBlock).filter(models.LessonBlock.id == block_id)
     query = query.options(
+        undefer(models.LessonBlock.theory_text), # Полный текст для редактирования (schemas.LessonBlockAdmin)
         selectinload(models.LessonBlock.questions)
         .selectinload(models.Question.options),
         selectinload(models.LessonBlock.lesson) # Eager load lesson for user progress check
@@ -62,6 +66,40 @@ def get_lesson_blocks(db: Session, lesson_id: int, user_id: Optional[int] = None
             # TODO: Augment questions with user answers if needed.
     return blocks
 
+# --- Длинная теория: размер и чтение по частям без загрузки текста целиком ---
+def get_theory_size(db: Session, block_id: int) -> int:
+    """Size of the block's theory text in UTF-8 bytes."""
+    size = db.execute(select(models.LessonBlock.theory_size).where(models.LessonBlock.id == block_id)).scalar()
+    if size is None:
+        raise NotFoundException(entity_name="Текст теории блока", entity_id=block_id)
+    return size
+
+def read_theory(db: Session, block_id: int, offset: int, length: int) -> bytes:
+    """Bytes [offset, offset + length) of the block's theory text in UTF-8."""
+    raw_connection = db.connection().connection.driver_connection
+    if hasattr(raw_connection, "blobopen"):
+        # Инкрементальное чтение SQLite (Python 3.11+): читаются только страницы нужного куска значения.
+        # Дескриптор закрывается сразу - между кусками блокировка чтения не держится
+        with raw_connection.blobopen(models.LessonBlock.__tablename__, "theory_text", block_id, readonly=True) as blob:
+            if offset >= len(blob):
+                return b""
+            blob.seek(offset)
+            return blob.read(length)
+    return db.execute(
+        select(func.substr(cast(models.LessonBlock.theory_text, LargeBinary), offset + 1, length))
+        .where(models.LessonBlock.id == block_id)
+    ).scalar() or b""
+
+def iter_theory(db: Session, block_id: int, start: int, end: int, chunk_size: int = constants.THEORY_CHUNK_BYTES) -> Iterator[bytes]:
+    """Theory bytes [start, end) in chunks of at most chunk_size."""
+    position = start
+    while position < end:
+        chunk = read_theory(db, block_id, position, min(chunk_size, end - position))
+        if not chunk:
+            break
+        yield chunk
+        position += len(chunk)
+
 def create_lesson_block(db: Session, lesson_id: int, block_data: schemas.LessonBlockCreate) -> models.LessonBlock:
     # Original crud.py lines 633-668
     try:
@@ -88,6 +126,9 @@ def create_lesson_block(db: Session, lesson_id: int, block_data: schemas.LessonB
                     question_type=question_schema.question_type,
                     general_explanation=question_schema.general_explanation,
                     correct_answer_text=question_schema.correct_answer_text,
+                    accepted_answers=question_schema.accepted_answers,
+                    answer_max_typos=question_schema.answer_max_typos,
+                    answer_ignore_word_order=question_schema.answer_ignore_word_order,
                     lesson_block=db_block # Assign to block
                 )
                 # db.add(db_question) # Let cascade handle or add explicitly if issues
@@ -119,9 +160,7 @@ def create_lesson_block(db: Session, lesson_id: int, block_data: schemas.LessonB
 def update_lesson_block(db: Session, block_id: int, block_update: schemas.LessonBlockUpdate) -> models.LessonBlock:
     # Original crud.py lines 670-758
     try:
-        db_block = db.query(models.LessonBlock).options(
-            selectinload(models.LessonBlock.questions).selectinload(models.Question.options)
-        ).filter(models.LessonBlock.id == block_id).first()
+        db_block = db.query(models.LessonBlock).filter(models.LessonBlock.id == block_id).first()
 
         if not db_block:
             raise NotFoundException(entity_name="Блок урока для обновления", entity_id=block_id)
@@ -132,79 +171,21 @@ def update_lesson_block(db: Session, block_id: int, block_update: schemas.Lesson
             if hasattr(db_block, key):
                 setattr(db_block, key, value)
 
-        # Handle questions update if provided in the payload
+        # Вопросы и варианты: дифф вычисляется один раз и применяется пакетными INSERT/UPDATE/DELETE
+        changeset = None
         if block_update.questions is not None and db_block.block_type == models.LessonBlockType.EXERCISE:
-            existing_questions_map = {q.id: q for q in db_block.questions}
-            updated_question_ids = set()
-
-            for q_update_schema in block_update.questions:
-                if q_update_schema.id and q_update_schema.id in existing_questions_map:
-                    # Update existing question
-                    db_question = existing_questions_map[q_update_schema.id]
-                    updated_question_ids.add(db_question.id)
-                    
-                    # Update question scalar fields
-                    q_scalar_data = q_update_schema.model_dump(exclude_unset=True, exclude={"options", "id"})
-                    for key, value in q_scalar_data.items():
-                        if hasattr(db_question, key):
-                            setattr(db_question, key, value)
-                    
-                    # Update options for this question
-                    if q_update_schema.options is not None:
-                        existing_options_map = {opt.id: opt for opt in db_question.options}
-                        updated_option_ids = set()
-                        for opt_update_schema in q_update_schema.options:
-                            if opt_update_schema.id and opt_update_schema.id in existing_options_map:
-                                # Update existing option
-                                db_option = existing_options_map[opt_update_schema.id]
-                                updated_option_ids.add(db_option.id)
-                                opt_scalar_data = opt_update_schema.model_dump(exclude_unset=True, exclude={"id"})
-                                for key, value in opt_scalar_data.items():
-                                    if hasattr(db_option, key):
-                                        setattr(db_option, key, value)
-                            else:
-                                # Create new option
-                                new_option = models.QuestionOption(
-                                    **opt_update_schema.model_dump(exclude={"id"}), 
-                                    question_id=db_question.id
-                                )
-                                db.add(new_option) # Add to session, will be associated via question.options by SA
-                        
-                        # Delete options not in the update payload for this question
-                        for opt_id_to_delete in list(existing_options_map.keys() - updated_option_ids):
-                            db.delete(existing_options_map[opt_id_to_delete])
-                
-                elif not q_update_schema.id: # New question (id is None or not provided)
-                    # Create new question with its options
-                    new_question = models.Question(
-                        text=q_update_schema.text,
-                        question_type=q_update_schema.question_type,
-                        general_explanation=q_update_schema.general_explanation,
-                        correct_answer_text=q_update_schema.correct_answer_text,
-                        lesson_block_id=db_block.id # Associate with current block
-                    )
-                    if q_update_schema.options:
-                        for opt_schema in q_update_schema.options:
-                            new_option = models.QuestionOption(
-                                text=opt_schema.text,
-                                is_correct=opt_schema.is_correct,
-                                question=new_question # Associate with new question
-                            )
-                            # new_question.options.append(new_option) # SA should handle this if relationship is correct
-                    db.add(new_question)
-            
-            # Delete questions not in the update payload for this block
-            for q_id_to_delete in list(existing_questions_map.keys() - updated_question_ids):
-                question_to_delete = existing_questions_map[q_id_to_delete]
-                # Manually delete options of the question to be deleted, if cascade is not 'all, delete-orphan' on Question.options
-                for opt_to_delete in question_to_delete.options:
-                    db.delete(opt_to_delete)
-                db.delete(question_to_delete)
-
-        db.add(db_block) # Add block to session again in case of changes
+            existing_state = content_diff.load_questions_state(db, block_id=block_id)
+            changeset = content_diff.diff_block_questions(block_id, existing_state, block_update.questions)
+            content_diff.apply_changeset(db, changeset)
+
         db.commit()
-        db.refresh(db_block)
-        return db_block
+        if changeset is not None:
+            for question_id in changeset.touched_question_ids:
+                graders.invalidate_grader(question_id)
+
+        return db.query(models.LessonBlock).options(
+            selectinload(models.LessonBlock.questions).selectinload(models.Question.options)
+        ).filter(models.LessonBlock.id == block_id).first()
 
     except NotFoundException:
         raise
@@ -226,6 +207,7 @@ def delete_lesson_block(db: Session, block_id: int) -> bool:
         
         db.delete(db_block)
         db.commit()
+        graders.clear_graders()
         return True
     except NotFoundException:
         raise
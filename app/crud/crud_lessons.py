@@ -6,10 +6,14 @@ from sqlalchemy import and_, select, literal_column
 
 import models
 import schemas
-from .utils import update_db_object
+from .utils import Page, paginate, update_db_object
 from core.cache import cached # Исправленный импорт
+from app.grading import graders
 from . import constants # Ensured constants import is correct form
 from . import crud_user_progress # Added import for crud_user_progress
+from . import crud_statistics
+from . import crud_suggest
+from . import content_view
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 
 import logging
@@ -17,20 +21,21 @@ logger = logging.getLogger(__name__)
 
 # --- CRUD для Уроков (Lesson) ---
 @cached(ttl=constants.CACHE_TTL) # Add if get_lesson was cached
-def get_lesson(db: Session, lesson_id: int, user_id: Optional[int] = None) -> models.Lesson:
+def get_lesson(db: Session, lesson_id: int, user_id: Optional[int] = None,
+               view: Optional[content_view.ContentView] = None) -> models.Lesson:
     query = db.query(models.Lesson).filter(models.Lesson.id == lesson_id)
     # Eager load related data like blocks, questions, options
-    query = query.options(
+    query = query.options(*content_view.load_options(models.Lesson, view, [
         selectinload(models.Lesson.blocks)
         .selectinload(models.LessonBlock.questions)
         .selectinload(models.Question.options)
-    )
+    ]))
     lesson = query.first()
 
     if not lesson:
         raise NotFoundException(entity_name="Урок", entity_id=lesson_id)
 
-    if user_id:
+    if user_id and content_view.wants(view, "is_completed_by_user"):
         # Augment with user-specific progress
         lesson.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson.id)
         # The original crud.py (lines 426-434) had a subquery for completion status directly in the query.
@@ -49,32 +54,37 @@ def get_lesson_by_title(db: Session, title: str, module_id: int) -> Optional[mod
         models.Lesson.module_id == module_id
     ).first()
 
-def get_lessons_by_module(db: Session, module_id: int, user_id: Optional[int] = None, skip: int = 0, limit: int = 100) -> List[models.Lesson]:
+def get_lessons_by_module(db: Session, module_id: int, user_id: Optional[int] = None, skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None, view: Optional[content_view.ContentView] = None) -> Page:
     query = db.query(models.Lesson)\
-        .filter(models.Lesson.module_id == module_id)\
-        .order_by(models.Lesson.order)
+        .filter(models.Lesson.module_id == module_id)
     
-    query = query.options(
+    # Eager load fully: blocks -> questions -> options (a list view usually asks for less via view)
+    query = query.options(*content_view.load_options(models.Lesson, view, [
         selectinload(models.Lesson.blocks)
         .selectinload(models.LessonBlock.questions) 
-        .selectinload(models.Question.options) # Eager load fully: blocks -> questions -> options
-    )
+        .selectinload(models.Question.options)
+    ]))
 
-    lessons = query.offset(skip).limit(limit).all()
+    page = paginate(query, [models.Lesson.order, models.Lesson.id], skip, limit, cursor)
+    lessons = page.items
 
-    if user_id:
+    if user_id and content_view.wants(view, "is_completed_by_user"):
+        # Завершенные уроки страницы - одним запросом
+        completed = crud_user_progress.get_completed_lesson_ids(db, user_id, [lesson_obj.id for lesson_obj in lessons])
         for lesson_obj in lessons:
-            lesson_obj.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson_obj.id)
+            lesson_obj.is_completed_by_user = lesson_obj.id in completed
             # Similar to get_lesson, individual question answers within blocks are not explicitly augmented here
             # based on the original crud.py snippet for get_lessons_by_module.
-    return lessons
+    return page
 
-def get_all_lessons(db: Session, skip: int = 0, limit: int = 100) -> List[models.Lesson]:
+def get_all_lessons(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
     # Original crud.py lines 464-468 (get_all_lessons, simpler than by_module)
-    return db.query(models.Lesson).options(
-        selectinload(models.Lesson.blocks).selectinload(models.LessonBlock.questions).selectinload(models.Question.options),
-        selectinload(models.Lesson.module) # Also load parent module
-    ).order_by(models.Lesson.module_id, models.Lesson.order).offset(skip).limit(limit).all()
+    # schemas.Lesson не отдает родительский модуль, поэтому он не загружается
+    query = db.query(models.Lesson).options(
+        selectinload(models.Lesson.blocks).selectinload(models.LessonBlock.questions).selectinload(models.Question.options)
+    )
+    return paginate(query, [models.Lesson.module_id, models.Lesson.order, models.Lesson.id], skip, limit, cursor)
 
 def create_lesson(db: Session, lesson_data: schemas.LessonCreate) -> models.Lesson:
     # Original crud.py lines 471-523
@@ -118,6 +128,9 @@ def create_lesson(db: Session, lesson_data: schemas.LessonCreate) -> models.Less
                             question_type=question_schema.question_type,
                             general_explanation=question_schema.general_explanation,
                             correct_answer_text=question_schema.correct_answer_text,
+                            accepted_answers=question_schema.accepted_answers,
+                            answer_max_typos=question_schema.answer_max_typos,
+                            answer_ignore_word_order=question_schema.answer_ignore_word_order,
                             lesson_block=db_block # Assign to block directly
                         )
                         # db.add(db_question)
@@ -133,8 +146,10 @@ def create_lesson(db: Session, lesson_data: schemas.LessonCreate) -> models.Less
                                 # db.add(db_option)
         
         db.add(db_lesson) # Add the top-level lesson, cascades should save children if configured
+        crud_statistics.increment(db, crud_statistics.TOTAL_LESSONS)
         db.commit()
         db.refresh(db_lesson) # Refresh to get IDs and load relationships
+        crud_suggest.index_title(crud_suggest.KIND_LESSON, db_lesson.id, db_lesson.title, db_lesson.module_id)
         
         return db_lesson
         
@@ -184,6 +199,7 @@ def update_lesson(db: Session, lesson_id: int, lesson_update: schemas.LessonUpda
         db.add(db_lesson)
         db.commit()
         db.refresh(db_lesson)
+        crud_suggest.index_title(crud_suggest.KIND_LESSON, db_lesson.id, db_lesson.title, db_lesson.module_id)
         return db_lesson
     except (NotFoundException, DuplicateEntryException):
         raise
@@ -209,8 +225,11 @@ def delete_lesson(db: Session, lesson_id: int) -> bool:
         # delete blocks for lesson
         # db.query(models.LessonBlock).filter(models.LessonBlock.lesson_id == lesson_id).delete()
 
+        crud_statistics.record_content_removed(db, models.Lesson.id == lesson_id)
         db.delete(db_lesson)
         db.commit()
+        graders.clear_graders()
+        crud_suggest.remove_title(crud_suggest.KIND_LESSON, lesson_id)
         return True
     except NotFoundException:
         raise
@@ -1,32 +1,35 @@
 # app/crud/crud_modules.py
 from typing import List, Optional
 
-from sqlalchemy.orm import Session, selectinload, joinedload
-from sqlalchemy import and_, select
+from sqlalchemy.orm import Session, selectinload, joinedload, load_only
+from sqlalchemy import and_, func, select
 
 import models
 import schemas
-from .utils import update_db_object
+from .utils import Page, paginate, update_db_object
 # from core.cache import cached # If get_module was cached
 # from .constants import CACHE_TTL # If get_module was cached
 from core.cache import cached # Исправленный импорт
+from app.grading import graders
 from . import constants # Added import
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, DatabaseOperationException
 
 import logging
 # import crud_user_progress
 from . import crud_user_progress # Corrected import
+from . import content_view
+from . import crud_statistics
+from . import crud_suggest
 
 logger = logging.getLogger(__name__)
 
 # --- CRUD для Модулей (Module) ---
 @cached(ttl=constants.CACHE_TTL) # Add if get_module was cached in original crud.py
-def get_module(db: Session, module_id: int, user_id: Optional[int] = None) -> models.Module:
+def get_module(db: Session, module_id: int, user_id: Optional[int] = None,
+               view: Optional[content_view.ContentView] = None) -> models.Module:
     query = db.query(models.Module).filter(models.Module.id == module_id)
-    query = query.options(
-        selectinload(models.Module.lessons)
-        # .selectinload(models.Lesson.user_progress).filter(...) # If detailed progress per lesson needed
-    ) # Add other eager loads if necessary, e.g., for discipline relationship
+    # Eager load the whole tree the schema returns (or only the part the view asks for)
+    query = query.options(*content_view.load_options(models.Module, view, [_module_tree_options()]))
     
     module = query.first()
 
@@ -35,41 +38,101 @@ def get_module(db: Session, module_id: int, user_id: Optional[int] = None) -> mo
 
     if user_id:
         # Augment with progress information
-        # Module progress (total vs completed lessons in module)
-        module.progress = crud_user_progress.get_module_progress(db, user_id, module.id)
-        for lesson_obj in module.lessons:
-            # Lesson completion status
-            lesson_obj.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson_obj.id)
+        _add_progress(db, user_id, [module], view)
     
     return module
 
+def _add_progress(db: Session, user_id: int, modules: List[models.Module], view: Optional[content_view.ContentView]) -> None:
+    # Прогресс считается только для уровней и полей, которые попадут в ответ, - одним запросом на уровень
+    if content_view.wants(view, "progress"):
+        # Module progress (total vs completed lessons in module)
+        progress = crud_user_progress.get_modules_progress(db, user_id, [mod.id for mod in modules])
+        for mod in modules:
+            mod.progress = progress[mod.id]
+    if not content_view.reaches(view, 1) or not content_view.wants(view, "is_completed_by_user"):
+        return
+    lessons = [lesson_obj for mod in modules for lesson_obj in mod.lessons]
+    completed = crud_user_progress.get_completed_lesson_ids(db, user_id, [lesson_obj.id for lesson_obj in lessons])
+    for lesson_obj in lessons:
+        # Lesson completion status
+        lesson_obj.is_completed_by_user = lesson_obj.id in completed
+
 def get_module_by_title(db: Session, title: str, discipline_id: int) -> Optional[models.Module]:
     return db.query(models.Module).filter(
         models.Module.title == title,
         models.Module.discipline_id == discipline_id
     ).first()
 
-def get_modules_by_discipline(db: Session, discipline_id: int, skip: int = 0, limit: int = 100, user_id: Optional[int] = None) -> List[models.Module]:
+def _module_tree_options():
+    # Все, что отдает schemas.Module, одним пакетом запросов на страницу
+    return selectinload(models.Module.lessons)\
+        .selectinload(models.Lesson.blocks)\
+        .selectinload(models.LessonBlock.questions)\
+        .selectinload(models.Question.options)
+
+def get_modules_by_discipline(db: Session, discipline_id: int, skip: int = 0, limit: int = 100, user_id: Optional[int] = None,
+                              cursor: Optional[str] = None, view: Optional[content_view.ContentView] = None) -> Page:
     query = db.query(models.Module)\
-        .filter(models.Module.discipline_id == discipline_id)\
-        .order_by(models.Module.order)
+        .filter(models.Module.discipline_id == discipline_id)
     
-    query = query.options(selectinload(models.Module.lessons))
+    query = query.options(*content_view.load_options(models.Module, view, [_module_tree_options()]))
     
-    modules = query.offset(skip).limit(limit).all()
+    page = paginate(query, [models.Module.order, models.Module.id], skip, limit, cursor)
 
     if user_id:
-        for mod in modules:
-            # Module progress
-            mod.progress = crud_user_progress.get_module_progress(db, user_id, mod.id)
-            for lesson_obj in mod.lessons:
-                # Lesson completion status
-                lesson_obj.is_completed_by_user = crud_user_progress.get_lesson_completion_status(db, user_id, lesson_obj.id)
-    return modules
-
-def get_all_modules(db: Session, skip: int = 0, limit: int = 100) -> List[models.Module]:
+        _add_progress(db, user_id, page.items, view)
+    return page
+
+def get_module_outline(db: Session, module_id: int, user_id: Optional[int] = None) -> models.Module:
+    """Module with lessons and blocks for schemas.ModuleOutline: titles, order, question counts and completion only."""
+    module = db.query(models.Module).filter(models.Module.id == module_id).options(
+        load_only(models.Module.id, models.Module.discipline_id, models.Module.title, models.Module.order),
+        selectinload(models.Module.lessons)
+        .load_only(models.Lesson.id, models.Lesson.module_id, models.Lesson.title, models.Lesson.order)
+        .selectinload(models.Lesson.blocks)
+        # Теория (theory_text и theory_inline) не читается из базы; raiseload - ошибка вместо тихой догрузки
+        .load_only(models.LessonBlock.id, models.LessonBlock.lesson_id, models.LessonBlock.order_in_lesson,
+                   models.LessonBlock.block_type, raiseload=True)
+    ).first()
+    if not module:
+        raise NotFoundException(entity_name="Модуль", entity_id=module_id)
+
+    # Вопросы не загружаются - только их число по блокам, одним запросом на модуль
+    questions_count = dict(db.execute(
+        select(models.Question.lesson_block_id, func.count(models.Question.id))
+        .join(models.LessonBlock, models.LessonBlock.id == models.Question.lesson_block_id)
+        .join(models.Lesson, models.Lesson.id == models.LessonBlock.lesson_id)
+        .where(models.Lesson.module_id == module_id)
+        .group_by(models.Question.lesson_block_id)
+    ).all())
+    for lesson_obj in module.lessons:
+        for block in lesson_obj.blocks:
+            block.questions_count = questions_count.get(block.id, 0)
+
+    if user_id:
+        # Завершенные уроки модуля одним запросом вместо запроса на каждый урок; из них же - прогресс модуля
+        completed = set(db.scalars(
+            select(models.UserLessonProgress.lesson_id)
+            .join(models.Lesson, models.Lesson.id == models.UserLessonProgress.lesson_id)
+            .where(
+                models.Lesson.module_id == module_id,
+                models.UserLessonProgress.user_id == user_id,
+                models.UserLessonProgress.completed_at.isnot(None)
+            )
+        ))
+        for lesson_obj in module.lessons:
+            lesson_obj.is_completed_by_user = lesson_obj.id in completed
+        total_lessons = len(module.lessons)
+        module.progress = {
+            "completed_lessons_count": len(completed),
+            "total_lessons_count": total_lessons,
+            "progress_percent": int((len(completed) / total_lessons) * 100) if total_lessons > 0 else 0
+        }
+    return module
+
+def get_all_modules(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
     # Assuming this does not need user_id specific data, or it would be handled like get_modules_by_discipline
-    return db.query(models.Module).order_by(models.Module.id).offset(skip).limit(limit).all()
+    return paginate(db.query(models.Module).options(_module_tree_options()), [models.Module.id], skip, limit, cursor)
 
 def create_module(db: Session, module_data: schemas.ModuleCreate) -> models.Module:
     try:
@@ -87,6 +150,7 @@ def create_module(db: Session, module_data: schemas.ModuleCreate) -> models.Modu
         db.add(db_module)
         db.commit()
         db.refresh(db_module)
+        crud_suggest.index_title(crud_suggest.KIND_MODULE, db_module.id, db_module.title, db_module.discipline_id)
         return db_module
     except (NotFoundException, DuplicateEntryException):
         raise
@@ -117,6 +181,7 @@ def update_module(db: Session, module_id: int, module_update: schemas.ModuleUpda
         db.add(updated_module)
         db.commit()
         db.refresh(updated_module)
+        crud_suggest.index_title(crud_suggest.KIND_MODULE, updated_module.id, updated_module.title, updated_module.discipline_id)
         return updated_module
     except (NotFoundException, DuplicateEntryException):
         raise
@@ -130,8 +195,12 @@ def delete_module(db: Session, module_id: int) -> bool:
         db_module = db.query(models.Module).filter(models.Module.id == module_id).first()
         if not db_module:
             raise NotFoundException(entity_name="Модуль для удаления", entity_id=module_id)
+        crud_statistics.record_content_removed(db, models.Lesson.module_id == module_id)
         db.delete(db_module)
         db.commit()
+        graders.clear_graders()
+        # Вместе с модулем удалены его уроки
+        crud_suggest.invalidate()
         return True
     except NotFoundException:
         raise
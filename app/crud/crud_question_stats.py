@@ -0,0 +1,149 @@
+# app/crud/crud_question_stats.py
+import itertools
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.analytics import item_stats
+from app.exceptions.crud_exceptions import NotFoundException, DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Загрузка данных в массивы ---
+def load_answer_arrays(db: Session, batch_size: int = constants.ANALYTICS_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Streams the first attempt of every (user, question) pair from answer_attempts as three int64 arrays
+    (question_id, user_id, is_correct) without building ORM objects.
+
+    Item analysis assumes one response per learner and question: the first attempt measures difficulty,
+    while the latest state (user_question_progress) reflects retries after the correct answer was shown.
+    """
+    attempt = models.AnswerAttempt
+    first_ids = select(func.min(attempt.id).label("id")).group_by(attempt.user_id, attempt.question_id).subquery()
+    result = db.execute(
+        select(attempt.question_id, attempt.user_id, attempt.is_correct)
+        .join(first_ids, first_ids.c.id == attempt.id)
+        .execution_options(yield_per=batch_size)
+    )
+    chunks = [
+        np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+        for rows in result.partitions()
+    ]
+    data = np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+def load_question_layout(db: Session) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (question_ids, lesson_ids) ordered by lesson, block order and question id (the order learners see them)."""
+    rows = db.execute(
+        select(models.Question.id, models.LessonBlock.lesson_id)
+        .join(models.LessonBlock, models.LessonBlock.id == models.Question.lesson_block_id)
+        .order_by(models.LessonBlock.lesson_id, models.LessonBlock.order_in_lesson, models.LessonBlock.id, models.Question.id)
+    ).all()
+    layout = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return layout[:, 0], layout[:, 1]
+
+# --- Пересчет ---
+def compute_question_stats(question_ids: np.ndarray, lesson_ids: np.ndarray,
+                           answer_question_ids: np.ndarray, answer_user_ids: np.ndarray, answer_correct: np.ndarray,
+                           min_answers: int = constants.QUESTION_STATS_MIN_ANSWERS) -> Dict[str, np.ndarray]:
+    """
+    Computes per-question stats in the layout order of question_ids.
+
+    Answers to questions missing from the layout (deleted meanwhile) are dropped.
+    """
+    n_questions = len(question_ids)
+    question_index = item_stats.position_in(answer_question_ids, question_ids)
+    known = question_index >= 0
+    question_index = question_index[known]
+    n_users, user_index = item_stats.compact_index(answer_user_ids[known])
+    correct = answer_correct[known]
+
+    stats = item_stats.question_statistics(question_index, user_index, correct, n_questions, min_answers)
+
+    n_lessons, question_lesson = item_stats.compact_index(lesson_ids)
+    learners = item_stats.distinct_pair_counts(question_index, user_index, n_questions, max(n_users, 1))
+    lesson_learners = item_stats.distinct_pair_counts(question_lesson[question_index], user_index, n_lessons, max(n_users, 1))
+    positions = item_stats.positions_within_groups(lesson_ids)
+    funnels = item_stats.lesson_funnels(learners, question_lesson, positions, lesson_learners)
+
+    return {
+        "question_id": question_ids,
+        "lesson_id": lesson_ids,
+        "funnel_position": positions,
+        "learners": learners,
+        **stats,
+        **funnels,
+    }
+
+def _as_optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else float(value)
+
+def recompute_question_stats(db: Session) -> int:
+    """Full recompute from answer_attempts; replaces question_stats in one transaction. Returns the number of rows."""
+    try:
+        question_ids, lesson_ids = load_question_layout(db)
+        answer_question_ids, answer_user_ids, answer_correct = load_answer_arrays(db)
+        stats = compute_question_stats(question_ids, lesson_ids, answer_question_ids, answer_user_ids, answer_correct)
+
+        computed_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "question_id": int(question_id),
+                "lesson_id": int(lesson_id),
+                "funnel_position": int(position),
+                "answers": int(answers),
+                "correct_answers": int(correct),
+                "learners": int(learners),
+                "p_value": _as_optional(p_value),
+                "discrimination": _as_optional(discrimination),
+                "reach_rate": _as_optional(reach_rate),
+                "drop_off_rate": _as_optional(drop_off_rate),
+                "computed_at": computed_at,
+            }
+            for question_id, lesson_id, position, answers, correct, learners, p_value, discrimination, reach_rate, drop_off_rate in zip(
+                stats["question_id"].tolist(), stats["lesson_id"].tolist(), stats["funnel_position"].tolist(),
+                stats["answers"].tolist(), stats["correct_answers"].tolist(), stats["learners"].tolist(),
+                stats["p_value"].tolist(), stats["discrimination"].tolist(), stats["reach_rate"].tolist(), stats["drop_off_rate"].tolist()
+            )
+        ]
+        db.execute(delete(models.QuestionStats))
+        if rows:
+            # render_nulls: иначе ORM не вставляет None-значения, и каждая серия строк с другим набором
+            # NULL-столбцов (например, drop_off_rate первого вопроса урока) уходит отдельным запросом
+            db.execute(insert(models.QuestionStats).execution_options(render_nulls=True), rows)
+        db.commit()
+        logger.info(f"Question stats recomputed: {len(rows)} questions, {len(answer_question_ids)} answers")
+        return len(rows)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error recomputing question stats: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось пересчитать статистику вопросов: {str(e)}")
+
+# --- Чтение ---
+def get_question_stats(db: Session, lesson_id: Optional[int] = None, order_by: str = "p_value",
+                       descending: bool = False, skip: int = 0, limit: int = 100) -> List[models.QuestionStats]:
+    """Stats of existing questions; NULL values of the ordering field go last."""
+    column = getattr(models.QuestionStats, order_by)
+    query = select(models.QuestionStats).join(models.Question, models.Question.id == models.QuestionStats.question_id)
+    if lesson_id is not None:
+        query = query.where(models.QuestionStats.lesson_id == lesson_id)
+    query = query.order_by(column.is_(None), column.desc() if descending else column, models.QuestionStats.question_id)
+    return db.execute(query.offset(skip).limit(limit)).scalars().all()
+
+def get_lesson_funnel(db: Session, lesson_id: int) -> List[models.QuestionStats]:
+    """Stats of a lesson's questions in the order learners see them."""
+    if db.get(models.Lesson, lesson_id) is None:
+        raise NotFoundException(entity_name="Урок", entity_id=lesson_id)
+    return db.execute(
+        select(models.QuestionStats)
+        .join(models.Question, models.Question.id == models.QuestionStats.question_id)
+        .where(models.QuestionStats.lesson_id == lesson_id)
+        .order_by(models.QuestionStats.funnel_position)
+    ).scalars().all()
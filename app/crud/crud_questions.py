@@ -7,7 +7,9 @@ import models
 import schemas
 from .utils import update_db_object
 from core.cache import cached
+from app.grading import graders
 from . import constants
+from . import content_diff
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 
 import logging
@@ -79,6 +81,9 @@ def create_question(db: Session, block_id: int, question_data: schemas.QuestionC
             # order=question_data.order, # Original field was 'order', schema doesn't show for QuestionBase
             general_explanation=question_data.general_explanation,
             correct_answer_text=question_data.correct_answer_text,
+            accepted_answers=question_data.accepted_answers,
+            answer_max_typos=question_data.answer_max_typos,
+            answer_ignore_word_order=question_data.answer_ignore_word_order,
             lesson_block_id=block_id
         )
         # Add options if provided
@@ -123,7 +128,10 @@ def create_questions_batch(db: Session, block_id: int, questions_data: List[sche
                 text=question_schema.text,
                 question_type=question_schema.question_type,
                 general_explanation=question_schema.general_explanation,
-                correct_answer_text=question_schema.correct_answer_text
+                correct_answer_text=question_schema.correct_answer_text,
+                accepted_answers=question_schema.accepted_answers,
+                answer_max_typos=question_schema.answer_max_typos,
+                answer_ignore_word_order=question_schema.answer_ignore_word_order
             )
             temp_options_to_add = []
             if question_schema.options:
@@ -161,42 +169,18 @@ def update_question(db: Session, question_id: int, question_update: schemas.Ques
     """Updates a single question and its options."""
     # Logic derived from update_lesson_block for nested entities in original crud.py
     try:
-        db_question = db.query(models.Question).options(selectinload(models.Question.options)).filter(models.Question.id == question_id).first()
-        if not db_question:
+        existing_state = content_diff.load_questions_state(db, question_ids=[question_id])
+        if question_id not in existing_state:
             raise NotFoundException(entity_name="Вопрос для обновления", entity_id=question_id)
 
-        # Update scalar fields of the question
-        question_scalar_data = question_update.model_dump(exclude_unset=True, exclude={"options", "id"})
-        for key, value in question_scalar_data.items():
-            if hasattr(db_question, key):
-                setattr(db_question, key, value)
-        
-        # Handle options update
-        if question_update.options is not None:
-            existing_options_map = {opt.id: opt for opt in db_question.options}
-            updated_option_ids = set()
-
-            for opt_update_schema in question_update.options:
-                opt_update_data = opt_update_schema.model_dump()
-                if opt_update_data.get("id") and opt_update_data["id"] in existing_options_map:
-                    # Update existing option
-                    db_option = existing_options_map[opt_update_data["id"]]
-                    updated_option_ids.add(db_option.id)
-                    # Call crud_questions.update_question_option (or its logic directly)
-                    update_question_option(db, db_option.id, schemas.QuestionOptionUpdate(**opt_update_schema.model_dump(exclude_unset=True)))
-                else:
-                    # Create new option
-                    # Call crud_questions.create_question_option (or its logic directly)
-                    create_question_option(db, question_id, schemas.QuestionOptionCreate(**opt_update_schema.model_dump(exclude_unset=True, exclude={'id'})))
-            
-            # Delete options not present in the update
-            for opt_id_to_delete in list(existing_options_map.keys() - updated_option_ids):
-                delete_question_option(db, opt_id_to_delete)
-
-        db.add(db_question) # Re-add to session in case of changes to question itself
+        # Скалярные поля и варианты ответа обновляются одним диффом в одной транзакции
+        changeset = content_diff.QuestionChangeset()
+        content_diff.diff_question(changeset, question_id, existing_state[question_id], question_update)
+        content_diff.apply_changeset(db, changeset)
         db.commit()
-        db.refresh(db_question) # Refresh to get all changes and updated/new options
-        return db_question
+        graders.invalidate_grader(question_id)
+
+        return db.query(models.Question).options(selectinload(models.Question.options)).filter(models.Question.id == question_id).first()
     except NotFoundException:
         raise
     except Exception as e:
@@ -205,25 +189,29 @@ def update_question(db: Session, question_id: int, question_update: schemas.Ques
         raise DatabaseOperationException(f"Не удалось обновить вопрос: {str(e)}")
 
 def update_questions_batch(db: Session, questions_data: List[Tuple[int, schemas.QuestionUpdate]]) -> List[models.Question]:
-    """Updates multiple questions and their options."""
-    # Original crud.py lines 852-887. This simplifies to calling update_question per item.
-    updated_questions = []
+    """Updates multiple questions and their options in a single transaction."""
     try:
+        existing_state = content_diff.load_questions_state(db, question_ids=[q_id for q_id, _ in questions_data])
+        changeset = content_diff.QuestionChangeset()
+        updated_ids = []
         for q_id, q_update_data in questions_data:
-            # Need to ensure QuestionUpdate schema passed to update_question is correct
-            # The Tuple is (id, Schema). So q_update_data is already QuestionUpdate.
-            try:
-                updated_q = update_question(db, q_id, q_update_data)
-                updated_questions.append(updated_q)
-            except NotFoundException:
+            if q_id not in existing_state:
                 logger.warning(f"Вопрос с ID {q_id} не найден при групповом обновлении")
                 # Продолжаем с остальными вопросами
                 continue
-        # Commits are handled within update_question, so no final commit here needed if that pattern is kept.
-        return updated_questions
+            content_diff.diff_question(changeset, q_id, existing_state[q_id], q_update_data)
+            updated_ids.append(q_id)
+
+        content_diff.apply_changeset(db, changeset)
+        db.commit()
+        for q_id in changeset.touched_question_ids:
+            graders.invalidate_grader(q_id)
+
+        questions_by_id = {
+            q.id: q for q in db.query(models.Question).options(selectinload(models.Question.options)).filter(models.Question.id.in_(updated_ids))
+        }
+        return [questions_by_id[q_id] for q_id in updated_ids]
     except Exception as e:
-        # Rollback might have already happened in update_question if it raised an error.
-        # However, if an error happens in the loop itself, a rollback here is good.
         db.rollback() 
         logger.error(f"Error in update_questions_batch: {e}", exc_info=True)
         raise DatabaseOperationException(f"Не удалось обновить группу вопросов: {str(e)}")
@@ -245,6 +233,7 @@ def delete_question(db: Session, question_id: int) -> bool:
 
         db.delete(db_question)
         db.commit()
+        graders.invalidate_grader(question_id)
         return True
     except NotFoundException:
         raise
@@ -270,6 +259,8 @@ def delete_questions_batch(db: Session, question_ids: List[int]) -> bool:
         ).delete(synchronize_session=False)
         
         db.commit()
+        for question_id in question_ids:
+            graders.invalidate_grader(question_id)
         return deleted_count > 0 # Return true if at least one question was deleted
     except Exception as e:
         db.rollback()
@@ -293,6 +284,7 @@ def create_question_option(db: Session, question_id: int, option_data: schemas.Q
         db_option = models.QuestionOption(**option_data.model_dump(), question_id=question_id)
         db.add(db_option)
         db.commit()
+        graders.invalidate_grader(question_id)
         db.refresh(db_option)
         return db_option
     except NotFoundException:
@@ -314,9 +306,12 @@ def update_question_option(db: Session, option_id: int, option_update: schemas.Q
             if not target_question:
                 raise NotFoundException(entity_name="Вопрос для привязки варианта ответа", entity_id=option_update.question_id)
 
+        previous_question_id = db_option.question_id
         updated_option = update_db_object(db_option, option_update)
         db.add(updated_option)
         db.commit()
+        graders.invalidate_grader(previous_question_id)
+        graders.invalidate_grader(updated_option.question_id)
         db.refresh(updated_option)
         return updated_option
     except NotFoundException:
@@ -331,8 +326,10 @@ def delete_question_option(db: Session, option_id: int) -> bool:
         db_option = db.query(models.QuestionOption).filter(models.QuestionOption.id == option_id).first()
         if not db_option:
             raise NotFoundException(entity_name="Вариант ответа для удаления", entity_id=option_id)
+        question_id = db_option.question_id
         db.delete(db_option)
         db.commit()
+        graders.invalidate_grader(question_id)
         return True
     except NotFoundException:
         raise
@@ -0,0 +1,136 @@
+# app/crud/crud_resume.py
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.exceptions.crud_exceptions import DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# Порядок уроков дисциплины - как в оглавлении; по нему же построены индексы
+# ix_modules_discipline_order_id и ix_lessons_module_order_id
+_LESSON_ORDER = (models.Module.order, models.Module.id, models.Lesson.order, models.Lesson.id)
+
+def _next_lesson(db: Session, user_id: int, discipline_id: int, after: Optional[Tuple], exclude_lesson_id: int) -> Optional[Tuple[int, int]]:
+    completed = select(models.UserLessonProgress.lesson_id).where(models.UserLessonProgress.user_id == user_id)
+    query = select(models.Lesson.module_id, models.Lesson.id)\
+        .join(models.Module, models.Module.id == models.Lesson.module_id)\
+        .where(
+            models.Module.discipline_id == discipline_id,
+            models.Lesson.id != exclude_lesson_id, # Завершение урока может быть еще не записано (flush)
+            models.Lesson.id.not_in(completed)
+        )\
+        .order_by(*_LESSON_ORDER).limit(1)
+    if after is not None:
+        query = query.where(tuple_(*_LESSON_ORDER) > tuple_(*after))
+    return db.execute(query).first()
+
+# --- Обновление (в транзакции вызывающего кода, без commit) ---
+def advance(db: Session, user_id: int, discipline_id: int, module_order: int, lesson: models.Lesson) -> None:
+    """Points the user's resume pointer for the discipline past the lesson just completed."""
+    # Первый непройденный урок после завершенного; если после него все пройдено - первый непройденный
+    # с начала (уроки могли проходиться не по порядку); если нет и таких - дисциплина пройдена
+    after = (module_order, lesson.module_id, lesson.order, lesson.id)
+    target = _next_lesson(db, user_id, discipline_id, after, lesson.id) \
+        or _next_lesson(db, user_id, discipline_id, None, lesson.id)
+    module_id, lesson_id = target if target is not None else (None, None)
+
+    pointer = models.UserResumePointer
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(pointer).values(
+        user_id=user_id, discipline_id=discipline_id, module_id=module_id, lesson_id=lesson_id,
+        updated_at=datetime.now(timezone.utc)
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[pointer.user_id, pointer.discipline_id],
+        set_={"module_id": stmt.excluded.module_id, "lesson_id": stmt.excluded.lesson_id, "updated_at": stmt.excluded.updated_at}
+    ))
+
+# --- Чтение ---
+def _first_open_lessons(db: Session, user_id: int, discipline_ids: List[int]) -> Dict[int, Tuple[int, int, str]]:
+    """First lesson the user has not completed in each discipline: {discipline_id: (module_id, lesson_id, title)}."""
+    completed = select(models.UserLessonProgress.lesson_id).where(models.UserLessonProgress.user_id == user_id)
+    ranked = select(
+        models.Module.discipline_id, models.Lesson.module_id, models.Lesson.id, models.Lesson.title,
+        func.row_number().over(partition_by=models.Module.discipline_id, order_by=_LESSON_ORDER).label("position")
+    )\
+        .join(models.Module, models.Module.id == models.Lesson.module_id)\
+        .where(models.Module.discipline_id.in_(discipline_ids), models.Lesson.id.not_in(completed))\
+        .subquery()
+    rows = db.execute(
+        select(ranked.c.discipline_id, ranked.c.module_id, ranked.c.id, ranked.c.title).where(ranked.c.position == 1)
+    )
+    return {discipline_id: (module_id, lesson_id, title) for discipline_id, module_id, lesson_id, title in rows}
+
+def get_resume(db: Session, user_id: int, discipline_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Resume pointers of the user, most recently advanced first: a primary-key range (or single key) lookup.
+
+    Pointers are advanced only on lesson completion, so content edits can leave them stale: a finished
+    discipline may get new lessons, the target lesson may be deleted or moved to another discipline.
+    Such pointers are resolved to the first lesson not completed yet, with one more query for all of them.
+    """
+    pointer = models.UserResumePointer
+    query = select(
+        pointer.discipline_id, pointer.module_id, pointer.lesson_id, models.Lesson.title.label("lesson_title"),
+        pointer.lesson_id.is_(None).label("finished"), pointer.updated_at,
+        (models.Module.discipline_id == pointer.discipline_id).label("target_exists")
+    )\
+        .join(models.Discipline, models.Discipline.id == pointer.discipline_id)\
+        .outerjoin(models.Lesson, models.Lesson.id == pointer.lesson_id)\
+        .outerjoin(models.Module, models.Module.id == models.Lesson.module_id)\
+        .where(pointer.user_id == user_id)\
+        .order_by(pointer.updated_at.desc())
+    if discipline_id is not None:
+        query = query.where(pointer.discipline_id == discipline_id)
+    pointers = [row._asdict() for row in db.execute(query)]
+
+    stale = [item for item in pointers if not item.pop("target_exists")]
+    if stale:
+        open_lessons = _first_open_lessons(db, user_id, [item["discipline_id"] for item in stale])
+        for item in stale:
+            item["module_id"], item["lesson_id"], item["lesson_title"] = open_lessons.get(item["discipline_id"], (None, None, None))
+            item["finished"] = item["lesson_id"] is None
+    return pointers
+
+# --- Восстановление по истории прохождения ---
+def rebuild_pointers(db: Session, batch_size: int = constants.EXPORT_BATCH_SIZE) -> int:
+    """
+    Recomputes every pointer from the latest completed lesson of each (user, discipline) pair,
+    e.g. after deploying pointers onto existing progress. Returns the number of pointers written.
+    """
+    progress = models.UserLessonProgress
+    latest = select(
+        progress.user_id, models.Module.discipline_id, progress.lesson_id,
+        func.row_number().over(
+            partition_by=(progress.user_id, models.Module.discipline_id),
+            order_by=(progress.completed_at.desc(), progress.id.desc())
+        ).label("position")
+    )\
+        .join(models.Lesson, models.Lesson.id == progress.lesson_id)\
+        .join(models.Module, models.Module.id == models.Lesson.module_id)\
+        .subquery()
+    query = select(latest.c.user_id, latest.c.discipline_id, models.Lesson, models.Module.order)\
+        .join(models.Lesson, models.Lesson.id == latest.c.lesson_id)\
+        .join(models.Module, models.Module.id == models.Lesson.module_id)\
+        .where(latest.c.position == 1)
+    rows = 0
+    try:
+        for user_id, discipline_id, lesson, module_order in db.execute(query).all():
+            advance(db, user_id, discipline_id, module_order, lesson)
+            rows += 1
+            if rows % batch_size == 0:
+                db.commit()
+        db.commit()
+        logger.info(f"Rebuilt {rows} resume pointers")
+        return rows
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding resume pointers: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось пересобрать указатели продолжения обучения: {str(e)}")
@@ -0,0 +1,87 @@
+# app/crud/crud_review.py
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.exceptions.crud_exceptions import InvalidInputException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Планирование (SM-2) ---
+# Состояние пары (пользователь, вопрос) хранится в user_question_progress и пересчитывается
+# тем же upsert, которым записывается ответ (crud_answer_attempts.record_attempt)
+def get_state(db: Session, user_id: int, question_id: int):
+    """Last correctness and SM-2 state of the pair, or None before the first answer."""
+    progress = models.UserQuestionProgress
+    return db.execute(
+        select(progress.is_correct, progress.ease, progress.interval_days, progress.repetitions).where(
+            progress.user_id == user_id,
+            progress.question_id == question_id
+        )
+    ).first()
+
+def _ease_change(quality: int) -> float:
+    # Формула SM-2: при оценке 4 множитель не меняется, ниже - уменьшается
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+def next_schedule(state, is_correct: bool, answered_at: datetime) -> Dict[str, Any]:
+    """
+    Новое состояние повторения после ответа
+
+    Args:
+        state: Результат get_state (None - первый ответ)
+        is_correct: Правильность ответа
+        answered_at: Время ответа
+
+    Returns:
+        Значения ease, interval_days, repetitions и due_at для user_question_progress
+    """
+    ease = state.ease if state is not None else constants.REVIEW_INITIAL_EASE
+    interval_days = state.interval_days if state is not None else 0.0
+    repetitions = state.repetitions if state is not None else 0
+
+    quality = constants.REVIEW_QUALITY_CORRECT if is_correct else constants.REVIEW_QUALITY_INCORRECT
+    ease = max(constants.REVIEW_MIN_EASE, ease + _ease_change(quality))
+    if not is_correct:
+        # Ошибка: серия обнуляется, вопрос возвращается в очередь через несколько минут
+        return {
+            "ease": ease, "interval_days": 0.0, "repetitions": 0,
+            "due_at": answered_at + timedelta(minutes=constants.REVIEW_RELEARN_MINUTES),
+        }
+    repetitions += 1
+    if repetitions == 1:
+        interval_days = constants.REVIEW_FIRST_INTERVAL_DAYS
+    elif repetitions == 2:
+        interval_days = constants.REVIEW_SECOND_INTERVAL_DAYS
+    else:
+        interval_days = min(interval_days * ease, constants.REVIEW_MAX_INTERVAL_DAYS)
+    return {
+        "ease": ease, "interval_days": float(interval_days), "repetitions": repetitions,
+        "due_at": answered_at + timedelta(days=interval_days),
+    }
+
+# --- Чтение ---
+def get_review_queue(db: Session, user_id: int, limit: int = 20, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Questions due for review, most overdue first: one range scan of the (user_id, due_at) index."""
+    if limit < 1:
+        raise InvalidInputException("Параметр l должен быть больше нуля.")
+    now = now or datetime.now(timezone.utc)
+    progress = models.UserQuestionProgress
+    rows = db.execute(
+        select(
+            progress.question_id, models.LessonBlock.lesson_id, progress.due_at, progress.interval_days,
+            progress.repetitions, progress.ease, progress.is_correct, progress.answered_at
+        )
+        .join(models.Question, models.Question.id == progress.question_id)
+        .join(models.LessonBlock, models.LessonBlock.id == models.Question.lesson_block_id)
+        .where(progress.user_id == user_id, progress.due_at <= now)
+        # id - неявный хвост индекса (rowid в SQLite), поэтому сортировка не требует отдельного шага
+        .order_by(progress.due_at, progress.id)
+        .limit(min(limit, constants.REVIEW_QUEUE_MAX_LIMIT))
+    )
+    return [row._asdict() for row in rows]
@@ -0,0 +1,142 @@
+# app/crud/crud_search.py
+import html
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.exceptions.crud_exceptions import InvalidInputException
+
+import logging
+logger = logging.getLogger(__name__)
+
+KIND_LESSON = "lesson"
+KIND_THEORY = "theory"
+KIND_QUESTION = "question"
+KINDS = (KIND_LESSON, KIND_THEORY, KIND_QUESTION)
+
+# Маркеры совпадений из символов частной области Unicode: текст экранируется, потом маркеры заменяются на <mark>
+_OPEN, _CLOSE = "", ""
+_ELLIPSIS = "…"
+
+# --- Поиск по индексам FTS5 (models.SEARCH_INDEXES) ---
+# Ранжирование: вид, id и вес bm25 (меньше - лучше) из всех индексов, одна сортировка на всех.
+# Фрагменты считаются вторым запросом только для строк страницы: в UNION ALL snippet() вычислялся бы
+# для каждого совпадения до сортировки
+_RANK_QUERIES = {
+    KIND_LESSON: f"SELECT '{KIND_LESSON}' AS kind, rowid AS id, bm25(lessons_fts) * :weight_lesson AS rank "
+                 "FROM lessons_fts WHERE lessons_fts MATCH :query",
+    KIND_THEORY: f"SELECT '{KIND_THEORY}' AS kind, rowid AS id, bm25(lesson_blocks_fts) * :weight_theory AS rank "
+                 "FROM lesson_blocks_fts WHERE lesson_blocks_fts MATCH :query",
+    KIND_QUESTION: f"SELECT '{KIND_QUESTION}' AS kind, rowid AS id, bm25(questions_fts) * :weight_question AS rank "
+                   "FROM questions_fts WHERE questions_fts MATCH :query",
+}
+_SNIPPET_QUERIES = {
+    KIND_LESSON: """
+        SELECT lessons.id AS id, lessons.id AS lesson_id, lessons.title AS lesson_title,
+               highlight(lessons_fts, 0, :open, :close) AS snippet
+        FROM lessons_fts JOIN lessons ON lessons.id = lessons_fts.rowid
+        WHERE lessons_fts MATCH :query AND lessons_fts.rowid IN :ids""",
+    KIND_THEORY: """
+        SELECT lesson_blocks.id AS id, lessons.id AS lesson_id, lessons.title AS lesson_title,
+               snippet(lesson_blocks_fts, 0, :open, :close, :ellipsis, :tokens) AS snippet
+        FROM lesson_blocks_fts
+        JOIN lesson_blocks ON lesson_blocks.id = lesson_blocks_fts.rowid
+        JOIN lessons ON lessons.id = lesson_blocks.lesson_id
+        WHERE lesson_blocks_fts MATCH :query AND lesson_blocks_fts.rowid IN :ids""",
+    KIND_QUESTION: """
+        SELECT questions.id AS id, lessons.id AS lesson_id, lessons.title AS lesson_title,
+               snippet(questions_fts, -1, :open, :close, :ellipsis, :tokens) AS snippet
+        FROM questions_fts
+        JOIN questions ON questions.id = questions_fts.rowid
+        JOIN lesson_blocks ON lesson_blocks.id = questions.lesson_block_id
+        JOIN lessons ON lessons.id = lesson_blocks.lesson_id
+        WHERE questions_fts MATCH :query AND questions_fts.rowid IN :ids""",
+}
+
+# Окончания русских слов, от длинных к коротким: в запросе ищется основа с префиксом (договора -> договор*).
+# Стеммера для русского в SQLite нет, поэтому морфология приближается префиксным поиском
+_ENDINGS = sorted((
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "ость", "ости", "ение", "ения", "ению", "ением",
+    "ах", "ях", "ам", "ям", "ом", "ем", "ой", "ей", "ий", "ый", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ов", "ев", "ую", "юю", "их", "ых", "ия", "ии", "ие", "ью",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+), key=len, reverse=True)
+_WORD = re.compile(r"\w+")
+
+def _stem(word: str) -> str:
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= constants.SEARCH_MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+def _term(word: str) -> str:
+    if word.isdigit():
+        # Номера статей ищутся точно: "454" не должно находить "4540"
+        return f'"{word}"'
+    # unicode61 не сводит ё к е: слово с ё ищется в обоих написаниях
+    variants = sorted({_stem(word), _stem(word.replace("ё", "е"))})
+    if len(variants) == 1:
+        return f'"{variants[0]}"*'
+    return "(" + " OR ".join(f'"{variant}"*' for variant in variants) + ")"
+
+def build_match_query(query: str) -> str:
+    """
+    Запрос FTS5 из пользовательской строки
+
+    Args:
+        query: Строка поиска как есть
+
+    Returns:
+        Выражение MATCH: все слова обязательны, каждое - основой с префиксом. Синтаксис FTS5
+        из ввода не проходит: слова берутся регулярным выражением и заключаются в кавычки
+    """
+    words = _WORD.findall(query.lower())[:constants.SEARCH_MAX_TERMS]
+    if not words:
+        raise InvalidInputException("Поисковый запрос не содержит слов.")
+    return " AND ".join(_term(word) for word in words)
+
+def _highlight(snippet: Optional[str]) -> str:
+    return html.escape(snippet or "").replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+def search(db: Session, query: str, kinds: Optional[Sequence[str]] = None, skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+    """Ranked hits in lesson titles, theory and questions, best first; snippets are HTML-escaped with <mark> around matches."""
+    if skip < 0 or limit < 1:
+        raise InvalidInputException("Параметры s и l должны быть неотрицательными, l - больше нуля.")
+    match = build_match_query(query)
+    selected = [kind for kind in KINDS if kinds is None or kind in kinds]
+    ranked = db.execute(text(
+        " UNION ALL ".join(_RANK_QUERIES[kind] for kind in selected)
+        + " ORDER BY rank, kind, id LIMIT :limit OFFSET :skip"
+    ), {
+        "query": match,
+        "weight_lesson": constants.SEARCH_WEIGHT_LESSON,
+        "weight_theory": constants.SEARCH_WEIGHT_THEORY,
+        "weight_question": constants.SEARCH_WEIGHT_QUESTION,
+        "limit": min(limit, constants.SEARCH_MAX_LIMIT), "skip": skip,
+    }).all()
+
+    details = {}
+    for kind in selected:
+        ids = [row.id for row in ranked if row.kind == kind]
+        if not ids:
+            continue
+        rows = db.execute(text(_SNIPPET_QUERIES[kind]).bindparams(bindparam("ids", expanding=True)), {
+            "query": match, "ids": ids,
+            "open": _OPEN, "close": _CLOSE, "ellipsis": _ELLIPSIS, "tokens": constants.SEARCH_SNIPPET_TOKENS,
+        }).mappings()
+        details.update({(kind, row["id"]): row for row in rows})
+    return [
+        {**details[(row.kind, row.id)], "kind": row.kind, "rank": row.rank,
+         "snippet": _highlight(details[(row.kind, row.id)]["snippet"])}
+        for row in ranked if (row.kind, row.id) in details
+    ]
+
+def rebuild_index(db: Session) -> None:
+    """Rebuilds every FTS5 index from its content table (after restoring a dump or editing rows by hand)."""
+    for fts_table, _, _ in models.SEARCH_INDEXES:
+        db.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+    db.commit()
@@ -0,0 +1,171 @@
+# app/crud/crud_statistics.py
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from app.exceptions.crud_exceptions import DatabaseOperationException
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Ключи счетчиков ---
+ACTIVE_USERS = "active_users"
+TOTAL_LESSONS = "total_lessons"
+LESSON_COMPLETIONS = "lesson_completions" # Строки user_lesson_progress
+ANSWERS_PREFIX = "answers:" # Строки user_question_progress по типу вопроса
+CORRECT_ANSWERS_PREFIX = "correct_answers:"
+RECONCILED_AT = "reconciled_at" # Unix-время последней сверки
+
+# --- Ключи дневных счетчиков ---
+DAILY_ACTIVE_LEARNERS = "active_learners"
+DAILY_COMPLETIONS = "completions"
+DAILY_ANSWERS = "answers"
+DAILY_CORRECT_ANSWERS = "correct_answers"
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def _dialect_insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+# --- Инкременты (выполняются в транзакции вызывающего кода, без commit) ---
+def increment(db: Session, key: str, delta: int = 1) -> None:
+    if not delta:
+        return
+    stmt = _dialect_insert(db)(models.StatCounter).values(key=key, value=delta)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.StatCounter.key],
+        set_={"value": models.StatCounter.value + stmt.excluded.value}
+    ))
+
+def increment_daily(db: Session, key: str, delta: int = 1, day: Optional[date] = None) -> None:
+    if not delta:
+        return
+    stmt = _dialect_insert(db)(models.StatDaily).values(day=day or _today(), key=key, value=delta)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.StatDaily.day, models.StatDaily.key],
+        set_={"value": models.StatDaily.value + stmt.excluded.value}
+    ))
+
+def touch_active_learner(db: Session, user_id: int, day: Optional[date] = None) -> None:
+    day = day or _today()
+    stmt = _dialect_insert(db)(models.StatDailyLearner).values(day=day, user_id=user_id).on_conflict_do_nothing()
+    if db.execute(stmt).rowcount == 1:
+        increment_daily(db, DAILY_ACTIVE_LEARNERS, day=day)
+
+def record_lesson_completion(db: Session, user_id: int, first_completion: bool) -> None:
+    if first_completion:
+        increment(db, LESSON_COMPLETIONS)
+    increment_daily(db, DAILY_COMPLETIONS)
+    touch_active_learner(db, user_id)
+
+def record_answer(db: Session, user_id: int, question_type: models.QuestionType, is_correct: bool, previous_is_correct: Optional[bool]) -> None:
+    """previous_is_correct is None for the first answer of the user to the question."""
+    if previous_is_correct is None:
+        increment(db, ANSWERS_PREFIX + question_type.value)
+        increment(db, CORRECT_ANSWERS_PREFIX + question_type.value, int(is_correct))
+    else:
+        increment(db, CORRECT_ANSWERS_PREFIX + question_type.value, int(is_correct) - int(previous_is_correct))
+    increment_daily(db, DAILY_ANSWERS)
+    increment_daily(db, DAILY_CORRECT_ANSWERS, int(is_correct))
+    touch_active_learner(db, user_id)
+
+def record_content_removed(db: Session, lesson_filter) -> None:
+    """Must be called before deleting lessons matching lesson_filter (their progress rows are cascaded)."""
+    lesson_ids = select(models.Lesson.id).where(lesson_filter)
+    lessons_count = db.execute(select(func.count()).select_from(lesson_ids.subquery())).scalar() or 0
+    completions_count = db.execute(
+        select(func.count(models.UserLessonProgress.id)).where(models.UserLessonProgress.lesson_id.in_(lesson_ids))
+    ).scalar() or 0
+    increment(db, TOTAL_LESSONS, -lessons_count)
+    increment(db, LESSON_COMPLETIONS, -completions_count)
+
+# --- Сверка ---
+def reconcile(db: Session) -> Dict[str, int]:
+    """Recomputes all totals from the source tables and prunes old per-day learner marks."""
+    try:
+        totals = {
+            ACTIVE_USERS: db.execute(select(func.count(models.User.id)).where(models.User.is_active == True)).scalar() or 0,
+            TOTAL_LESSONS: db.execute(select(func.count(models.Lesson.id))).scalar() or 0,
+            LESSON_COMPLETIONS: db.execute(select(func.count(models.UserLessonProgress.id))).scalar() or 0,
+        }
+        for question_type in models.QuestionType:
+            totals[ANSWERS_PREFIX + question_type.value] = 0
+            totals[CORRECT_ANSWERS_PREFIX + question_type.value] = 0
+        accuracy_rows = db.execute(
+            select(
+                models.Question.question_type,
+                func.count(models.UserQuestionProgress.id),
+                func.count(models.UserQuestionProgress.id).filter(models.UserQuestionProgress.is_correct == True)
+            ).join(models.Question, models.Question.id == models.UserQuestionProgress.question_id)
+            .group_by(models.Question.question_type)
+        )
+        for question_type, answers, correct in accuracy_rows:
+            totals[ANSWERS_PREFIX + question_type.value] = answers
+            totals[CORRECT_ANSWERS_PREFIX + question_type.value] = correct
+        totals[RECONCILED_AT] = int(datetime.now(timezone.utc).timestamp())
+
+        stmt = _dialect_insert(db)(models.StatCounter)
+        stmt = stmt.on_conflict_do_update(index_elements=[models.StatCounter.key], set_={"value": stmt.excluded.value})
+        db.execute(stmt, [{"key": key, "value": value} for key, value in totals.items()])
+
+        retention_start = _today() - timedelta(days=constants.STATISTICS_LEARNER_RETENTION_DAYS)
+        db.execute(delete(models.StatDailyLearner).where(models.StatDailyLearner.day < retention_start))
+        db.commit()
+        logger.info(f"Statistics reconciled: {totals}")
+        return totals
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error reconciling statistics: {e}", exc_info=True)
+        raise DatabaseOperationException(f"Не удалось сверить статистику: {str(e)}")
+
+# --- Чтение ---
+def get_statistics(db: Session, days: int = constants.STATISTICS_DAILY_WINDOW_DAYS) -> Dict[str, Any]:
+    """Reads the dashboard from the counter tables: one small-table scan plus a primary key range."""
+    counters = dict(db.execute(select(models.StatCounter.key, models.StatCounter.value)).all())
+    if RECONCILED_AT not in counters:
+        # Счетчики еще не инициализированы (новая база или первая сборка после миграции)
+        counters = reconcile(db)
+
+    total_lessons = counters.get(TOTAL_LESSONS, 0)
+    completed_lessons = counters.get(LESSON_COMPLETIONS, 0)
+
+    first_day = _today() - timedelta(days=days - 1)
+    daily: Dict[date, Dict[str, int]] = {first_day + timedelta(days=i): {} for i in range(days)}
+    for day, key, value in db.execute(
+        select(models.StatDaily.day, models.StatDaily.key, models.StatDaily.value).where(models.StatDaily.day >= first_day)
+    ):
+        daily.setdefault(day, {})[key] = value
+
+    accuracy = {}
+    for question_type in models.QuestionType:
+        answers = counters.get(ANSWERS_PREFIX + question_type.value, 0)
+        correct = counters.get(CORRECT_ANSWERS_PREFIX + question_type.value, 0)
+        accuracy[question_type.value] = {
+            "answers": answers,
+            "correct_answers": correct,
+            "accuracy_percentage": round(correct / answers * 100) if answers > 0 else 0
+        }
+
+    return {
+        "active_users": counters.get(ACTIVE_USERS, 0),
+        "total_lessons": total_lessons,
+        "completed_lessons_percentage": round((completed_lessons / total_lessons * 100) if total_lessons > 0 else 0),
+        "daily": [
+            {
+                "day": day,
+                "active_learners": values.get(DAILY_ACTIVE_LEARNERS, 0),
+                "completions": values.get(DAILY_COMPLETIONS, 0),
+                "answers": values.get(DAILY_ANSWERS, 0),
+                "correct_answers": values.get(DAILY_CORRECT_ANSWERS, 0)
+            }
+            for day, values in sorted(daily.items())
+        ],
+        "accuracy_by_question_type": accuracy,
+        "reconciled_at": datetime.fromtimestamp(counters[RECONCILED_AT], tz=timezone.utc)
+    }
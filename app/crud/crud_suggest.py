@@ -0,0 +1,100 @@
+# app/crud/crud_suggest.py
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from . import constants
+from core.prefix_index import PrefixIndex
+from app.exceptions.crud_exceptions import InvalidInputException
+
+import logging
+logger = logging.getLogger(__name__)
+
+KIND_DISCIPLINE = "discipline"
+KIND_MODULE = "module"
+KIND_LESSON = "lesson"
+KINDS = (KIND_DISCIPLINE, KIND_MODULE, KIND_LESSON)
+
+# --- Индекс названий в памяти процесса ---
+# Как и рейтинги, каждый процесс держит свою копию: она строится из БД при первом обращении и
+# периодически (SUGGEST_REFRESH_INTERVAL), а между перестроениями обновляется при правках контента
+# в этом процессе. Правки в других процессах становятся видны после перестроения.
+class _Titles:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock() # Холодный индекс строит один поток, остальные ждут его
+        self.loaded = False
+        self.index = PrefixIndex()
+        # (вид, id) -> (название, id родителя: дисциплины для модуля, модуля для урока)
+        self.details: Dict[Tuple[str, int], Tuple[str, Optional[int]]] = {}
+
+_titles = _Titles()
+
+def load_index(db: Session) -> None:
+    """Rebuilds the title index from disciplines, modules and lessons and swaps it in at once."""
+    details: Dict[Tuple[str, int], Tuple[str, Optional[int]]] = {}
+    for discipline_id, title in db.execute(select(models.Discipline.id, models.Discipline.title)):
+        details[(KIND_DISCIPLINE, discipline_id)] = (title, None)
+    for module_id, title, discipline_id in db.execute(select(models.Module.id, models.Module.title, models.Module.discipline_id)):
+        details[(KIND_MODULE, module_id)] = (title, discipline_id)
+    for lesson_id, title, module_id in db.execute(select(models.Lesson.id, models.Lesson.title, models.Lesson.module_id)):
+        details[(KIND_LESSON, lesson_id)] = (title, module_id)
+    index = PrefixIndex((key, title) for key, (title, _) in details.items())
+
+    with _titles.lock:
+        _titles.index = index
+        _titles.details = details
+        _titles.loaded = True
+    logger.info(f"Title index rebuilt: {len(details)} titles")
+
+def _ensure_loaded(db: Session) -> None:
+    if not _titles.loaded:
+        with _titles.rebuild_lock:
+            if not _titles.loaded:
+                load_index(db)
+
+# --- Обновление после записи (вызывается после commit) ---
+def index_title(kind: str, entity_id: int, title: str, parent_id: Optional[int] = None) -> None:
+    """Adds or renames one title in the in-memory index; a no-op until the index is first loaded."""
+    if not _titles.loaded:
+        return
+    with _titles.lock:
+        _titles.index.set((kind, entity_id), title)
+        _titles.details[(kind, entity_id)] = (title, parent_id)
+
+def remove_title(kind: str, entity_id: int) -> None:
+    if not _titles.loaded:
+        return
+    with _titles.lock:
+        _titles.index.remove((kind, entity_id))
+        _titles.details.pop((kind, entity_id), None)
+
+def invalidate() -> None:
+    """Drops the index so the next request rebuilds it (cascade deletes, bulk import)."""
+    _titles.loaded = False
+
+# --- Чтение ---
+def _item(kind: str, entity_id: int) -> Dict[str, Any]:
+    title, parent_id = _titles.details[(kind, entity_id)]
+    item = {"kind": kind, "id": entity_id, "title": title, "discipline_id": None, "module_id": None}
+    if kind == KIND_DISCIPLINE:
+        item["discipline_id"] = entity_id
+    elif kind == KIND_MODULE:
+        item["discipline_id"], item["module_id"] = parent_id, entity_id
+    else:
+        module = _titles.details.get((KIND_MODULE, parent_id))
+        item["discipline_id"], item["module_id"] = (module[1] if module else None), parent_id
+    return item
+
+def suggest(db: Session, query: str, kinds: Optional[Sequence[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """Titles where every word of the query starts some word of the title, case-insensitively (ё = е)."""
+    if limit < 1:
+        raise InvalidInputException("Параметр l должен быть больше нуля.")
+    _ensure_loaded(db)
+    keep = None if kinds is None else (lambda key: key[0] in kinds)
+    with _titles.lock:
+        keys = _titles.index.search(query, min(limit, constants.SUGGEST_MAX_LIMIT), keep)
+        return [_item(kind, entity_id) for kind, entity_id in keys]
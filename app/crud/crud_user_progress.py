@@ -1,8 +1,8 @@
-from typing import Optional, Dict, Any
+from typing import Iterable, Iterator, Optional, Dict, Any, List, Set
 from datetime import datetime, timezone
 
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import and_, func, exists, select
+from sqlalchemy import and_, func, exists, select, update
 
 import models
 import schemas
@@ -11,9 +11,16 @@ from .constants import (
     XP_FOR_FIRST_COMPLETION,
     XP_FOR_SECOND_COMPLETION,
     XP_FOR_SUBSEQUENT_COMPLETIONS,
-    XP_FOR_CORRECT_ANSWER
+    XP_FOR_CORRECT_ANSWER,
+    EXPORT_BATCH_SIZE
 )
 from core.cache import cached, clear_cache_for_function
+from app.grading import graders
+from . import crud_statistics
+from . import crud_answer_attempts
+from . import crud_leaderboard
+from . import crud_review
+from . import crud_resume
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 # TODO: from .crud_users import get_user_stats # For award_xp cache clearing, if direct call is preferred
 
@@ -71,61 +78,83 @@ def get_module_progress(db: Session, user_id: int, module_id: int) -> Dict[str,
 def get_discipline_progress(db: Session, user_id: int, discipline_id: int) -> Dict[str, int]:
     """Calculates user's progress within a discipline."""
     try:
-        # Запрос количества модулей в дисциплине и кол-ва завершенных модулей
-        # Модуль считается завершенным, если завершены все его уроки
-        
-        # Сначала находим все модули в дисциплине
-        modules_in_discipline = db.query(models.Module).filter(
-            models.Module.discipline_id == discipline_id
-        ).all()
-        
-        total_modules_count = len(modules_in_discipline)
-        completed_modules_count = 0
-        
-        # Для каждого модуля проверяем, завершен ли он
-        for module in modules_in_discipline:
-            module_progress = get_module_progress(db, user_id, module.id)
-            
-            # Если все уроки в модуле завершены, считаем модуль завершенным
-            if module_progress["completed_lessons_count"] > 0 and module_progress["total_lessons_count"] > 0:
-                if module_progress["completed_lessons_count"] == module_progress["total_lessons_count"]:
-                    completed_modules_count += 1
-        
-        # Также сохраняем информацию об уроках для совместимости с фронтендом
-        lessons_result = db.query(
-            func.count(models.Lesson.id).label('total_lessons'),
-            func.count(models.UserLessonProgress.id).filter(
-                models.UserLessonProgress.completed_at.isnot(None) # Count only actual completions
-            ).label('completed_lessons')
-        ).join(
-            models.Module,
-            models.Module.id == models.Lesson.module_id
-        ).outerjoin(
-            models.UserLessonProgress,
-            and_(
-                models.UserLessonProgress.user_id == user_id,
-                models.UserLessonProgress.lesson_id == models.Lesson.id
-            )
-        ).filter(
-            models.Module.discipline_id == discipline_id
-        ).first()
-        
-        return {
-            "completed_modules_count": completed_modules_count,
-            "total_modules_count": total_modules_count,
-            "total_lessons_count": lessons_result.total_lessons if lessons_result else 0,
-            "completed_lessons_count": lessons_result.completed_lessons if lessons_result else 0,
-            "progress_percent": int((completed_modules_count / total_modules_count) * 100) if total_modules_count > 0 else 0
-        }
+        return get_disciplines_progress(db, user_id, [discipline_id])[discipline_id]
     except Exception as e:
         logger.error(f"Error getting discipline progress for user {user_id}, discipline {discipline_id}: {e}", exc_info=True)
-        return {
-            "completed_modules_count": 0,
-            "total_modules_count": 0,
-            "total_lessons_count": 0,
-            "completed_lessons_count": 0,
-            "progress_percent": 0
-        }
+        return _discipline_progress([])
+
+# --- Прогресс для страниц дерева контента: один запрос на уровень вместо запроса на сущность ---
+def get_completed_lesson_ids(db: Session, user_id: int, lesson_ids: Iterable[int]) -> Set[int]:
+    """Ids among lesson_ids that the user has completed."""
+    lesson_ids = list(lesson_ids)
+    if not lesson_ids:
+        return set()
+    return set(db.execute(
+        select(models.UserLessonProgress.lesson_id).where(
+            models.UserLessonProgress.user_id == user_id,
+            models.UserLessonProgress.lesson_id.in_(lesson_ids),
+            models.UserLessonProgress.completed_at.isnot(None)
+        )
+    ).scalars())
+
+def _lesson_counts(db: Session, user_id: int, condition) -> List:
+    # (модуль, дисциплина, всего уроков, завершено пользователем) по каждому модулю, в том числе без уроков
+    return db.execute(
+        select(
+            models.Module.id, models.Module.discipline_id,
+            func.count(models.Lesson.id),
+            func.count(models.UserLessonProgress.id).filter(models.UserLessonProgress.completed_at.isnot(None))
+        )
+        .outerjoin(models.Lesson, models.Lesson.module_id == models.Module.id)
+        .outerjoin(models.UserLessonProgress, and_(
+            models.UserLessonProgress.user_id == user_id,
+            models.UserLessonProgress.lesson_id == models.Lesson.id
+        ))
+        .where(condition)
+        .group_by(models.Module.id, models.Module.discipline_id)
+    ).all()
+
+def _module_progress(total_lessons: int, completed_lessons: int) -> Dict[str, int]:
+    return {
+        "completed_lessons_count": completed_lessons,
+        "total_lessons_count": total_lessons,
+        "progress_percent": int((completed_lessons / total_lessons) * 100) if total_lessons > 0 else 0
+    }
+
+def _discipline_progress(modules: List[Dict[str, int]]) -> Dict[str, int]:
+    # Модуль считается завершенным, если завершены все его уроки
+    completed_modules_count = sum(
+        1 for module in modules
+        if module["total_lessons_count"] > 0 and module["completed_lessons_count"] == module["total_lessons_count"]
+    )
+    total_modules_count = len(modules)
+    return {
+        "completed_modules_count": completed_modules_count,
+        "total_modules_count": total_modules_count,
+        # Также сохраняем информацию об уроках для совместимости с фронтендом
+        "total_lessons_count": sum(module["total_lessons_count"] for module in modules),
+        "completed_lessons_count": sum(module["completed_lessons_count"] for module in modules),
+        "progress_percent": int((completed_modules_count / total_modules_count) * 100) if total_modules_count > 0 else 0
+    }
+
+def get_modules_progress(db: Session, user_id: int, module_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """get_module_progress for several modules with one grouped query."""
+    module_ids = list(module_ids)
+    if not module_ids:
+        return {}
+    progress = {module_id: _module_progress(0, 0) for module_id in module_ids}
+    for module_id, _, total, completed in _lesson_counts(db, user_id, models.Module.id.in_(module_ids)):
+        progress[module_id] = _module_progress(total, completed)
+    return progress
+
+def get_disciplines_progress(db: Session, user_id: int, discipline_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """get_discipline_progress for several disciplines with one grouped query."""
+    modules: Dict[int, List[Dict[str, int]]] = {discipline_id: [] for discipline_id in discipline_ids}
+    if not modules:
+        return {}
+    for _, discipline_id, total, completed in _lesson_counts(db, user_id, models.Module.discipline_id.in_(list(modules))):
+        modules[discipline_id].append(_module_progress(total, completed))
+    return {discipline_id: _discipline_progress(items) for discipline_id, items in modules.items()}
 
 def award_xp(db: Session, user: models.User, xp_points: int):
     """Helper to award XP and clear relevant caches."""
@@ -165,6 +194,7 @@ def mark_lesson_as_completed(db: Session, user_id: int, lesson_id: int) -> model
 
         xp_to_award = 0
         current_attempts_before_this_completion = 0
+        first_completion = progress is None
 
         if progress:
             current_attempts_before_this_completion = progress.attempts or 0
@@ -188,12 +218,18 @@ def mark_lesson_as_completed(db: Session, user_id: int, lesson_id: int) -> model
             db.add(progress)
             xp_to_award = XP_FOR_FIRST_COMPLETION
         
+        discipline_id, module_order = db.query(models.Module.discipline_id, models.Module.order).filter(models.Module.id == lesson.module_id).one()
         if xp_to_award > 0:
             user.xp_points = (user.xp_points or 0) + xp_to_award
+            crud_leaderboard.record_xp(db, user_id, xp_to_award, discipline_id)
+
+        crud_statistics.record_lesson_completion(db, user_id, first_completion=first_completion)
+        crud_resume.advance(db, user_id, discipline_id, module_order, lesson)
         
         db.commit()
         db.refresh(progress)
         db.refresh(user) 
+        crud_leaderboard.apply_xp(user_id, xp_to_award, discipline_id, total_xp=user.xp_points)
 
         # Очистка кэша для соответствующих функций
         # Теперь clear_cache_for_function поддерживает как объекты функций, так и строковые имена
@@ -202,8 +238,7 @@ def mark_lesson_as_completed(db: Session, user_id: int, lesson_id: int) -> model
         if lesson.module_id:
             clear_cache_for_function(get_module_progress)
             
-            module_info = db.query(models.Module.discipline_id).filter(models.Module.id == lesson.module_id).first()
-            if module_info and module_info.discipline_id:
+            if discipline_id:
                 clear_cache_for_function(get_discipline_progress)
         
         # Для функции в другом модуле используем строковое представление
@@ -221,86 +256,63 @@ def mark_lesson_as_completed(db: Session, user_id: int, lesson_id: int) -> model
         raise DatabaseOperationException(f"Не удалось отметить урок как завершенный: {str(e)}")
 
 def submit_question_answer(db: Session, user_id: int, question_id: int, user_answer: Any) -> Dict[str, Any]:
-    """Submits a user's answer to a question, records progress, awards XP, and clears cache."""
+    """
+    Submits a user's answer to a question, appends it to the attempt history, awards XP, and clears cache.
+    Only inserts and single-statement upserts are issued; no row is locked for the duration of grading.
+    """
     try:
-        user = db.query(models.User).filter(models.User.id == user_id).with_for_update().first()
-        question = db.query(models.Question).options(
-            selectinload(models.Question.options) # Eager load options
-        ).filter(models.Question.id == question_id).first()
-        
-        if not user:
-            raise NotFoundException(entity_name="Пользователь для ответа на вопрос", entity_id=user_id)
-        if not question:
-            raise NotFoundException(entity_name="Вопрос", entity_id=question_id)
-        
-        is_correct = False
-        correct_answer_details = {}
-        
-        # Determine correctness based on question type (matches original crud.py lines 1130-1166)
-        if question.question_type == models.QuestionType.SINGLE_CHOICE:
-            correct_option = next((opt for opt in question.options if opt.is_correct), None)
-            is_correct = correct_option and user_answer == correct_option.id
-            if correct_option:
-                correct_answer_details = {
-                    "correct_option_id": correct_option.id,
-                    "correct_option_text": correct_option.text
-                }
-        elif question.question_type == models.QuestionType.MULTIPLE_CHOICE:
-            correct_option_ids = {opt.id for opt in question.options if opt.is_correct}
-            is_correct = isinstance(user_answer, list) and set(user_answer) == correct_option_ids
-            correct_answer_details = {
-                "correct_option_ids": list(correct_option_ids),
-                "correct_option_texts": [opt.text for opt in question.options if opt.is_correct]
-            }
-        elif question.question_type == models.QuestionType.TRUE_FALSE:
-            is_correct = isinstance(user_answer, bool) and \
-                         user_answer == (question.correct_answer_text.lower() == "true" if question.correct_answer_text else False)
-            correct_answer_details = {
-                "correct_bool_answer": question.correct_answer_text.lower() == "true" if question.correct_answer_text else None
-            }
-        elif question.question_type == models.QuestionType.FILL_IN_BLANK:
-            is_correct = isinstance(user_answer, str) and \
-                         user_answer.lower().strip() == (question.correct_answer_text.lower().strip() if question.correct_answer_text else "")
-            correct_answer_details = {
-                "correct_text_answer": question.correct_answer_text
-            }
+        # Проверяющий компилируется из вопроса один раз и далее берется из кэша
+        grader = graders.get_cached_grader(question_id)
+        if grader is None:
+            question = db.query(models.Question).options(
+                selectinload(models.Question.options) # Eager load options
+            ).filter(models.Question.id == question_id).first()
+            if not question:
+                raise NotFoundException(entity_name="Вопрос", entity_id=question_id)
+            grader = graders.compile_question(question)
+
+        is_correct = grader.grade(user_answer)
+        correct_answer_details = grader.correct_answer_details()
         
         xp_awarded = XP_FOR_CORRECT_ANSWER if is_correct else 0
         if xp_awarded > 0:
-            user.xp_points = (user.xp_points or 0) + xp_awarded
+            # Атомарное приращение вместо блокировки строки пользователя
+            result = db.execute(
+                update(models.User).where(models.User.id == user_id)
+                .values(xp_points=func.coalesce(models.User.xp_points, 0) + xp_awarded)
+            )
+            user_exists = result.rowcount == 1
+            discipline_id = crud_leaderboard.question_discipline_id(db, question_id)
+            crud_leaderboard.record_xp(db, user_id, xp_awarded, discipline_id)
             # Функция clear_cache_for_function принимает только имя функции
             clear_cache_for_function('crud_users.get_user_stats')
+        else:
+            user_exists = db.execute(select(models.User.id).where(models.User.id == user_id)).first() is not None
+        if not user_exists:
+            raise NotFoundException(entity_name="Пользователь для ответа на вопрос", entity_id=user_id)
 
-        # Проверяем, есть ли уже запись прогресса для этого пользователя и вопроса
-        existing_progress = db.query(models.UserQuestionProgress).filter(
-            models.UserQuestionProgress.user_id == user_id,
-            models.UserQuestionProgress.question_id == question_id
-        ).first()
+        # Прошлый ответ и состояние повторения одним чтением: нужны статистике и планировщику
+        previous = crud_review.get_state(db, user_id, question_id)
+        previous_is_correct = previous.is_correct if previous is not None else None
+        crud_statistics.record_answer(db, user_id, grader.question_type, is_correct, previous_is_correct=previous_is_correct)
 
-        if existing_progress:
-            # Обновляем существующую запись
-            existing_progress.is_correct = is_correct
-            existing_progress.answered_at = datetime.now(timezone.utc)
-        else:
-            # Создаем новую запись
-            progress = models.UserQuestionProgress(
-                user_id=user_id,
-                question_id=question_id,
-                is_correct=is_correct,
-                answered_at=datetime.now(timezone.utc)
-            )
-            db.add(progress)
-            
+        answered_at = datetime.now(timezone.utc)
+        crud_answer_attempts.record_attempt(
+            db, user_id, question_id, is_correct, answer=user_answer, answered_at=answered_at,
+            schedule=crud_review.next_schedule(previous, is_correct, answered_at)
+        )
         db.commit()
-        db.refresh(user) 
+        if xp_awarded > 0:
+            crud_leaderboard.apply_xp(user_id, xp_awarded, discipline_id)
         
         return {
             "is_correct": is_correct,
-            "explanation": question.general_explanation, 
+            "explanation": grader.explanation, 
             "correct_answer_details": correct_answer_details,
             "xp_awarded": xp_awarded
         }
     except NotFoundException: 
+        db.rollback()
         raise
     except Exception as e:
         db.rollback()
@@ -317,4 +329,24 @@ def get_user_lesson_progress(db: Session, user_id: int, lesson_id: int) -> Optio
     return db.query(models.UserLessonProgress).filter(
         models.UserLessonProgress.user_id == user_id,
         models.UserLessonProgress.lesson_id == lesson_id
-    ).first() 
\ No newline at end of file
+    ).first() 
+# --- Потоковая выгрузка прогресса ---
+PROGRESS_LESSONS = "lessons"
+PROGRESS_QUESTIONS = "questions"
+
+# Столбцы выгрузки для каждого вида прогресса
+PROGRESS_EXPORT_COLUMNS = {
+    PROGRESS_LESSONS: ("user_id", "lesson_id", "completed_at", "attempts"),
+    PROGRESS_QUESTIONS: ("user_id", "question_id", "is_correct", "answered_at"),
+}
+
+def iter_progress_records(db: Session, kind: str = PROGRESS_LESSONS, user_id: Optional[int] = None,
+                          batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Streams lesson or question progress rows as plain dicts, ordered by (user_id, id), batch_size rows per fetch."""
+    table = models.UserLessonProgress if kind == PROGRESS_LESSONS else models.UserQuestionProgress
+    query = select(*(getattr(table, column) for column in PROGRESS_EXPORT_COLUMNS[kind]))
+    if user_id is not None:
+        query = query.where(table.user_id == user_id)
+    query = query.order_by(table.user_id, table.id).execution_options(yield_per=batch_size)
+    for row in db.execute(query):
+        yield row._asdict()
@@ -2,17 +2,18 @@
 import random
 import string
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 
-from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload, load_only
+from sqlalchemy import func, select
 
 import models
 import schemas
 import security # Assuming security.py is in the root or accessible via PYTHONPATH
 from . import constants # app.crud.constants
+from . import crud_statistics
 from core.cache import cached # Исправленный импорт для cached decorator
-# from .utils import update_db_object # Not used directly in user functions shown
+from .utils import Page, paginate
 from app.exceptions.crud_exceptions import NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 
 import logging
@@ -36,10 +37,27 @@ def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
         selectinload(models.User.lesson_progress) # Assuming this relation exists
     ).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
-    return db.query(models.User).options(
-        selectinload(models.User.lesson_progress) # Assuming this relation exists
-    ).order_by(models.User.id).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+    """Page of users ordered by id; loads only the columns the list renders (no password hash, no progress)."""
+    query = db.query(models.User).options(load_only(
+        models.User.id, models.User.email, models.User.full_name, models.User.is_active,
+        models.User.is_superuser, models.User.is_email_verified, models.User.xp_points,
+        models.User.created_at, models.User.updated_at
+    ))
+    return paginate(query, [models.User.id], skip, limit, cursor)
+
+# Столбцы потоковой выгрузки пользователей (без хэша пароля и кодов подтверждения)
+USER_EXPORT_COLUMNS = (
+    "id", "email", "full_name", "is_active", "is_superuser", "is_email_verified", "xp_points", "created_at", "updated_at"
+)
+
+def iter_user_records(db: Session, batch_size: int = constants.EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Streams all users ordered by id as plain dicts, batch_size rows per server-side cursor fetch."""
+    query = select(*(getattr(models.User, column) for column in USER_EXPORT_COLUMNS))\
+        .order_by(models.User.id)\
+        .execution_options(yield_per=batch_size)
+    for row in db.execute(query):
+        yield row._asdict()
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     # Проверка на существующего пользователя
@@ -62,6 +80,7 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     
     try:
         db.add(db_user)
+        crud_statistics.increment(db, crud_statistics.ACTIVE_USERS)
         db.commit()
         db.refresh(db_user)
         # Consider sending an email here in a real app
@@ -84,6 +103,9 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate) -> m
         elif 'password' in update_data: # password key exists but is empty or None
             update_data.pop('password') # Don't update password if it's empty
 
+        if 'is_active' in update_data and update_data['is_active'] is not None and update_data['is_active'] != db_user.is_active:
+            crud_statistics.increment(db, crud_statistics.ACTIVE_USERS, 1 if update_data['is_active'] else -1)
+
         for key, value in update_data.items():
             setattr(db_user, key, value)
             
@@ -1,9 +1,85 @@
 # app/crud/utils.py
+import base64
+import binascii
+import json
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Query, Session
+
 import models
 import schemas
+from app.exceptions.crud_exceptions import InvalidInputException
 
 def update_db_object(db_obj: models.Base, update_data: schemas.BaseModel) -> models.Base:
     obj_data = update_data.model_dump(exclude_unset=True)
     for key, value in obj_data.items():
         setattr(db_obj, key, value)
-    return db_obj 
\ No newline at end of file
+    return db_obj
+
+# --- Пакетная вставка с получением id ---
+def insert_returning_ids(db: Session, model, rows: List[dict]) -> List[int]:
+    """
+    Inserts rows with multi-row INSERT ... RETURNING and returns their ids in the order of rows.
+
+    The ORM bulk insert leaves out None values, and every run of rows with a different set of
+    columns becomes its own statement, so rows are grouped by their None columns first.
+    SQLAlchemy keeps RETURNING in parameter order on SQLite only through a sentinel column and
+    otherwise falls back to one statement per row; within a write transaction SQLite gives the
+    rows of an INSERT ascending rowids in VALUES order, so there the ids are simply sorted.
+    """
+    if not rows:
+        return []
+    positions = sorted(range(len(rows)), key=lambda i: tuple(key for key, value in rows[i].items() if value is None))
+    grouped = [rows[i] for i in positions]
+    if db.get_bind().dialect.name == "sqlite":
+        ids = sorted(db.execute(insert(model).returning(model.id), grouped).scalars().all())
+    else:
+        ids = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), grouped).scalars().all()
+    result = [0] * len(rows)
+    for position, row_id in zip(positions, ids):
+        result[position] = row_id
+    return result
+
+# --- Постраничная выборка по ключу (keyset) ---
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str] # None - это последняя страница
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key of the last item of a page."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[int]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise InvalidInputException("Некорректный курсор страницы.")
+    if not isinstance(values, list) or len(values) != size or not all(type(value) is int for value in values):
+        raise InvalidInputException("Некорректный курсор страницы.")
+    return values
+
+def paginate(query: Query, keys: Sequence[Any], skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+    """
+    Orders the query by keys (columns forming a unique, NOT NULL sort key) and returns one page.
+
+    With a cursor the page starts right after the item it points to (WHERE (keys) > (cursor)),
+    so deep pages cost the same as the first one; skip is then ignored. Without a cursor
+    the old offset paging is used. One extra row is fetched to know whether a next page exists.
+    An empty page (limit <= 0) has no next cursor, so clients walking the pages stop.
+    """
+    after = decode_cursor(cursor, len(keys)) if cursor else None
+    if limit <= 0:
+        return Page([], None)
+    query = query.order_by(*keys)
+    if after is not None:
+        query = query.filter(tuple_(*keys) > tuple_(*after))
+    elif skip:
+        query = query.offset(skip)
+    items = query.limit(limit + 1).all()
+    if len(items) <= limit:
+        return Page(items, None)
+    items = items[:limit]
+    last = items[-1]
+    return Page(items, encode_cursor([getattr(last, key.key) for key in keys]))
@@ -0,0 +1,169 @@
+# app/grading/graders.py
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Type
+
+import models
+from app.crud import constants
+from core.cache import Cache
+from .text_matching import AnswerMatcher
+
+import logging
+logger = logging.getLogger(__name__)
+
+# --- Базовый класс проверяющего ---
+class Grader(ABC):
+    """
+    Проверяющий ответы на один конкретный вопрос.
+
+    Вопрос компилируется один раз в конструкторе (множества, кортежи,
+    нормализованные строки), после чего grade() работает без обращения к ORM.
+    """
+
+    def __init__(self, question: models.Question):
+        self.question_id = question.id
+        self.question_type = question.question_type
+        self.explanation = question.general_explanation
+
+    @abstractmethod
+    def grade(self, answer: Any) -> bool:
+        """True, если ответ верный; ответ неподходящего вида считается неверным."""
+
+    def correct_answer_details(self) -> Dict[str, Any]:
+        return {}
+
+
+# --- Реестр проверяющих по типу вопроса ---
+GRADERS: Dict[models.QuestionType, Type[Grader]] = {}
+
+def register_grader(question_type: models.QuestionType) -> Callable[[Type[Grader]], Type[Grader]]:
+    """
+    Декоратор регистрации проверяющего для типа вопроса
+
+    Args:
+        question_type: Тип вопроса, который обрабатывает класс
+    """
+    def decorator(grader_cls: Type[Grader]) -> Type[Grader]:
+        GRADERS[question_type] = grader_cls
+        return grader_cls
+    return decorator
+
+
+class UnsupportedGrader(Grader):
+    """Запасной вариант для типов вопросов без зарегистрированного проверяющего."""
+
+    def grade(self, answer: Any) -> bool:
+        return False
+
+
+@register_grader(models.QuestionType.SINGLE_CHOICE)
+class SingleChoiceGrader(Grader):
+    def __init__(self, question: models.Question):
+        super().__init__(question)
+        correct_option = next((opt for opt in question.options if opt.is_correct), None)
+        self.correct_option_id = correct_option.id if correct_option else None
+        self.correct_option_text = correct_option.text if correct_option else None
+
+    def grade(self, answer: Any) -> bool:
+        return self.correct_option_id is not None and not isinstance(answer, bool) and answer == self.correct_option_id
+
+    def correct_answer_details(self) -> Dict[str, Any]:
+        if self.correct_option_id is None:
+            return {}
+        return {
+            "correct_option_id": self.correct_option_id,
+            "correct_option_text": self.correct_option_text
+        }
+
+
+@register_grader(models.QuestionType.MULTIPLE_CHOICE)
+class MultipleChoiceGrader(Grader):
+    def __init__(self, question: models.Question):
+        super().__init__(question)
+        correct_options = [opt for opt in question.options if opt.is_correct]
+        self.correct_option_ids = frozenset(opt.id for opt in correct_options)
+        self.correct_option_texts = tuple(opt.text for opt in correct_options)
+
+    def grade(self, answer: Any) -> bool:
+        if not isinstance(answer, list):
+            return False
+        try:
+            return set(answer) == self.correct_option_ids
+        except TypeError: # Нехэшируемые элементы в ответе
+            return False
+
+    def correct_answer_details(self) -> Dict[str, Any]:
+        return {
+            "correct_option_ids": list(self.correct_option_ids),
+            "correct_option_texts": list(self.correct_option_texts)
+        }
+
+
+@register_grader(models.QuestionType.TRUE_FALSE)
+class TrueFalseGrader(Grader):
+    def __init__(self, question: models.Question):
+        super().__init__(question)
+        text = question.correct_answer_text
+        self.correct_bool_answer = text.lower() == "true" if text else None
+
+    def grade(self, answer: Any) -> bool:
+        return isinstance(answer, bool) and answer == bool(self.correct_bool_answer)
+
+    def correct_answer_details(self) -> Dict[str, Any]:
+        return {"correct_bool_answer": self.correct_bool_answer}
+
+
+@register_grader(models.QuestionType.FILL_IN_BLANK)
+class FillInBlankGrader(Grader):
+    def __init__(self, question: models.Question):
+        super().__init__(question)
+        self.correct_text_answer = question.correct_answer_text
+        self.matcher = AnswerMatcher(
+            [question.correct_answer_text, *(question.accepted_answers or [])],
+            max_typos=question.answer_max_typos,
+            ignore_word_order=bool(question.answer_ignore_word_order)
+        )
+
+    def grade(self, answer: Any) -> bool:
+        return isinstance(answer, str) and self.matcher.match(answer)
+
+    def correct_answer_details(self) -> Dict[str, Any]:
+        return {"correct_text_answer": self.correct_text_answer}
+
+
+# --- Кэш скомпилированных проверяющих ---
+# Каждый процесс держит свою копию: invalidate_grader() и clear_graders() сбрасывают только ее.
+# Правки контента, сделанные в других процессах (другие воркеры, manage_content.py), становятся
+# видны здесь после истечения CACHE_TTL - до этого вопрос проверяется по прежней версии.
+_compiled_graders = Cache(ttl=constants.CACHE_TTL, max_size=constants.MAX_CACHE_SIZE, name="graders")
+
+def _cache_key(question_id: int) -> str:
+    return f"grader:{question_id}"
+
+def compile_question(question: models.Question) -> Grader:
+    """
+    Компилирует вопрос в проверяющего и кладет результат в кэш
+
+    Args:
+        question: Вопрос с загруженными вариантами ответа
+
+    Returns:
+        Проверяющий для данного вопроса
+    """
+    grader_cls = GRADERS.get(question.question_type, UnsupportedGrader)
+    if grader_cls is UnsupportedGrader:
+        logger.warning(f"No grader registered for question type {question.question_type} (question {question.id})")
+    grader = grader_cls(question)
+    _compiled_graders.set(_cache_key(question.id), grader)
+    return grader
+
+def get_cached_grader(question_id: int) -> Optional[Grader]:
+    """Возвращает ранее скомпилированного проверяющего или None."""
+    return _compiled_graders.get(_cache_key(question_id))
+
+def invalidate_grader(question_id: int) -> None:
+    """Сбрасывает проверяющего после изменения вопроса или его вариантов."""
+    _compiled_graders.delete(_cache_key(question_id))
+
+def clear_graders() -> None:
+    """Сбрасывает всех проверяющих (массовые изменения и удаления контента)."""
+    _compiled_graders.clear()
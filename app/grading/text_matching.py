@@ -0,0 +1,127 @@
+# app/grading/text_matching.py
+import re
+import unicodedata
+from typing import Iterable, Optional
+
+from app.crud import constants
+
+# --- Нормализация ответов ---
+_NON_WORD_RE = re.compile(r"[\W_]+")
+_NUMBER_RE = re.compile(r"\d+")
+_YO_TABLE = str.maketrans({"ё": "е"})
+
+def normalize_answer(text: str, ignore_word_order: bool = False) -> str:
+    """
+    Приводит ответ к канонической форме для сравнения
+
+    Args:
+        text: Исходный текст ответа
+        ignore_word_order: Сортировать ли слова (для многословных терминов)
+
+    Returns:
+        Строка в NFKC без регистра, с ё→е, без пунктуации и лишних пробелов
+    """
+    text = unicodedata.normalize("NFKC", text).casefold().translate(_YO_TABLE)
+    words = _NON_WORD_RE.sub(" ", text).split()
+    if ignore_word_order:
+        words.sort()
+    return " ".join(words)
+
+
+# --- Префиксное дерево допустимых ответов ---
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+
+class AnswerMatcher:
+    """
+    Сопоставитель ответа с набором допустимых вариантов.
+
+    Все варианты нормализуются один раз и складываются в множество (точное
+    совпадение) и префиксные деревья (поиск с ограниченным расстоянием
+    Левенштейна в полосе шириной 2k+1, ветви отсекаются, как только минимум
+    строки превышает порог).
+
+    Числа опечатками не считаются: деревья разбиты по последовательности
+    чисел варианта, и ответ сравнивается с опечатками только с вариантами
+    с теми же числами ("статья 159" не засчитывается за "статья 158").
+    """
+
+    def __init__(self, variants: Iterable[str], max_typos: Optional[int] = None, ignore_word_order: bool = False):
+        """
+        Args:
+            variants: Допустимые формы ответа
+            max_typos: Допустимое число опечаток; None - значение по умолчанию,
+                которое применяется только к достаточно длинным ответам
+            ignore_word_order: Игнорировать ли порядок слов
+        """
+        self.ignore_word_order = ignore_word_order
+        self.explicit_max_typos = max_typos is not None
+        self.max_typos = max_typos if max_typos is not None else constants.FILL_IN_BLANK_DEFAULT_MAX_TYPOS
+        self._exact = set()
+        self._roots = {}
+        for variant in variants:
+            if not variant:
+                continue
+            normalized = normalize_answer(variant, ignore_word_order)
+            if normalized and normalized not in self._exact:
+                self._exact.add(normalized)
+                self._insert(normalized)
+
+    def _insert(self, word: str) -> None:
+        node = self._roots.setdefault(tuple(_NUMBER_RE.findall(word)), _TrieNode())
+        for ch in word:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.terminal = True
+
+    def _typos_allowed(self, word: str) -> int:
+        if self.explicit_max_typos or len(word) >= constants.FILL_IN_BLANK_TYPO_MIN_LENGTH:
+            return self.max_typos
+        return 0
+
+    def match(self, answer: str) -> bool:
+        word = normalize_answer(answer, self.ignore_word_order)
+        if not word:
+            return False
+        if word in self._exact:
+            return True
+        max_typos = self._typos_allowed(word)
+        if max_typos <= 0:
+            return False
+        root = self._roots.get(tuple(_NUMBER_RE.findall(word)))
+        if root is None:
+            return False
+        first_row = [i if i <= max_typos else max_typos + 1 for i in range(len(word) + 1)]
+        return any(
+            self._search(child, ch, 1, word, first_row, max_typos)
+            for ch, child in root.children.items()
+        )
+
+    def _search(self, node: _TrieNode, ch: str, depth: int, word: str, prev_row: list, max_typos: int) -> bool:
+        # Считаем только полосу |i - depth| <= max_typos: вне нее расстояние заведомо больше порога
+        limit = max_typos + 1
+        n = len(word)
+        row = [limit] * (n + 1)
+        if depth <= max_typos:
+            row[0] = depth
+        lo = max(1, depth - max_typos)
+        hi = min(n, depth + max_typos)
+        for i in range(lo, hi + 1):
+            row[i] = min(
+                row[i - 1] + 1,
+                prev_row[i] + 1,
+                prev_row[i - 1] + (word[i - 1] != ch),
+                limit
+            )
+        if node.terminal and row[n] <= max_typos:
+            return True
+        if lo > hi or min(row[0], min(row[lo:hi + 1])) > max_typos:
+            return False
+        return any(
+            self._search(child, next_ch, depth + 1, word, row, max_typos)
+            for next_ch, child in node.children.items()
+        )
@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, selectinload
+from sqlalchemy.pool import StaticPool
+
+import models
+import schemas
+from app.crud import crud_lesson_blocks
+
+QUESTIONS_PER_BLOCK = 50
+OPTIONS_PER_QUESTION = 6
+
+def seed_block(db) -> int:
+    discipline = models.Discipline(title=f"Бенчмарк {time.perf_counter_ns()}")
+    module = models.Module(title="Модуль", discipline=discipline)
+    lesson = models.Lesson(title="Урок", module=module)
+    block = models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.EXERCISE)
+    for q in range(QUESTIONS_PER_BLOCK):
+        question = models.Question(lesson_block=block, text=f"Вопрос {q}", question_type=models.QuestionType.SINGLE_CHOICE)
+        for o in range(OPTIONS_PER_QUESTION):
+            models.QuestionOption(question=question, text=f"Вариант {o}", is_correct=(o == 0))
+    db.add(discipline)
+    db.commit()
+    return block.id
+
+def build_update(db, block_id: int) -> schemas.LessonBlockUpdate:
+    """Типичная правка: 10 вопросов переименованы, в 20 изменен вариант, в 10 удален вариант, 5 удалены, 5 добавлены."""
+    block = db.query(models.LessonBlock).options(
+        selectinload(models.LessonBlock.questions).selectinload(models.Question.options)
+    ).filter(models.LessonBlock.id == block_id).one()
+    questions = []
+    for index, question in enumerate(block.questions[5:]):
+        options = [schemas.QuestionOptionUpdate(id=opt.id, text=opt.text, is_correct=opt.is_correct) for opt in question.options]
+        if index < 20:
+            options[1] = schemas.QuestionOptionUpdate(id=options[1].id, text="Измененный вариант", is_correct=False)
+        elif index < 30:
+            options.pop()
+        questions.append(schemas.QuestionUpdate(
+            id=question.id,
+            text=question.text + " (ред.)" if index < 10 else question.text,
+            question_type=question.question_type,
+            options=options
+        ))
+    for q in range(5):
+        questions.append(schemas.QuestionUpdate(
+            text=f"Новый вопрос {q}",
+            question_type=models.QuestionType.SINGLE_CHOICE,
+            options=[schemas.QuestionOptionUpdate(text=f"Вариант {o}", is_correct=(o == 0)) for o in range(OPTIONS_PER_QUESTION)]
+        ))
+    db.expunge_all()
+    return schemas.LessonBlockUpdate(questions=questions)
+
+def run(iterations: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    statements = 0
+    counting = False
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        nonlocal statements
+        if counting:
+            statements += 1
+
+    total = 0.0
+    for _ in range(iterations):
+        db = Session()
+        block_id = seed_block(db)
+        payload = build_update(db, block_id)
+        counting = True
+        start = time.perf_counter()
+        crud_lesson_blocks.update_lesson_block(db, block_id, payload)
+        total += time.perf_counter() - start
+        counting = False
+        db.close()
+
+    print(f"block {QUESTIONS_PER_BLOCK} questions x {OPTIONS_PER_QUESTION} options, {iterations} updates")
+    print(f"  avg update time: {total / iterations * 1000:.2f} ms")
+    print(f"  SQL statements per update (incl. reload for response): {statements / iterations:.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк обновления блока урока с вложенными вопросами.")
+    parser.add_argument("--iterations", type=int, default=20, help="Количество обновлений.")
+    args = parser.parse_args()
+    run(args.iterations)
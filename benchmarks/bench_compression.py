@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+import schemas
+from core import compression
+from core.cache import Cache
+
+THEORY_PARAGRAPH = (
+    "Гражданское законодательство основывается на признании равенства участников регулируемых им отношений, "
+    "неприкосновенности собственности, свободы договора, недопустимости произвольного вмешательства кого-либо "
+    "в частные дела, необходимости беспрепятственного осуществления гражданских прав. "
+)
+
+def theory_text(rng: random.Random, words: int = 300) -> str:
+    # Перемешанные слова: повторяемость ближе к реальной теории, чем у одного абзаца, размноженного много раз
+    vocabulary = THEORY_PARAGRAPH.split()
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def sample_discipline(modules: int, lessons: int) -> bytes:
+    """Дисциплина целиком, как ее отдает /disciplines/{d_id}: модули, уроки, теория, вопросы и варианты."""
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    question_id = 0
+    def question(block_id: int) -> schemas.Question:
+        nonlocal question_id
+        question_id += 1
+        return schemas.Question(
+            id=question_id, lesson_block_id=block_id, text=f"Вопрос {question_id}: что из перечисленного верно?",
+            question_type="single_choice", general_explanation="Пояснение к ответу. " * 5,
+            options=[schemas.QuestionOption(id=question_id * 10 + o, question_id=question_id, text=f"Вариант ответа {o}", is_correct=o == 0) for o in range(4)],
+        )
+    module_list = []
+    for m in range(modules):
+        lesson_list = []
+        for l in range(lessons):
+            lesson_id = m * lessons + l + 1
+            blocks = [
+                schemas.LessonBlock(id=lesson_id * 2, lesson_id=lesson_id, order_in_lesson=0, block_type="theory", theory_text=theory_text(rng)),
+                schemas.LessonBlock(id=lesson_id * 2 + 1, lesson_id=lesson_id, order_in_lesson=1, block_type="exercise",
+                                    questions=[question(lesson_id * 2 + 1) for _ in range(5)]),
+            ]
+            lesson_list.append(schemas.Lesson(id=lesson_id, module_id=m + 1, title=f"Урок {lesson_id}", order=l, blocks=blocks, created_at=now))
+        module_list.append(schemas.Module(id=m + 1, discipline_id=1, title=f"Модуль {m + 1}", order=m, lessons=lesson_list, created_at=now))
+    discipline = schemas.Discipline(id=1, title="Гражданское право", modules=module_list, created_at=now)
+    return discipline.model_dump_json().encode()
+
+def best_of(repeats: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(modules: int, lessons: int, repeats: int) -> None:
+    body = sample_discipline(modules, lessons)
+    print(f"Payload: {len(body) / 1024:.0f} KB JSON ({modules} modules x {lessons} lessons), best of {repeats}")
+    print(f"Available encodings: {', '.join(compression.available_encodings())}")
+
+    cases = [(compression.GZIP, level) for level in (1, 4, 6, 9)]
+    if compression.brotli is not None:
+        cases += [(compression.BROTLI, quality) for quality in (1, 4, 6, 11)]
+    if compression.zstandard is not None:
+        cases += [(compression.ZSTD, level) for level in (1, 3, 9, 19)]
+    for encoding, level in cases:
+        size = len(compression.compress(body, encoding, level))
+        elapsed = best_of(repeats, lambda: compression.compress(body, encoding, level))
+        throughput = len(body) / 1024 / 1024 / (elapsed / 1000)
+        print(f"  {encoding:>4} level {level:>2}: {size / 1024:7.1f} KB ({size / len(body):5.1%}), "
+              f"{elapsed:6.2f} ms ({throughput:5.0f} MB/s), saves {(len(body) - size) / 1024:.0f} KB")
+
+    # Повторный ответ: поиск в кэше вариантов вместо сжатия - по хэшу тела или по URL и ETag
+    middleware = compression.CompressionMiddleware(None, variant_cache=Cache(name="bench"))
+    representation = '/disciplines/1?:"0123456789abcdef01234567"'
+    async def cached_lookup(key) -> float:
+        await middleware.compressed_body(body, compression.GZIP, key)
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await middleware.compressed_body(body, compression.GZIP, key)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+    for name, key in (("body hash", None), ("URL + ETag", representation)):
+        print(f"  cached gzip variant by {name}: {asyncio.run(cached_lookup(key)):.3f} ms per response")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк сжатия крупных ответов с контентом: CPU против сэкономленных байт.")
+    parser.add_argument("--modules", type=int, default=8, help="Модулей в дисциплине.")
+    parser.add_argument("--lessons", type=int, default=10, help="Уроков в модуле.")
+    parser.add_argument("--repeats", type=int, default=20, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.modules, args.lessons, args.repeats)
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import models
+from app.grading import graders
+
+def make_question(question_id: int, question_type: models.QuestionType, options=(), correct_answer_text=None, accepted_answers=None):
+    return SimpleNamespace(
+        id=question_id,
+        question_type=question_type,
+        general_explanation=None,
+        correct_answer_text=correct_answer_text,
+        accepted_answers=accepted_answers,
+        answer_max_typos=None,
+        answer_ignore_word_order=False,
+        options=[SimpleNamespace(id=opt_id, text=f"Вариант {opt_id}", is_correct=is_correct) for opt_id, is_correct in options]
+    )
+
+CASES = [
+    (make_question(1, models.QuestionType.SINGLE_CHOICE, [(1, False), (2, True), (3, False), (4, False)]), 2),
+    (make_question(2, models.QuestionType.MULTIPLE_CHOICE, [(5, True), (6, False), (7, True), (8, True), (9, False), (10, False)]), [10, 5, 7]),
+    (make_question(3, models.QuestionType.TRUE_FALSE, correct_answer_text="true"), True),
+    (make_question(4, models.QuestionType.FILL_IN_BLANK, correct_answer_text="Гражданский кодекс"), "  гражданский кодекс "),
+]
+
+# Вопрос с несколькими десятками допустимых форм и ответом с опечаткой (нечеткий поиск по дереву)
+FUZZY_CASE = (
+    make_question(
+        5, models.QuestionType.FILL_IN_BLANK,
+        correct_answer_text="Гражданский кодекс Российской Федерации",
+        accepted_answers=[f"Гражданский кодекс, часть {part}" for part in range(1, 41)] + ["ГК РФ"]
+    ),
+    "гражданскй кодекс часть 17"
+)
+
+def run(iterations: int) -> None:
+    print(f"{'question type':<18} {'answers/sec':>14} {'ns/answer':>10}")
+    for question, answer in CASES:
+        grader = graders.compile_question(question)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            grader.grade(answer)
+        elapsed = time.perf_counter() - start
+        print(f"{question.question_type.value:<18} {iterations / elapsed:>14,.0f} {elapsed / iterations * 1e9:>10.0f}")
+
+    question, answer = FUZZY_CASE
+    grader = graders.compile_question(question)
+    assert grader.grade(answer)
+    fuzzy_iterations = max(iterations // 20, 1)
+    start = time.perf_counter()
+    for _ in range(fuzzy_iterations):
+        grader.grade(answer)
+    elapsed = time.perf_counter() - start
+    print(f"{'fill_in_blank~41':<18} {fuzzy_iterations / elapsed:>14,.0f} {elapsed / fuzzy_iterations * 1e9:>10.0f}")
+
+    # Полный путь через кэш: поиск проверяющего + проверка
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for question, answer in CASES:
+            graders.get_cached_grader(question.id).grade(answer)
+    elapsed = time.perf_counter() - start
+    print(f"{'cached dispatch':<18} {iterations * len(CASES) / elapsed:>14,.0f} {elapsed / (iterations * len(CASES)) * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки ответов по типам вопросов.")
+    parser.add_argument("--iterations", type=int, default=200_000, help="Количество проверок на каждый тип.")
+    args = parser.parse_args()
+    run(args.iterations)
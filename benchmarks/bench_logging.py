@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+import schemas
+from core import logging_config
+
+INFO_PER_REQUEST = 2
+DEBUG_PER_REQUEST = 8
+
+def sample_payload() -> schemas.LessonCreate:
+    return schemas.LessonCreate(
+        title="Урок", module_id=1,
+        blocks=[
+            schemas.LessonBlockCreate(
+                order_in_lesson=b, block_type="exercise",
+                questions=[
+                    schemas.QuestionCreate(
+                        text=f"Вопрос {q}", question_type="single_choice",
+                        options=[schemas.QuestionOptionCreate(text=f"Вариант {o}", is_correct=o == 0) for o in range(4)]
+                    )
+                    for q in range(5)
+                ]
+            )
+            for b in range(3)
+        ]
+    )
+
+def setup_synchronous(log_dir: str) -> None:
+    """Прежняя настройка: DEBUG, обработчики консоли и файла вызываются в потоке запроса."""
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S")
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.handlers = []
+    for handler in (logging.StreamHandler(sys.stdout), RotatingFileHandler(os.path.join(log_dir, "sync.log"), maxBytes=10*1024*1024, backupCount=5, encoding="utf-8")):
+        handler.setFormatter(formatter)
+        root_logger.addHandler(handler)
+
+def simulate_request(logger: logging.Logger, payload, eager: bool) -> None:
+    for i in range(INFO_PER_REQUEST):
+        logger.info("Request step %s finished for lesson %s", i, payload.title)
+    for i in range(DEBUG_PER_REQUEST):
+        if eager:
+            logger.debug("Received lesson data: %s", payload.model_dump_json(indent=2))
+        else:
+            logger.debug("Received lesson data: %s", logging_config.lazy(payload.model_dump_json))
+
+def measure(requests: int, eager: bool) -> float:
+    logger = logging.getLogger("bench")
+    payload = sample_payload()
+    start = time.perf_counter()
+    for _ in range(requests):
+        simulate_request(logger, payload, eager)
+    return (time.perf_counter() - start) / requests * 1e6
+
+def run(requests: int) -> None:
+    real_stdout = sys.stdout
+    results = []
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            setup_synchronous(log_dir)
+            results.append(("sync handlers, DEBUG, eager model_dump_json", measure(requests, eager=True), None))
+
+            cases = [
+                ("queue + JSON, DEBUG, lazy model_dump_json", "development", "json", 1.0),
+                ("queue + JSON, DEBUG sampled 1%", "development", "json", 0.01),
+                ("queue + JSON, production (INFO)", "production", "json", 1.0),
+            ]
+            for name, env, log_format, rate in cases:
+                os.environ["LOG_FORMAT"] = log_format
+                logging_config.setup_logging(env=env, log_dir=log_dir, debug_sample_rate=rate)
+                caller = measure(requests, eager=False)
+                drain_start = time.perf_counter()
+                logging_config.stop_logging()
+                drain = (time.perf_counter() - drain_start) / requests * 1e6
+                results.append((name, caller, drain))
+        finally:
+            sys.stdout = real_stdout
+            os.environ.pop("LOG_FORMAT", None)
+
+    print(f"{requests} requests, {INFO_PER_REQUEST} INFO + {DEBUG_PER_REQUEST} DEBUG records each")
+    for name, caller, drain in results:
+        background = f", background drain {drain:.1f} us" if drain is not None else ""
+        print(f"  {name}: {caller:.1f} us per request in the request thread{background}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк накладных расходов логирования на запрос.")
+    parser.add_argument("--requests", type=int, default=2000, help="Количество имитируемых запросов.")
+    args = parser.parse_args()
+    run(args.requests)
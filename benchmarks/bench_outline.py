@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+from typing import List
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+import schemas
+from app.crud import crud_lessons, crud_modules
+from core import serialization
+
+def seed(db, lessons: int, theory_words: int) -> models.Module:
+    """Один модуль: lessons уроков, в каждом блок теории и блок упражнений с 5 вопросами по 4 варианта."""
+    discipline = models.Discipline(title="Гражданское право")
+    module = models.Module(title="Модуль", order=0, discipline=discipline)
+    for l in range(lessons):
+        lesson = models.Lesson(title=f"Урок {l}", order=l, module=module)
+        models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.THEORY, theory_text="Текст теории " * theory_words)
+        block = models.LessonBlock(lesson=lesson, order_in_lesson=1, block_type=models.LessonBlockType.EXERCISE)
+        for q in range(5):
+            question = models.Question(lesson_block=block, text=f"Вопрос {q}: что из перечисленного верно?", question_type=models.QuestionType.SINGLE_CHOICE, general_explanation="Пояснение. " * 20)
+            for o in range(4):
+                models.QuestionOption(question=question, text=f"Вариант {o}", is_correct=o == 0)
+    db.add(discipline)
+    db.commit()
+    return module
+
+def value_size(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, bytes):
+        return len(value)
+    return 8
+
+class ReadMeter:
+    """Запоминает SQL запросов и считает байты значений, которые эти запросы читают из SQLite."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def measure(self, func):
+        self.statements = []
+        result = func()
+        statements = self.statements
+        # Повтор тех же запросов напрямую через sqlite3: строки считаются вне ORM
+        raw = self.engine.raw_connection()
+        try:
+            read = sum(value_size(value) for statement, parameters in statements
+                       for row in raw.cursor().execute(statement, parameters) for value in row)
+        finally:
+            raw.close()
+        return result, len(statements), read
+
+def best_of(repeats: int, Session, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        db = Session()
+        start = time.perf_counter()
+        func(db)
+        best = min(best, time.perf_counter() - start)
+        db.close()
+    return best * 1000
+
+def run(lessons: int, theory_words: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    module_id = seed(db, lessons, theory_words).id
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    # Загрузка и сериализация, как в эндпоинтах
+    cases = [
+        (f"/modules/{{m_id}}/lessons/?l={lessons}",
+         lambda db: serialization.dump_json(List[schemas.Lesson], crud_lessons.get_lessons_by_module(db, module_id, user_id, limit=lessons).items)),
+        ("/modules/{m_id}/outline",
+         lambda db: serialization.dump_json(schemas.ModuleOutline, crud_modules.get_module_outline(db, module_id, user_id))),
+    ]
+    meter = ReadMeter(engine)
+    print(f"{lessons} lessons, theory {theory_words} words per lesson, best of {repeats}")
+    for route, func in cases:
+        db = Session()
+        body, queries, read = meter.measure(lambda: func(db))
+        db.close()
+        elapsed = best_of(repeats, Session, func)
+        print(f"  {route}: {queries} queries, {read / 1024:.1f} KB read from SQLite, response {len(body) / 1024:.1f} KB, {elapsed:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк оглавления модуля против полного списка уроков: запросы, байты из SQLite, размер ответа.")
+    parser.add_argument("--lessons", type=int, default=30, help="Уроков в модуле.")
+    parser.add_argument("--theory-words", type=int, default=400, help="Слов в тексте теории каждого урока.")
+    parser.add_argument("--repeats", type=int, default=20, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.lessons, args.theory_words, args.repeats)
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_lessons, crud_users
+from app.crud.utils import encode_cursor
+
+def seed(db, rows: int) -> int:
+    """rows пользователей и rows уроков в одном модуле (по 10 уроков на значение order)."""
+    db.execute(insert(models.User), [
+        {"email": f"user{i}@example.com", "hashed_password": "x", "full_name": f"Пользователь {i}"}
+        for i in range(rows)
+    ])
+    discipline = models.Discipline(title="Бенчмарк")
+    module = models.Module(title="Модуль", discipline=discipline)
+    db.add(discipline)
+    db.flush()
+    db.execute(insert(models.Lesson), [
+        {"title": f"Урок {i}", "module_id": module.id, "order": i // 10} for i in range(rows)
+    ])
+    db.commit()
+    return module.id
+
+def measure(Session, fetch, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        db = Session()
+        start = time.perf_counter()
+        fetch(db)
+        best = min(best, time.perf_counter() - start)
+        db.close()
+    return best * 1000
+
+def run(page_size: int, deep_page: int, repeats: int) -> None:
+    rows = page_size * deep_page
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    module_id = seed(db, rows)
+
+    # Курсор на последний элемент предыдущей страницы - то, что клиент получил бы в X-Next-Cursor
+    skip = (deep_page - 1) * page_size
+    user_cursor = encode_cursor([skip])
+    lesson = db.query(models.Lesson).filter(models.Lesson.module_id == module_id)\
+        .order_by(models.Lesson.order, models.Lesson.id).offset(skip - 1).first()
+    lesson_cursor = encode_cursor([lesson.order, lesson.id])
+    db.close()
+
+    cases = [
+        ("users", lambda db, s, c: crud_users.get_users(db, skip=s, limit=page_size, cursor=c), user_cursor),
+        ("lessons by module", lambda db, s, c: crud_lessons.get_lessons_by_module(db, module_id, skip=s, limit=page_size, cursor=c), lesson_cursor),
+    ]
+    print(f"{rows:,} rows per list, page size {page_size}, best of {repeats}")
+    for name, fetch, cursor in cases:
+        first = measure(Session, lambda db: fetch(db, 0, None), repeats)
+        deep_offset = measure(Session, lambda db: fetch(db, skip, None), repeats)
+        deep_keyset = measure(Session, lambda db: fetch(db, 0, cursor), repeats)
+        print(f"  {name}: page 1 {first:.2f} ms, page {deep_page:,} offset {deep_offset:.2f} ms, keyset {deep_keyset:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк постраничной выборки: offset против курсора.")
+    parser.add_argument("--page-size", type=int, default=20, help="Размер страницы.")
+    parser.add_argument("--deep-page", type=int, default=10_000, help="Номер глубокой страницы.")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.page_size, args.deep_page, args.repeats)
@@ -0,0 +1,73 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_question_stats
+
+def synthetic_answers(rows: int, questions: int, users: int, seed: int = 0):
+    """Ответы с правдоподобной структурой: способность пользователя против трудности вопроса."""
+    rng = np.random.default_rng(seed)
+    question_ids = rng.integers(1, questions + 1, size=rows)
+    user_ids = rng.integers(1, users + 1, size=rows)
+    ability = rng.normal(size=users + 1)
+    difficulty = rng.normal(size=questions + 1)
+    probability = 1 / (1 + np.exp(difficulty[question_ids] - ability[user_ids]))
+    correct = (rng.random(rows) < probability).astype(np.int64)
+    return question_ids, user_ids, correct
+
+def run_compute(rows: int, questions: int, lessons: int, users: int) -> None:
+    question_ids = np.arange(1, questions + 1)
+    lesson_ids = np.sort(np.arange(questions) % lessons + 1)
+    answers = synthetic_answers(rows, questions, users)
+
+    start = time.perf_counter()
+    stats = crud_question_stats.compute_question_stats(question_ids, lesson_ids, *answers)
+    elapsed = time.perf_counter() - start
+
+    discrimination = stats["discrimination"]
+    print(f"compute: {rows:,} answers, {questions} questions, {lessons} lessons, {users:,} users")
+    print(f"  time: {elapsed:.2f} s ({rows / elapsed / 1e6:.1f} M answers/s)")
+    print(f"  median p-value: {np.nanmedian(stats['p_value']):.3f}, median discrimination: {np.nanmedian(discrimination):.3f}")
+
+def run_load(rows: int, questions: int, users: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    question_ids, user_ids, correct = synthetic_answers(rows, questions, users)
+    # Повторные ответы на тот же вопрос остаются в истории; загружается только первая попытка пары
+    db.execute(insert(models.AnswerAttempt), [
+        {"question_id": q, "user_id": u, "is_correct": bool(c)}
+        for q, u, c in zip(question_ids.tolist(), user_ids.tolist(), correct.tolist())
+    ])
+    db.commit()
+
+    start = time.perf_counter()
+    loaded = crud_question_stats.load_answer_arrays(db)
+    elapsed = time.perf_counter() - start
+    print(f"load from SQLite: {rows:,} attempts, {len(loaded[0]):,} first attempts in {elapsed:.2f} s")
+    db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк пакетного расчета статистики трудности вопросов.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Количество ответов для векторного расчета.")
+    parser.add_argument("--questions", type=int, default=5000, help="Количество вопросов.")
+    parser.add_argument("--lessons", type=int, default=500, help="Количество уроков.")
+    parser.add_argument("--users", type=int, default=200_000, help="Количество пользователей.")
+    parser.add_argument("--db-rows", type=int, default=0, help="Также замерить загрузку стольких строк из SQLite (0 - не замерять).")
+    args = parser.parse_args()
+    run_compute(args.rows, args.questions, args.lessons, args.users)
+    if args.db_rows:
+        run_load(args.db_rows, args.questions, args.users)
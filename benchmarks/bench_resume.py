@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+import schemas
+from app.crud import crud_disciplines, crud_lessons, crud_modules, crud_resume
+from core import serialization
+
+def seed(db, disciplines: int, modules: int, lessons: int, completed_share: float) -> int:
+    """Дисциплины с модулями и уроками (блок теории и упражнение в каждом); пользователь прошел первую долю уроков каждой дисциплины."""
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    for d in range(disciplines):
+        discipline = models.Discipline(title=f"Дисциплина {d}")
+        for m in range(modules):
+            module = models.Module(title=f"Модуль {m}", order=m, discipline=discipline)
+            for l in range(lessons):
+                lesson = models.Lesson(title=f"Урок {l}", order=l, module=module)
+                models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.THEORY, theory_text="Текст теории " * 100)
+                block = models.LessonBlock(lesson=lesson, order_in_lesson=1, block_type=models.LessonBlockType.EXERCISE)
+                models.Question(lesson_block=block, text="Вопрос?", question_type=models.QuestionType.TRUE_FALSE, correct_answer_text="true")
+        db.add(discipline)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    for discipline_id in db.scalars(select(models.Discipline.id)):
+        lesson_ids = db.scalars(
+            select(models.Lesson.id).join(models.Module).where(models.Module.discipline_id == discipline_id)
+            .order_by(models.Module.order, models.Module.id, models.Lesson.order, models.Lesson.id)
+        ).all()
+        done = lesson_ids[:int(len(lesson_ids) * completed_share)]
+        if done:
+            db.execute(insert(models.UserLessonProgress), [{"user_id": user.id, "lesson_id": lesson_id, "completed_at": now} for lesson_id in done])
+    db.commit()
+    return user.id
+
+def _fetch(annotation, content) -> list:
+    # Тело ответа эндпоинта и его разбор на клиенте
+    return json.loads(serialization.dump_json(annotation, content))
+
+def walk(db, user_id: int) -> List[int]:
+    """Как клиент без указателя: дисциплины -> модули -> уроки, первый непройденный урок каждой дисциплины."""
+    found = []
+    for discipline in _fetch(List[schemas.Discipline], crud_disciplines.get_disciplines(db, user_id=user_id).items):
+        for module in _fetch(List[schemas.Module], crud_modules.get_modules_by_discipline(db, discipline["id"], user_id=user_id).items):
+            lessons = _fetch(List[schemas.Lesson], crud_lessons.get_lessons_by_module(db, module["id"], user_id).items)
+            next_lesson = next((lesson["id"] for lesson in lessons if not lesson["is_completed_by_user"]), None)
+            if next_lesson is not None:
+                found.append(next_lesson)
+                break
+    return found
+
+def measure(engine, Session, repeats: int, func):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    db = Session()
+    result = func(db)
+    db.close()
+    event.remove(engine, "before_cursor_execute", listener)
+    best = float("inf")
+    for _ in range(repeats):
+        db = Session()
+        start = time.perf_counter()
+        func(db)
+        best = min(best, time.perf_counter() - start)
+        db.close()
+    return result, len(statements), best * 1000
+
+def run(disciplines: int, modules: int, lessons: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    user_id = seed(db, disciplines, modules, lessons, 0.5)
+    crud_resume.rebuild_pointers(db)
+    db.close()
+
+    print(f"{disciplines} disciplines x {modules} modules x {lessons} lessons, half completed, best of {repeats}")
+    walked, walk_queries, walk_ms = measure(engine, Session, repeats, lambda db: walk(db, user_id))
+    pointers, resume_queries, resume_ms = measure(engine, Session, repeats, lambda db: crud_resume.get_resume(db, user_id))
+    assert sorted(walked) == sorted(pointer["lesson_id"] for pointer in pointers)
+    print(f"  walk /disciplines/ -> modules -> lessons: {walk_queries} queries, {walk_ms:.1f} ms")
+    print(f"  /users/me/resume: {resume_queries} queries, {resume_ms:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Бенчмарк "продолжить обучение": обход дерева контента против указателя по ключу.')
+    parser.add_argument("--disciplines", type=int, default=5, help="Дисциплин.")
+    parser.add_argument("--modules", type=int, default=10, help="Модулей в дисциплине.")
+    parser.add_argument("--lessons", type=int, default=20, help="Уроков в модуле.")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.disciplines, args.modules, args.lessons, args.repeats)
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_review
+
+def seed(engine, users: int, questions: int, seed_value: int) -> datetime:
+    """Каждый пользователь ответил на все вопросы; сроки повторения - от месяца назад до полугода вперед."""
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Discipline), [{"title": "Гражданское право"}])
+        conn.execute(insert(models.Module), [{"title": "Модуль", "order": 0, "discipline_id": 1}])
+        conn.execute(insert(models.Lesson), [{"title": "Урок", "order": 0, "module_id": 1}])
+        conn.execute(insert(models.LessonBlock), [{"lesson_id": 1, "order_in_lesson": 0, "block_type": models.LessonBlockType.EXERCISE}])
+        conn.execute(insert(models.Question), [
+            {"lesson_block_id": 1, "text": f"Вопрос {q}", "question_type": models.QuestionType.TRUE_FALSE} for q in range(questions)
+        ])
+        conn.execute(insert(models.User), [{"email": f"user{u}@example.com", "hashed_password": "x"} for u in range(users)])
+        for user_id in range(1, users + 1):
+            conn.execute(insert(models.UserQuestionProgress), [
+                {"user_id": user_id, "question_id": question_id, "is_correct": True, "answered_at": now,
+                 "due_at": now + timedelta(days=rng.uniform(-30, 180))}
+                for question_id in range(1, questions + 1)
+            ])
+    return now
+
+def scan_due(db, user_id: int, now: datetime, limit: int):
+    # Без индекса по сроку: все ответы пользователя читаются и сортируются в приложении
+    progress = models.UserQuestionProgress
+    rows = db.execute(select(progress.question_id, progress.due_at).where(progress.user_id == user_id)).all()
+    now_naive = now.replace(tzinfo=None)
+    return sorted((row for row in rows if row.due_at <= now_naive), key=lambda row: row.due_at)[:limit]
+
+def best_of(repeats: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(users: int, questions: int, limit: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    now = seed(engine, users, questions, 42)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user_id = users // 2
+    print(f"{users} users x {questions} answered questions, next {limit} due, best of {repeats}")
+    scan_ms = best_of(repeats, lambda: scan_due(db, user_id, now, limit))
+    index_ms = best_of(repeats, lambda: crud_review.get_review_queue(db, user_id, limit, now=now))
+    assert [row.question_id for row in scan_due(db, user_id, now, limit)] == \
+        [row["question_id"] for row in crud_review.get_review_queue(db, user_id, limit, now=now)]
+    print(f"  scan of the user's answers: {scan_ms:.2f} ms")
+    print(f"  (user_id, due_at) index range: {index_ms:.2f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк очереди повторения: диапазон индекса (user_id, due_at) против просмотра всех ответов пользователя.")
+    parser.add_argument("--users", type=int, default=200, help="Пользователей.")
+    parser.add_argument("--questions", type=int, default=5000, help="Отвеченных вопросов у каждого пользователя.")
+    parser.add_argument("--limit", type=int, default=20, help="Вопросов в очереди.")
+    parser.add_argument("--repeats", type=int, default=20, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.users, args.questions, args.limit, args.repeats)
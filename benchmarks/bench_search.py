@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import itertools
+import random
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_search
+
+SYLLABLES = ["ва", "ни", "ко", "ра", "ст", "ли", "то", "ме", "не", "по", "де", "ло", "ри", "ка", "за", "ти", "ве", "ны", "до", "пре"]
+ENDINGS = ["", "а", "у", "ом", "ы", "ов", "ами", "е", "и", "ях"]
+TERMS = ["договор", "аренд", "собственност", "обязательств", "наследств", "залог", "поручительств", "неустойк", "давност", "виндикац"]
+
+def vocabulary(rng: random.Random, size: int) -> list:
+    """Основы слов: псевдослова из слогов плюс юридические термины в середине частотного списка."""
+    stems = {"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size * 2)}
+    stems = sorted(stems - set(TERMS))[:size]
+    for position, term in enumerate(TERMS):
+        stems.insert(50 * (position + 1), term)
+    return stems
+
+def words(rng: random.Random, stems: list, cum_weights: list, count: int) -> str:
+    # Частоты по закону Ципфа, как в естественном тексте
+    return " ".join(stem + rng.choice(ENDINGS) for stem in rng.choices(stems, cum_weights=cum_weights, k=count))
+
+def seed(engine, blocks: int, words_per_block: int, seed_value: int) -> float:
+    """Блоки теории по 100 на урок; индекс FTS5 заполняется триггерами при вставке. Возвращает время вставки с индексацией, с."""
+    rng = random.Random(seed_value)
+    stems = vocabulary(rng, 20000)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(stems) + 1)))
+    lessons = (blocks + 99) // 100
+    texts = [words(rng, stems, weights, words_per_block) for _ in range(blocks)]
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(models.Discipline), [{"title": "Гражданское право"}])
+        conn.execute(insert(models.Module), [{"title": "Модуль", "order": 0, "discipline_id": 1}])
+        conn.execute(insert(models.Lesson), [{"title": f"Урок {i}: {words(rng, stems, weights, 3)}", "order": i, "module_id": 1} for i in range(lessons)])
+        for offset in range(0, blocks, 10000):
+            conn.execute(insert(models.LessonBlock), [
+                {"lesson_id": i // 100 + 1, "order_in_lesson": i % 100, "block_type": models.LessonBlockType.THEORY,
+                 "theory_text": texts[i], "theory_size": 0}
+                for i in range(offset, min(offset + 10000, blocks))
+            ])
+    return time.perf_counter() - start
+
+def best_of(repeats: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(blocks: int, words_per_block: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    elapsed = seed(engine, blocks, words_per_block, 42)
+    print(f"{blocks} theory blocks, {words_per_block} words each: inserted and indexed in {elapsed:.1f} s, best of {repeats}")
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    for query in ["договоры", "залог договора", "неустойки давности", "виндикации"]:
+        # LIKE: подстрока основы каждого слова, полный просмотр теории; ранжировать можно только все совпадения
+        like = select(models.LessonBlock.id).where(
+            *[models.LessonBlock.theory_text.like(f"%{crud_search._stem(word)}%") for word in query.split()]
+        )
+        like_ms = best_of(repeats, lambda: db.execute(like).all())
+        matches = len(db.execute(like).all())
+        fts_ms = best_of(repeats, lambda: crud_search.search(db, query, [crud_search.KIND_THEORY], limit=20))
+        print(f"  {query!r}: {matches} matching blocks; LIKE all matches {like_ms:.1f} ms, FTS5 top 20 by bm25 with snippets {fts_ms:.1f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк полнотекстового поиска: FTS5 с ранжированием против LIKE '%слово%' по теории.")
+    parser.add_argument("--blocks", type=int, default=100000, help="Блоков теории в корпусе.")
+    parser.add_argument("--words", type=int, default=60, help="Слов в каждом блоке.")
+    parser.add_argument("--repeats", type=int, default=5, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.blocks, args.words, args.repeats)
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.responses import JSONResponse
+
+import models
+import schemas
+from app.crud import crud_disciplines, crud_lessons, crud_modules
+from core import serialization
+
+def seed(db, modules: int, lessons: int) -> models.Discipline:
+    """Одна дисциплина: modules модулей по lessons уроков, в каждом уроке теория и 5 вопросов по 4 варианта."""
+    discipline = models.Discipline(title="Гражданское право", description="Бенчмарк")
+    for m in range(modules):
+        module = models.Module(title=f"Модуль {m}", order=m, discipline=discipline)
+        for l in range(lessons):
+            lesson = models.Lesson(title=f"Урок {m}.{l}", order=l, module=module)
+            models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.THEORY, theory_text="Текст теории. " * 150)
+            block = models.LessonBlock(lesson=lesson, order_in_lesson=1, block_type=models.LessonBlockType.EXERCISE)
+            for q in range(5):
+                question = models.Question(lesson_block=block, text=f"Вопрос {q}", question_type=models.QuestionType.SINGLE_CHOICE, general_explanation="Пояснение. " * 5)
+                for o in range(4):
+                    models.QuestionOption(question=question, text=f"Вариант {o}", is_correct=o == 0)
+    db.add(discipline)
+    db.commit()
+    return discipline
+
+async def fastapi_path(field, content) -> bytes:
+    """Как сейчас: проверка в модель, сериализация в dict/list (serialize_response) и json.dumps в JSONResponse."""
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+async def best_of(repeats: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        if asyncio.iscoroutine(result):
+            await result
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+async def compare(cases, repeats: int) -> None:
+    for route, annotation, content in cases:
+        # Поле ответа FastAPI создает один раз на маршрут
+        field = create_response_field(name="response", type_=annotation)
+        expected = await fastapi_path(field, content)
+        assert serialization.dump_json(annotation, content) == expected, route
+        current = await best_of(repeats, lambda: fastapi_path(field, content))
+        fast = await best_of(repeats, lambda: serialization.dump_json(annotation, content))
+        print(f"  {route}: {len(expected) / 1024:.0f} KB, FastAPI {current:.2f} ms, dump_json {fast:.2f} ms ({current / fast:.1f}x)")
+
+def run(modules: int, lessons: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    discipline = seed(db, modules, lessons)
+    module_id = discipline.modules[0].id
+    lesson_id = discipline.modules[0].lessons[0].id
+    db.expunge_all()
+
+    # Объекты загружаются один раз: замеряется только сериализация, без SQL
+    cases = [
+        ("/disciplines/{d_id}", schemas.Discipline, crud_disciplines.get_discipline(db, discipline.id)),
+        ("/modules/{m_id}", schemas.Module, crud_modules.get_module(db, module_id)),
+        ("/modules/{m_id}/lessons/", List[schemas.Lesson], crud_lessons.get_lessons_by_module(db, module_id, limit=lessons).items),
+        ("/lessons/{l_id}", schemas.Lesson, crud_lessons.get_lesson(db, lesson_id)),
+    ]
+    print(f"{modules} modules x {lessons} lessons, best of {repeats}")
+    asyncio.run(compare(cases, repeats))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов с контентом: путь FastAPI против TypeAdapter.dump_json.")
+    parser.add_argument("--modules", type=int, default=8, help="Модулей в дисциплине.")
+    parser.add_argument("--lessons", type=int, default=10, help="Уроков в модуле.")
+    parser.add_argument("--repeats", type=int, default=20, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.modules, args.lessons, args.repeats)
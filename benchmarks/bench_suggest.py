@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import argparse
+import random
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_suggest
+
+WORDS = ["Договор", "аренды", "купли-продажи", "Наследование", "по", "закону", "Право", "собственности", "Залог",
+         "Исковая", "давность", "Обязательства", "из", "причинения", "вреда", "Сделки", "недействительность", "Ёмкость"]
+
+def seed(engine, lessons: int, seed_value: int) -> None:
+    """Дисциплины по 10 модулей, модули по 50 уроков; названия из юридических слов с номером."""
+    rng = random.Random(seed_value)
+    modules = (lessons + 49) // 50
+    disciplines = (modules + 9) // 10
+    def title(number: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))) + f" {number}"
+    with engine.begin() as conn:
+        conn.execute(insert(models.Discipline), [{"title": title(i)} for i in range(disciplines)])
+        conn.execute(insert(models.Module), [{"title": title(i), "order": i, "discipline_id": i // 10 + 1} for i in range(modules)])
+        conn.execute(insert(models.Lesson), [{"title": title(i), "order": i, "module_id": i // 50 + 1} for i in range(lessons)])
+
+def best_of(repeats: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run(lessons: int, repeats: int) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    seed(engine, lessons, 42)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    start = time.perf_counter()
+    crud_suggest.load_index(db)
+    print(f"{lessons} lessons: title index built in {(time.perf_counter() - start) * 1000:.0f} ms, best of {repeats}")
+    for query in ["д", "дог", "ДОГОВОР АРЕН", "аренд", "емк", "вреда сделки", "купли прод 12"]:
+        # LIKE 'слово%' по названию урока: в SQLite без учета регистра только для ASCII, начало слова - лишь первого
+        like = select(models.Lesson.id, models.Lesson.title).where(models.Lesson.title.ilike(f"{query}%")).limit(10)
+        like_ms = best_of(repeats, lambda: db.execute(like).all())
+        like_hits = len(db.execute(like).all())
+        index_ms = best_of(repeats, lambda: crud_suggest.suggest(db, query))
+        index_hits = len(crud_suggest.suggest(db, query))
+        print(f"  {query!r}: LIKE prefix {like_ms:.3f} ms ({like_hits} hits), prefix index {index_ms:.3f} ms ({index_hits} hits)")
+    db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк подсказок по названиям: индекс префиксов в памяти против LIKE в SQLite.")
+    parser.add_argument("--lessons", type=int, default=50000, help="Уроков (модулей - в 50 раз меньше, дисциплин - в 500).")
+    parser.add_argument("--repeats", type=int, default=50, help="Повторов каждого замера.")
+    args = parser.parse_args()
+    run(args.lessons, args.repeats)
@@ -3,23 +3,31 @@ from typing import Any, Callable, Optional, TypeVar, cast
 import time
 from datetime import datetime, timedelta
 
+from core.metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+
 T = TypeVar('T')
 
 class Cache:
     """Класс для управления кэшированием данных"""
     
-    def __init__(self, ttl: int = 300, max_size: int = 1000):
+    def __init__(self, ttl: int = 300, max_size: int = 1000, name: str = "default"):
         """
         Инициализация кэша
         
         Args:
             ttl: Время жизни кэша в секундах (по умолчанию 5 минут)
             max_size: Максимальный размер кэша (по умолчанию 1000 элементов)
+            name: Имя кэша в метриках (cache_requests_total, cache_evictions_total)
         """
         self.ttl = ttl
         self.max_size = max_size
+        self.name = name
         self._cache = {}
         self._timestamps = {}
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+        self._expired = CACHE_EVICTIONS.labels(name, "expired")
+        self._evicted = CACHE_EVICTIONS.labels(name, "size")
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -32,13 +40,17 @@ class Cache:
             Значение из кэша или None, если значение не найдено или устарело
         """
         if key not in self._cache:
+            self._misses.inc()
             return None
             
         if time.time() - self._timestamps[key] > self.ttl:
             del self._cache[key]
             del self._timestamps[key]
+            self._expired.inc()
+            self._misses.inc()
             return None
             
+        self._hits.inc()
         return self._cache[key]
     
     def set(self, key: str, value: Any) -> None:
@@ -54,6 +66,7 @@ class Cache:
             oldest_key = min(self._timestamps.items(), key=lambda x: x[1])[0]
             del self._cache[oldest_key]
             del self._timestamps[oldest_key]
+            self._evicted.inc()
             
         self._cache[key] = value
         self._timestamps[key] = time.time()
@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # pyarrow - необязательная зависимость, нужна только для колоночного экспорта
+    pa = None
+    pq = None
+
+ARROW = "arrow"
+PARQUET = "parquet"
+
+MEDIA_TYPES = {
+    ARROW: "application/vnd.apache.arrow.stream",
+    PARQUET: "application/vnd.apache.parquet",
+}
+FILE_EXTENSIONS = {ARROW: "arrows", PARQUET: "parquet"}
+
+
+def is_available() -> bool:
+    """Установлен ли pyarrow"""
+    return pa is not None
+
+
+class _ChunkSink:
+    """Файлоподобный приемник только для записи: копит байты до выдачи очередного куска ответа"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(columns: List[Tuple[str, str]]):
+    types = {"string": pa.string(), "int64": pa.int64(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[type_name]) for name, type_name in columns])
+
+
+def iter_columnar(batches: Iterable[Dict[str, list]], columns: List[Tuple[str, str]], file_format: str) -> Iterator[bytes]:
+    """
+    Кодирует пакеты столбцов в поток Arrow IPC или Parquet, отдавая байты после каждого пакета
+
+    Args:
+        batches: Пакеты вида {столбец: [значения]}
+        columns: Схема - список (имя столбца, тип: "string", "int64" или "timestamp")
+        file_format: ARROW или PARQUET
+
+    Returns:
+        Итератор кусков файла; в памяти одновременно находится не более одного пакета
+    """
+    if not is_available():
+        raise RuntimeError("pyarrow is not installed")
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    output = pa.PythonFile(sink, mode="w")
+    if file_format == PARQUET:
+        writer = pq.ParquetWriter(output, schema)
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch], schema=schema))
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+        write = writer.write_batch
+
+    yield sink.drain()
+    for batch in batches:
+        # Каждый пакет Parquet становится отдельной группой строк
+        write(pa.record_batch([batch[name] for name in schema.names], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,246 @@
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+from core import conditional
+from core.cache import Cache
+
+try:
+    import brotli
+except ImportError: # brotli - необязательная зависимость: без нее Content-Encoding: br не предлагается
+    brotli = None
+
+try:
+    import zstandard
+except ImportError: # zstandard - необязательная зависимость: без нее Content-Encoding: zstd не предлагается
+    zstandard = None
+
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+
+# При равном q клиента выбирается первая доступная: zstd и brotli на малых уровнях быстрее gzip при не худшем сжатии
+PREFERENCE = (ZSTD, BROTLI, GZIP)
+DEFAULT_LEVELS = {GZIP: 6, BROTLI: 4, ZSTD: 3}
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+)
+
+
+def available_encodings() -> List[str]:
+    """Кодировки, для которых установлены библиотеки, в порядке предпочтения сервера"""
+    installed = {GZIP: True, BROTLI: brotli is not None, ZSTD: zstandard is not None}
+    return [encoding for encoding in PREFERENCE if installed[encoding]]
+
+def choose_encoding(accept_encoding: str, encodings: Sequence[str]) -> Optional[str]:
+    """
+    Выбор кодировки по Accept-Encoding (с учетом q и '*')
+
+    Args:
+        accept_encoding: Значение заголовка запроса
+        encodings: Доступные кодировки в порядке предпочтения сервера
+
+    Returns:
+        Кодировка или None, если сжимать не нужно
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Сжатие тела целиком"""
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=level)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31: формат gzip
+    return compressor.compress(data) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Сжатие потокового ответа: каждый кусок выталкивается сразу, чтобы клиент видел прогресс"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == BROTLI:
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == ZSTD:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == BROTLI:
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == ZSTD:
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == BROTLI:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware сжатия ответов (gzip, а также br и zstd, если установлены brotli и zstandard)
+
+    Готовые сжатые варианты одинаковых тел хранятся в кэше по хэшу тела и кодировке:
+    повторный ответ с тем же содержимым не сжимается заново.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, levels: Optional[Dict[str, int]] = None,
+                 variant_cache: Optional[Cache] = None, max_cached_size: int = 1024 * 1024, threadpool_min_size: int = 64 * 1024):
+        """
+        Args:
+            app: Следующее ASGI-приложение
+            minimum_size: Тела меньше этого размера (байт) отдаются без сжатия
+            levels: Уровни сжатия по кодировкам (по умолчанию DEFAULT_LEVELS)
+            variant_cache: Кэш сжатых вариантов; None - без кэша
+            max_cached_size: Тела больше этого размера сжимаются, но не кэшируются
+            threadpool_min_size: Тела от этого размера сжимаются в пуле потоков, не блокируя цикл событий
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        self.variant_cache = variant_cache
+        self.max_cached_size = max_cached_size
+        self.threadpool_min_size = threadpool_min_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressionResponder(self, encoding, send, scope).send)
+
+    async def compressed_body(self, body: bytes, encoding: str, representation: Optional[str] = None) -> bytes:
+        """
+        Сжатое тело: из кэша вариантов или сжатое сейчас (крупное - в пуле потоков)
+
+        Args:
+            body: Несжатое тело ответа
+            encoding: Выбранная кодировка
+            representation: Идентификатор тела (URL и сильный ETag), если есть; иначе ключ - хэш тела
+        """
+        cacheable = self.variant_cache is not None and len(body) <= self.max_cached_size
+        if cacheable:
+            key = f"{encoding}:{representation or hashlib.sha256(body).hexdigest()}"
+            compressed = self.variant_cache.get(key)
+            if compressed is not None:
+                return compressed
+        level = self.levels[encoding]
+        if len(body) >= self.threadpool_min_size:
+            compressed = await anyio.to_thread.run_sync(compress, body, encoding, level)
+        else:
+            compressed = compress(body, encoding, level)
+        if cacheable:
+            self.variant_cache.set(key, compressed)
+        return compressed
+
+
+class _CompressionResponder:
+    """
+    Перехватывает отправку одного ответа
+
+    Ответ с Content-Length (JSON) собирается целиком и сжимается одним куском - так его можно взять
+    из кэша вариантов; BaseHTTPMiddleware перед нами все равно делит тело на несколько сообщений.
+    Ответ без длины (StreamingResponse) и ответ крупнее max_cached_size сжимаются по кускам.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send, scope):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.scope = scope
+        self.representation: Optional[str] = None
+        self.start_message = None
+        self.passthrough = True
+        self.body_parts: List[bytes] = []
+        self.stream: Optional[_StreamCompressor] = None
+
+    def _is_eligible(self, headers: Headers, status_code: int) -> bool:
+        if status_code in (204, 206, 304) or "content-encoding" in headers or "content-range" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= self.middleware.minimum_size
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            self.passthrough = not self._is_eligible(headers, message["status"])
+            if self.passthrough:
+                await self._send(message)
+                return
+            self.start_message = {**message, "headers": list(message.get("headers", []))}
+            response_headers = MutableHeaders(raw=self.start_message["headers"])
+            response_headers.add_vary_header("Accept-Encoding")
+            response_headers["Content-Encoding"] = self.encoding
+            # Сжатое тело - другое представление: сильный ETag получает суффикс кодировки (If-Range с ним
+            # не совпадет с несжатым), а диапазоны байт сжатого тела не поддерживаются
+            if "etag" in headers:
+                response_headers["ETag"] = conditional.encoded_etag(headers["etag"], self.encoding)
+            if "accept-ranges" in headers:
+                del response_headers["Accept-Ranges"]
+            if "content-length" not in headers or int(headers["content-length"]) > self.middleware.max_cached_size:
+                # Крупное тело все равно не кэшируется - сжимается по мере отправки, а не собирается в памяти
+                del response_headers["Content-Length"]
+                self.stream = _StreamCompressor(self.encoding, self.middleware.levels[self.encoding])
+            elif message["status"] == 200 and headers.get("etag", "").startswith('"'):
+                # Сильный ETag (ревизия контента) однозначно задает тело по этому URL - хэшировать тело не нужно
+                query = self.scope.get("query_string", b"").decode("latin-1")
+                self.representation = f"{self.scope['path']}?{query}:{headers['etag']}"
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.stream is not None:
+            # Потоковый ответ: каждый кусок сжимается и отправляется сразу
+            if self.start_message is not None:
+                await self._send(self.start_message)
+                self.start_message = None
+            data = self.stream.chunk(body) if body else b""
+            if not more_body:
+                data += self.stream.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        self.body_parts.append(body)
+        if more_body:
+            return
+        compressed = await self.middleware.compressed_body(b"".join(self.body_parts), self.encoding, self.representation)
+        MutableHeaders(raw=self.start_message["headers"])["Content-Length"] = str(len(compressed))
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed})
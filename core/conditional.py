@@ -0,0 +1,151 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+class RangeNotSatisfiable(Exception):
+    """Диапазон Range целиком за пределами тела - ответ 416"""
+
+
+# Ответы зависят от пользователя (прогресс), поэтому кэшируются только браузером и всегда перепроверяются
+CACHE_CONTROL = "private, no-cache"
+
+# Сжатый вариант (core/compression.py) отдается с ETag "<etag>-<кодировка>": для If-Range это другое
+# представление (байты не совпадают), для If-None-Match - то же содержимое
+CONTENT_CODINGS = ("gzip", "br", "zstd")
+
+
+def strong_etag(parts: Iterable) -> str:
+    """
+    Сильный ETag из значений, определяющих представление
+
+    Args:
+        parts: Ревизии и идентификаторы, от которых зависит тело ответа
+
+    Returns:
+        Значение заголовка ETag в кавычках
+    """
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag сжатого варианта: к сильному ETag добавляется кодировка, слабый остается как есть"""
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+def _identity_etag(etag: str) -> str:
+    for encoding in CONTENT_CODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает время без зоны (CURRENT_TIMESTAMP - всегда UTC)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def latest(*values: Optional[datetime]) -> Optional[datetime]:
+    """Наибольшее из заданных времен (в UTC) или None"""
+    present = [_as_utc(value) for value in values if value is not None]
+    return max(present) if present else None
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """Заголовки, которые отдаются и с 200, и с 304"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(microsecond=0), usegmt=True)
+    return headers
+
+def _etag_listed(if_none_match: str, etag: str) -> bool:
+    # Для If-None-Match сравнение слабое: W/"x" и ETag сжатого варианта "x-gzip" совпадают с "x"
+    if if_none_match.strip() == "*":
+        return True
+    return any(_identity_etag(candidate.strip().removeprefix("W/")) == etag for candidate in if_none_match.split(","))
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Можно ли ответить 304 на условный GET (RFC 9110, 13.2.2)
+
+    Args:
+        request_headers: Заголовки запроса
+        etag: Текущий ETag представления
+        last_modified: Время последнего изменения представления
+
+    Returns:
+        True, если у клиента актуальная копия. If-Modified-Since учитывается только без If-None-Match
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_listed(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+def if_range_matches(request_headers: Mapping[str, str], validators: Mapping[str, str]) -> bool:
+    """
+    Можно ли применить Range (RFC 9110, 13.1.5): без If-Range - всегда, с ним - если копия клиента актуальна
+
+    Args:
+        request_headers: Заголовки запроса
+        validators: Заголовки ответа с ETag и Last-Modified (см. validator_headers)
+
+    Returns:
+        True, если диапазон отдается. Сравнение сильное: слабый ETag не совпадает ни с чем, дата - только равная
+    """
+    if_range = request_headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == validators.get("etag")
+    last_modified = validators.get("last-modified")
+    if if_range.startswith("W/") or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+def byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Диапазон байт из заголовка Range (RFC 9110, 14.2)
+
+    Args:
+        range_header: Значение заголовка Range или None
+        size: Длина тела в байтах
+
+    Returns:
+        Полуоткрытый интервал [start, end) или None - отдать тело целиком (нет Range, заголовок
+        не разобран или диапазонов несколько: multipart/byteranges не поддерживается)
+
+    Raises:
+        RangeNotSatisfiable: Диапазон начинается за концом тела
+    """
+    if range_header is None:
+        return None
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, dash, last = ranges.strip().partition("-")
+    if not dash or not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Суффикс: последние last байт
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - int(last), 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, end
@@ -0,0 +1,164 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+import logging
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+@dataclass
+class IdempotentEntry:
+    """Запись хранилища: отпечаток запроса и сохраненный ответ (None, пока запрос выполняется)"""
+    fingerprint: str
+    expires_at: float
+    status_code: Optional[int] = None
+    body: Optional[bytes] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def pending(self) -> bool:
+        return self.status_code is None
+
+
+class IdempotencyStore:
+    """Ограниченное по размеру хранилище ключей идемпотентности с TTL"""
+
+    def __init__(self, ttl: int = 3600, max_size: int = 10000):
+        """
+        Инициализация хранилища
+
+        Args:
+            ttl: Время жизни ключа в секундах (по умолчанию 1 час)
+            max_size: Максимальное количество ключей (по умолчанию 10000)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, ...], IdempotentEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        # Записи упорядочены по времени создания, поэтому просроченные всегда в начале
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) < self.max_size:
+                break
+            del self._entries[key]
+
+    def reserve(self, key: Tuple[str, ...], fingerprint: str) -> Optional[IdempotentEntry]:
+        """
+        Резервирует ключ под новый запрос
+
+        Args:
+            key: Ключ (пользователь, метод, путь, значение заголовка)
+            fingerprint: Отпечаток тела запроса
+
+        Returns:
+            None, если ключ зарезервирован для этого запроса, иначе существующая запись
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self._evict(now)
+            self._entries[key] = IdempotentEntry(fingerprint=fingerprint, expires_at=now + self.ttl)
+            return None
+
+    def complete(self, key: Tuple[str, ...], status_code: int, body: bytes, headers: Dict[str, str]) -> None:
+        """Сохраняет ответ для зарезервированного ключа"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.status_code = status_code
+                entry.body = body
+                entry.headers = headers
+
+    def release(self, key: Tuple[str, ...]) -> None:
+        """Снимает резерв (запрос завершился ошибкой и может быть повторен)"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Повторы запросов с тем же заголовком Idempotency-Key получают сохраненный ответ
+    без выполнения эндпоинта (и без обращения к БД).
+
+    Ключ ограничен пользователем (resolve_identity по заголовку Authorization),
+    методом и путем. Повтор с другим телом запроса - 422, повтор во время
+    выполнения исходного запроса - 409. Сохраняются только успешные (2xx) ответы.
+    """
+
+    def __init__(self, app, store: IdempotencyStore, paths: Iterable[str], resolve_identity: Callable[[str], Optional[str]]):
+        """
+        Args:
+            app: ASGI-приложение
+            store: Хранилище ключей
+            paths: Регулярные выражения путей, для которых учитывается заголовок
+            resolve_identity: Функция, возвращающая идентификатор пользователя по токену
+        """
+        super().__init__(app)
+        self.store = store
+        self.paths = [re.compile(p) for p in paths]
+        self.resolve_identity = resolve_identity
+
+    def _identity(self, request: Request) -> Optional[str]:
+        authorization = request.headers.get("Authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return self.resolve_identity(token)
+
+    async def dispatch(self, request: Request, call_next):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key or request.method != "POST" or not any(p.fullmatch(request.url.path) for p in self.paths):
+            return await call_next(request)
+
+        identity = self._identity(request)
+        if identity is None:
+            return await call_next(request)
+
+        key = (identity, request.method, request.url.path, idempotency_key)
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        entry = self.store.reserve(key, fingerprint)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                return JSONResponse(status_code=422, content={"detail": f"{IDEMPOTENCY_HEADER} уже использован с другим запросом."})
+            if entry.pending:
+                return JSONResponse(status_code=409, content={"detail": "Запрос с этим ключом идемпотентности еще выполняется."})
+            logger.debug(f"Replaying idempotent response for {request.url.path}")
+            return Response(content=entry.body, status_code=entry.status_code, headers={**entry.headers, REPLAYED_HEADER: "true"})
+
+        try:
+            response = await call_next(request)
+        except Exception:
+            self.store.release(key)
+            raise
+
+        if not 200 <= response.status_code < 300:
+            self.store.release(key)
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = {"content-type": response.headers.get("content-type", "application/json")}
+        self.store.complete(key, response.status_code, body, headers)
+        return Response(content=body, status_code=response.status_code, headers=dict(response.headers))
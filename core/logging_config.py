@@ -1,44 +1,154 @@
+import atexit
+import copy
 import logging
-import sys
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import sys
+from contextvars import ContextVar
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Optional
+
+import structlog
+
+# Обработчики с вводом-выводом работают в потоке QueueListener; вызывающий поток только кладет запись в очередь
+_listener: Optional[QueueListener] = None
+
+# ASGI scope текущего запроса: по нему записи получают метод и шаблон маршрута (после маршрутизации)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("log_request_scope", default=None)
+
+
+class lazy:
+    """
+    Аргумент записи, который вычисляется только при форматировании
+
+    Пример: logger.debug("Received: %s", lazy(payload.model_dump_json)) - JSON строится,
+    только если запись прошла уровень и выборку.
+    """
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self.func = func
+        self.args = args
+
+    def __str__(self) -> str:
+        return str(self.func(*self.args))
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Добавляет к записи метод и шаблон маршрута текущего запроса и прореживает DEBUG-записи
+
+    Работает в вызывающем потоке (фильтр QueueHandler), пока контекст запроса еще доступен.
+    """
+
+    def __init__(self, debug_sample_rate: float = 1.0, route_sample_rates: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            debug_sample_rate: Доля сохраняемых DEBUG-записей (1.0 - все)
+            route_sample_rates: Доля для отдельных шаблонов маршрутов, например {"/lessons/{l_id}": 0.01}
+        """
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+        self.route_sample_rates = route_sample_rates or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        scope = _request_scope.get()
+        route = None
+        if scope is not None:
+            route = getattr(scope.get("route"), "path", None)
+            record.method = scope.get("method")
+            record.route = route or scope.get("path")
+        if record.levelno <= logging.DEBUG:
+            rate = self.route_sample_rates.get(route, self.debug_sample_rate)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке: подставляются только аргументы сообщения"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются здесь: к моменту обработки в другом потоке объекты могут измениться.
+        # Событие structlog (dict) и исключение форматируются уже в потоке обработчиков
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class LogContextMiddleware:
+    """ASGI-middleware: делает scope запроса доступным фильтру логирования"""
+
+    def __init__(self, app):
+        self.app = app
 
-def setup_logging(env: str = "development"):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def _renderer(log_format: str):
+    if log_format == "json":
+        return structlog.processors.JSONRenderer(ensure_ascii=False)
+    return structlog.dev.ConsoleRenderer(colors=False)
+
+def setup_logging(env: str = "production", log_dir: str = "logs", debug_sample_rate: Optional[float] = None,
+                  route_sample_rates: Optional[Dict[str, float]] = None):
     """
     Настройка логирования для приложения
-    
+
     Args:
-        env: Окружение ('development' или 'production')
+        env: Окружение ('development', 'test' или 'production')
+        log_dir: Директория для файлов логов
+        debug_sample_rate: Доля сохраняемых DEBUG-записей (по умолчанию LOG_DEBUG_SAMPLE_RATE или 1.0)
+        route_sample_rates: Доля DEBUG-записей для отдельных шаблонов маршрутов
+
+    Уровень, формат (json/console) и доля DEBUG-записей переопределяются переменными
+    LOG_LEVEL, LOG_FORMAT и LOG_DEBUG_SAMPLE_RATE. По умолчанию в production - INFO и JSON,
+    в остальных окружениях - DEBUG и читаемый текст.
     """
+    global _listener
+
     # Создаем директорию для логов, если её нет
-    log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
-    # Формат логов
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-    
-    # Уровень логирования в зависимости от окружения
-    log_level = logging.DEBUG if env == "development" else logging.INFO
-    
-    # Создаем форматтер
-    formatter = logging.Formatter(log_format, date_format)
-    
-    # Настраиваем корневой логгер
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
-    
-    # Очищаем существующие обработчики
-    root_logger.handlers = []
-    
-    # Добавляем обработчик для вывода в консоль
+
+    # Уровень и формат логирования в зависимости от окружения
+    default_level = "INFO" if env == "production" else "DEBUG"
+    log_level = logging.getLevelName(os.getenv("LOG_LEVEL", default_level).upper())
+    log_format = os.getenv("LOG_FORMAT", "json" if env == "production" else "console")
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+    # Общие шаги для записей stdlib и structlog; выполняются в потоке обработчиков
+    shared_processors = [
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.ExtraAdder(allow=("method", "route")),
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+    ]
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=shared_processors,
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            _renderer(log_format),
+        ],
+    )
+
+    # Обработчики с вводом-выводом: консоль и файл
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
-    # Добавляем обработчик для записи в файл
     log_file = os.path.join(log_dir, f"app_{datetime.now().strftime('%Y%m%d')}.log")
     file_handler = RotatingFileHandler(
         log_file,
@@ -47,13 +157,51 @@ def setup_logging(env: str = "development"):
         encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
-    
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(debug_sample_rate, route_sample_rates))
+
+    # Настраиваем корневой логгер
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_logger.handlers = [queue_handler]
+
+    # structlog.get_logger() пишет через тот же конвейер
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.StackInfoRenderer(),
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
     # Устанавливаем уровень логирования для некоторых библиотек
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy").setLevel(logging.WARNING)
-    
+    # Отладочный вывод разбора multipart не нужен даже в разработке
+    logging.getLogger("multipart").setLevel(logging.INFO)
+
     return root_logger
 
+def stop_logging() -> None:
+    """Дописывает записи из очереди и останавливает поток обработчиков"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
 # Создаем логгер для этого модуля
-logger = logging.getLogger(__name__) 
\ No newline at end of file
+logger = logging.getLogger(__name__)
@@ -0,0 +1,194 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+import anyio.to_thread
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --- Несколько процессов-воркеров ---
+# Если задан PROMETHEUS_MULTIPROC_DIR (до импорта prometheus_client, одна пустая директория на все воркеры),
+# каждый процесс пишет значения в свои файлы, а /metrics любого воркера отдает сумму по всем процессам.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# --- HTTP ---
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Запросы по шаблону маршрута и коду ответа", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса (до отправки последнего байта)", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Запросы в обработке", multiprocess_mode="livesum"
+)
+
+# --- База данных ---
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Время выполнения одного SQL-запроса",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Количество SQL-запросов за один HTTP-запрос", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Суммарное время SQL-запросов за один HTTP-запрос", ["route"]
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Ожидание соединения из пула (включая открытие нового)",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+# --- Кэш (core.cache) ---
+CACHE_REQUESTS = Counter("cache_requests_total", "Обращения к кэшу", ["cache", "result"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Вытеснения из кэша", ["cache", "reason"])
+
+# --- Хэширование паролей и пул потоков ---
+PASSWORD_HASH_IN_PROGRESS = Gauge(
+    "password_hash_in_progress", "Операции bcrypt, выполняющиеся сейчас", multiprocess_mode="livesum"
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds", "Время одной операции bcrypt", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0)
+)
+THREADPOOL_BUSY = Gauge(
+    "threadpool_busy_threads", "Занятые потоки пула синхронных обработчиков (там же выполняется bcrypt)",
+    multiprocess_mode="livesum"
+)
+THREADPOOL_WAITING = Gauge(
+    "threadpool_waiting_tasks", "Задачи в очереди пула синхронных обработчиков", multiprocess_mode="livesum"
+)
+
+# --- Учет SQL в рамках HTTP-запроса ---
+class _RequestDbUsage:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# Объект общий для всех задач и потоков запроса: контекст копируется, а ссылка на объект остается той же
+_request_db_usage: ContextVar[Optional[_RequestDbUsage]] = ContextVar("request_db_usage", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started_at = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_metrics_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    DB_QUERY_SECONDS.observe(elapsed)
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage.queries += 1
+        usage.seconds += elapsed
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Подключает учет SQL-запросов и ожидания соединений к движку
+
+    Args:
+        engine: Движок SQLAlchemy. Пул оборачивается на месте, поэтому после engine.dispose()
+            (новый пул) функцию нужно вызвать снова
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    pool = engine.pool
+    pool_connect = pool.connect
+
+    def timed_connect():
+        started_at = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started_at)
+
+    pool.connect = timed_connect
+
+@contextmanager
+def track_password_hash(operation: str) -> Iterator[None]:
+    """Учитывает одну операцию bcrypt ('hash' или 'verify')"""
+    PASSWORD_HASH_IN_PROGRESS.inc()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started_at)
+        PASSWORD_HASH_IN_PROGRESS.dec()
+
+def _sample_threadpool() -> None:
+    # Лимитер пула anyio доступен только из цикла событий
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    THREADPOOL_BUSY.set(statistics.borrowed_tokens)
+    THREADPOOL_WAITING.set(statistics.tasks_waiting)
+
+def _route_template(scope) -> str:
+    # Шаблон пути вместо фактического: /lessons/{l_id}, а не /lessons/42 - иначе число рядов не ограничено
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """ASGI-middleware: латентность, коды ответов и SQL-нагрузка по шаблонам маршрутов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        usage = _RequestDbUsage()
+        token = _request_db_usage.set(usage)
+        _sample_threadpool()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            _request_db_usage.reset(token)
+            route = _route_template(scope)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(route).observe(usage.queries)
+            REQUEST_DB_SECONDS.labels(route).observe(usage.seconds)
+
+# --- Выдача ---
+def render_latest() -> Tuple[bytes, str]:
+    """
+    Текущие значения в текстовом формате Prometheus
+
+    Returns:
+        Тело ответа и его Content-Type
+    """
+    _sample_threadpool()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead() -> None:
+    """Убирает живые gauge завершившегося воркера из суммы (только в режиме нескольких процессов)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,141 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+# Больше любого символа: (prefix + _MAX) ограничивает сверху все строки, начинающиеся с prefix
+_MAX = "\U0010ffff"
+
+
+def fold(text: str) -> str:
+    """Приведение для сравнения без учета регистра: casefold (в том числе кириллицы) и ё -> е"""
+    return text.casefold().replace("ё", "е")
+
+
+def tokens(text: str) -> List[str]:
+    return _WORD.findall(fold(text))
+
+
+def _prefix_range(items: List, prefix: str) -> Tuple[int, int]:
+    return bisect_left(items, (prefix,)), bisect_left(items, (prefix + _MAX,))
+
+
+class PrefixIndex:
+    """
+    Инвертированный индекс слов для подсказок по началу слова.
+
+    Словарь - отсортированный список слов: слова с заданным началом образуют
+    непрерывный отрезок, который находится двоичным поиском. У каждого слова
+    список ключей, отсортированный по порядку выдачи (короткие тексты, затем
+    по алфавиту), поэтому первые результаты получаются слиянием этих списков
+    без просмотра всех совпадений. Отдельно по алфавиту лежат тексты целиком -
+    для совпадений с началом текста.
+    Не потокобезопасен - синхронизацию обеспечивает вызывающий код.
+    """
+
+    def __init__(self, items: Iterable[Tuple[Hashable, str]] = ()):
+        self._entries: Dict[Hashable, Tuple[Tuple, Tuple[str, ...]]] = {}
+        self._postings: Dict[str, List[Tuple]] = {}
+        texts = []
+        for key, text in items:
+            order, words = self._register(key, text)
+            texts.append((order[1], key))
+            for word in words:
+                self._postings.setdefault(word, []).append(order)
+        # Начальное заполнение - одна сортировка на список вместо вставки по одному
+        for posting in self._postings.values():
+            posting.sort()
+        self._words: List[Tuple[str]] = sorted((word,) for word in self._postings)
+        self._texts: List[Tuple[str, Hashable]] = sorted(texts)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _register(self, key: Hashable, text: str) -> Tuple[Tuple, Tuple[str, ...]]:
+        text_words = tokens(text)
+        folded = " ".join(text_words)
+        # Порядок выдачи: короче - выше, затем по алфавиту
+        order = (len(folded), folded, key)
+        words = tuple(sorted(set(text_words)))
+        self._entries[key] = (order, words)
+        return order, words
+
+    def set(self, key: Hashable, text: str) -> None:
+        """Добавляет ключ с текстом или заменяет текст существующего ключа"""
+        self.remove(key)
+        order, words = self._register(key, text)
+        insort(self._texts, (order[1], key))
+        for word in words:
+            if word not in self._postings:
+                self._postings[word] = []
+                insort(self._words, (word,))
+            insort(self._postings[word], order)
+
+    def remove(self, key: Hashable) -> None:
+        if key not in self._entries:
+            return
+        order, words = self._entries.pop(key)
+        del self._texts[bisect_left(self._texts, (order[1], key))]
+        for word in words:
+            posting = self._postings[word]
+            del posting[bisect_left(posting, order)]
+            if not posting:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, (word,))]
+
+    def _starting_with(self, prefix: str) -> List[List[Tuple]]:
+        start, stop = _prefix_range(self._words, prefix)
+        return [self._postings[word] for (word,) in self._words[start:stop]]
+
+    def _by_text(self, phrase: str) -> Iterator[Hashable]:
+        start, stop = _prefix_range(self._texts, phrase)
+        for position in range(start, stop):
+            yield self._texts[position][1]
+
+    def _by_words(self, words: List[str]) -> Iterator[Hashable]:
+        # Перебор идет по самому редкому слову запроса, остальные проверяются по словам ключа
+        postings = {word: self._starting_with(word) for word in words}
+        rarest = min(words, key=lambda word: sum(len(posting) for posting in postings[word]))
+        others = [word for word in words if word != rarest]
+        previous = None
+        for order in heapq.merge(*postings[rarest]):
+            key = order[2]
+            # Ключ встречается в стольких списках, сколько у него слов с этим началом - подряд
+            if key == previous:
+                continue
+            previous = key
+            key_words = self._entries[key][1]
+            if all(any(word.startswith(other) for word in key_words) for other in others):
+                yield key
+
+    def search(self, query: str, limit: int, keep: Optional[Callable[[Hashable], bool]] = None) -> List[Hashable]:
+        """
+        Ключи, в тексте которых каждое слово запроса - начало какого-либо слова
+
+        Args:
+            query: Строка, набранная пользователем
+            limit: Максимум ключей в ответе
+            keep: Отбор ключей (например, по виду сущности)
+
+        Returns:
+            Сначала тексты, начинающиеся с запроса целиком (по алфавиту), затем остальные:
+            более короткие, затем по алфавиту
+        """
+        query_words = tokens(query)
+        if not query_words or limit <= 0:
+            return []
+        found: List[Hashable] = []
+        seen = set()
+        candidates = (self._by_text(" ".join(query_words)), self._by_words(sorted(set(query_words))))
+        for key in (key for source in candidates for key in source):
+            if key in seen or (keep is not None and not keep(key)):
+                continue
+            seen.add(key)
+            found.append(key)
+            if len(found) == limit:
+                break
+        return found
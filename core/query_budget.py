@@ -0,0 +1,194 @@
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import logging
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+QUERY_COUNT_HEADER = "X-Query-Count"
+
+# Списки параметров - IN (?, ?, ?), IN (%(id_1_1)s, %(id_1_2)s) - дают одну форму запроса при любом числе значений
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s)\s*,)*\s*(?:\?|%\(\w+\)s)\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Маршрут выполнил больше запросов, чем объявлено (в строгом режиме)"""
+
+
+class QueryLog:
+    """Запросы, выполненные в рамках одного HTTP-запроса или блока count_queries()"""
+
+    def __init__(self):
+        self.statements: List[Tuple[str, str]] = [] # (форма запроса, место вызова)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int, List[str]]]:
+        """
+        Формы запросов, повторенные не менее threshold раз - признак N+1
+
+        Returns:
+            Список (форма, число повторов, места вызова по убыванию частоты)
+        """
+        shapes = Counter(shape for shape, _ in self.statements)
+        result = []
+        for shape, repeats in shapes.most_common():
+            if repeats < threshold:
+                break
+            sites = Counter(site for statement_shape, site in self.statements if statement_shape == shape)
+            result.append((shape, repeats, [site for site, _ in sites.most_common()]))
+        return result
+
+    def report(self, threshold: int, limit: int = 5) -> str:
+        lines = [f"{self.count} SQL statements"]
+        for shape, repeats, sites in self.repeated_shapes(threshold)[:limit]:
+            lines.append(f"  N+1 suspect x{repeats}: {shape[:200]}")
+            lines.extend(f"    at {site}" for site in sites[:3])
+        if len(lines) == 1:
+            top_sites = Counter(site for _, site in self.statements).most_common(limit)
+            lines.extend(f"  {repeats} from {site}" for site, repeats in top_sites)
+        return "\n".join(lines)
+
+_query_log: ContextVar[Optional[QueryLog]] = ContextVar("query_log", default=None)
+
+def statement_shape(statement: str) -> str:
+    return _IN_LIST.sub("(?)", _SPACES.sub(" ", statement).strip())
+
+def _call_site() -> str:
+    # Ближайший к запросу кадр кода проекта (не SQLAlchemy и не этот модуль). Если его нет -
+    # например, ленивая загрузка при сериализации ответа - ближайший кадр вне SQLAlchemy
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and "site-packages" not in filename and filename != __file__:
+            return f"{filename[len(PROJECT_ROOT) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        if fallback is None and f"{os.sep}sqlalchemy{os.sep}" not in filename:
+            fallback = f"{filename.rpartition('site-packages' + os.sep)[2]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "<unknown>"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _query_log.get()
+    if log is not None:
+        log.statements.append((statement_shape(statement), _call_site()))
+
+def instrument_engine(engine: Engine) -> None:
+    """Подключает запись запросов к движку; вне учитываемого запроса обработчик ничего не делает"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """
+    Записывает запросы, выполненные внутри блока (в том числе из пула потоков, запущенного внутри)
+
+    Пример для тестов (для HTTP-запросов через TestClient контекст не передается - там
+    работает QueryBudgetMiddleware в строгом режиме и заголовок X-Query-Count; в тестах - фикстура max_queries):
+        with count_queries() as log:
+            crud_disciplines.get_disciplines(db, limit=10, user_id=user.id)
+        assert log.count <= 10, log.report(threshold=5)
+    """
+    log = QueryLog()
+    token = _query_log.set(log)
+    try:
+        yield log
+    finally:
+        _query_log.reset(token)
+
+@contextmanager
+def assert_max_queries(max_queries: int, n_plus_one_threshold: Optional[int] = None) -> Iterator[QueryLog]:
+    """
+    То же, что count_queries(), но с проверкой после блока
+
+    Args:
+        max_queries: Допустимое число запросов
+        n_plus_one_threshold: Если задан, повтор одной формы запроса столько раз тоже считается ошибкой
+
+    Raises:
+        QueryBudgetExceeded: Бюджет превышен или найден N+1
+    """
+    with count_queries() as log:
+        yield log
+    threshold = n_plus_one_threshold or max_queries + 1
+    if log.count > max_queries or (n_plus_one_threshold and log.repeated_shapes(n_plus_one_threshold)):
+        raise QueryBudgetExceeded(f"Query budget {max_queries} exceeded or N+1 detected: {log.report(threshold)}")
+
+def query_budget(max_queries: int, allow_repeats: bool = False) -> Callable:
+    """
+    Объявляет бюджет запросов для эндпоинта (ставится под декоратором маршрута)
+
+    Args:
+        max_queries: Сколько SQL-запросов допустимо за один вызов
+        allow_repeats: Повторы одной формы запроса ожидаемы (пакетная обработка: запрос на пакет
+            или на запись) и не считаются N+1; бюджет по-прежнему проверяется
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.__query_budget__ = max_queries
+        endpoint.__query_budget_allow_repeats__ = allow_repeats
+        return endpoint
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """
+    ASGI-middleware для разработки и тестов: считает запросы каждого HTTP-запроса,
+    сообщает о превышении бюджета маршрута и о повторяющихся формах запросов (N+1)
+    """
+
+    def __init__(self, app, default_budget: int, n_plus_one_threshold: int, strict: bool = False):
+        """
+        Args:
+            app: Следующее ASGI-приложение
+            default_budget: Бюджет для маршрутов без @query_budget
+            n_plus_one_threshold: Сколько повторов одной формы запроса считать N+1
+            strict: Вместо записи в лог поднимать QueryBudgetExceeded (после отправки ответа) -
+                TestClient пробрасывает исключение в тест
+        """
+        self.app = app
+        self.default_budget = default_budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog()
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                # Запросы, выполненные при отправке тела (потоковые ответы), в заголовок уже не попадут
+                message["headers"] = [*message.get("headers", []), (QUERY_COUNT_HEADER.lower().encode(), str(log.count).encode())]
+            await send(message)
+
+        token = _query_log.set(log)
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _query_log.reset(token)
+        self._check(scope, log)
+
+    def _check(self, scope, log: QueryLog) -> None:
+        route = scope.get("route")
+        endpoint = getattr(route, "endpoint", None)
+        budget = getattr(endpoint, "__query_budget__", self.default_budget)
+        suspects = [] if getattr(endpoint, "__query_budget_allow_repeats__", False) else log.repeated_shapes(self.n_plus_one_threshold)
+        if log.count <= budget and not suspects:
+            return
+        path = getattr(route, "path", scope["path"])
+        message = f"{scope['method']} {path}: budget {budget}, {log.report(self.n_plus_one_threshold)}"
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        logger.warning(f"Query budget check failed for {message}")
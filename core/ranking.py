@@ -0,0 +1,148 @@
+import math
+import random
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Уровней достаточно для 2**32 элементов
+MAX_LEVELS = 32
+
+
+class _Infinity:
+    """Ключ замыкающего узла: больше любого ключа"""
+
+    def __lt__(self, other) -> bool:
+        return False
+
+    def __le__(self, other) -> bool:
+        return False
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _Infinity)
+
+    def __hash__(self) -> int:
+        return 0
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        self.width: List[int] = [1] * levels
+
+
+class RankedScores:
+    """
+    Набор участников с очками, упорядоченный по убыванию очков (при равенстве - по участнику).
+
+    Хранится в индексируемом списке с пропусками: у каждой ссылки есть ширина
+    (сколько элементов она перескакивает), поэтому вставка, удаление, место
+    участника и выборка по месту работают за ожидаемое O(log n).
+    Не потокобезопасен - синхронизацию обеспечивает вызывающий код.
+    """
+
+    def __init__(self):
+        self._tail = _Node(_Infinity(), MAX_LEVELS)
+        self._head = _Node(None, MAX_LEVELS)
+        self._head.next = [self._tail] * MAX_LEVELS
+        self._scores: Dict[Hashable, int] = {}
+
+    @staticmethod
+    def _key(member: Hashable, score: int) -> Tuple[int, Hashable]:
+        return (-score, member)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._scores
+
+    def score(self, member: Hashable) -> Optional[int]:
+        return self._scores.get(member)
+
+    def set(self, member: Hashable, score: int) -> None:
+        """Устанавливает очки участника (добавляя его при необходимости)"""
+        if member in self._scores:
+            if self._scores[member] == score:
+                return
+            self._remove_key(self._key(member, self._scores[member]))
+        self._scores[member] = score
+        self._insert_key(self._key(member, score))
+
+    def increment(self, member: Hashable, delta: int) -> int:
+        """Прибавляет delta к очкам участника и возвращает новое значение"""
+        score = self._scores.get(member, 0) + delta
+        self.set(member, score)
+        return score
+
+    def remove(self, member: Hashable) -> None:
+        if member in self._scores:
+            self._remove_key(self._key(member, self._scores.pop(member)))
+
+    def rank(self, member: Hashable) -> Optional[int]:
+        """Место участника, начиная с 0 (None, если участника нет)"""
+        if member not in self._scores:
+            return None
+        key = self._key(member, self._scores[member])
+        node, position = self._head, 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key <= key:
+                position += node.width[level]
+                node = node.next[level]
+        return position - 1
+
+    def range(self, start: int, stop: int) -> List[Tuple[Hashable, int]]:
+        """Участники с местами [start, stop) в виде (участник, очки)"""
+        start, stop = max(start, 0), min(stop, len(self))
+        if start >= stop:
+            return []
+        node, remaining = self._head, start + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        result = []
+        for _ in range(stop - start):
+            _, member = node.key
+            result.append((member, self._scores[member]))
+            node = node.next[0]
+        return result
+
+    def _insert_key(self, key: Tuple[int, Hashable]) -> None:
+        chain: List[_Node] = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = min(MAX_LEVELS, 1 - int(math.log(1.0 - random.random(), 2.0)))
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+
+    def _remove_key(self, key: Tuple[int, Hashable]) -> None:
+        chain: List[_Node] = [None] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
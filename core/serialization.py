@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Any, FrozenSet, List, Mapping, Optional, Type, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+
+@lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    # Схема валидации и сериализации строится один раз на тип ответа
+    return TypeAdapter(annotation)
+
+def dump_json(annotation: Any, content: Any) -> bytes:
+    """
+    Проверка и сериализация ответа целиком в pydantic-core (Rust)
+
+    Args:
+        annotation: Схема ответа, та же, что в response_model (например, List[schemas.Lesson])
+        content: ORM-объекты или модели Pydantic
+
+    Returns:
+        JSON в UTF-8 - те же байты, что дал бы JSONResponse после сериализации FastAPI
+    """
+    adapter = _adapter(annotation)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+def nested_schema(annotation: Any) -> Optional[Type[BaseModel]]:
+    """Схема элемента, если поле - список вложенных моделей (уровень дерева), иначе None"""
+    if get_origin(annotation) in (list, List):
+        (item,) = get_args(annotation)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return item
+    return None
+
+@lru_cache(maxsize=256)
+def sparse_model(schema: Type[BaseModel], fields: Optional[FrozenSet[str]], depth: int) -> Type[BaseModel]:
+    """
+    Урезанная схема ответа: только нужные поля и уровни вложенности
+
+    Args:
+        schema: Полная схема (например, schemas.Discipline)
+        fields: Поля каждого уровня; None - все. id сохраняется всегда
+        depth: Сколько уровней вложенных списков оставить (0 - без вложенных)
+
+    Returns:
+        Модель с теми же типами и значениями по умолчанию. Проверка from_attributes читает
+        только ее поля, поэтому не догружает отброшенные отношения и столбцы
+    """
+    definitions = {}
+    for name, field in schema.model_fields.items():
+        child = nested_schema(field.annotation)
+        if child is not None:
+            if depth > 0:
+                definitions[name] = (List[sparse_model(child, fields, depth - 1)], [])
+        elif fields is None or name in fields or name == "id":
+            definitions[name] = (field.annotation, field)
+    return create_model(schema.__name__, __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+class PydanticJSONResponse(Response):
+    """
+    JSON-ответ без промежуточных dict/list: валидация и JSON за один проход pydantic-core
+
+    FastAPI возвращает готовый Response как есть, поэтому response_model в декораторе
+    остается только для OpenAPI, а проверку по той же схеме выполняет dump_json.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: Any, annotation: Any, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, background: Optional[BackgroundTask] = None):
+        """
+        Args:
+            content: ORM-объекты или модели Pydantic
+            annotation: Схема ответа
+            status_code: Код ответа
+            headers: Дополнительные заголовки
+            background: Фоновая задача после отправки
+        """
+        self.annotation = annotation
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(self.annotation, content)
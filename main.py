@@ -4,19 +4,32 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import logging
-from core.logging_config import setup_logging, logger
+from core.logging_config import setup_logging, logger, lazy, LogContextMiddleware
+from core.idempotency import IdempotencyMiddleware, IdempotencyStore
+from core import columnar
+from core import metrics
+from core import query_budget
+from core import conditional
+from core import compression
+from core import serialization
+from core.cache import Cache
+from core.query_budget import query_budget as budget
 
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, UploadFile, File
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import jwt
 from pydantic import BaseModel
 from sqlalchemy.sql import select, func
+import io
+import csv
 import json
+import asyncio
+from starlette.concurrency import run_in_threadpool
 
 from database import SessionLocal, engine
 import models
@@ -28,13 +41,30 @@ from app.crud import crud_lessons
 from app.crud import crud_lesson_blocks
 from app.crud import crud_questions
 from app.crud import crud_user_progress
+from app.crud import crud_bulk
+from app.crud import crud_statistics
+from app.crud import crud_analytics
+from app.crud import crud_question_stats
+from app.crud import crud_answer_attempts
+from app.crud import crud_leaderboard
+from app.crud import crud_content_revision
+from app.crud import crud_search
+from app.crud import crud_suggest
+from app.crud import crud_review
+from app.crud import crud_resume
+from app.crud import content_view
+from app.crud import constants
 import security
 from app.exceptions.crud_exceptions import CrudException, NotFoundException, DuplicateEntryException, InvalidInputException, DatabaseOperationException
 
 # models.Base.metadata.create_all(bind=engine) 
 
-# Настройка логирования (можно передать 'production' для продакшена)
-setup_logging(env="development")
+# Окружение: development, test или production. По умолчанию production: DEBUG-логи и подсчет
+# SQL-запросов включаются только явно заданным APP_ENV (локально - через .env, см. .env.example)
+APP_ENV = os.getenv("APP_ENV", "production")
+
+# Настройка логирования по окружению (в production - INFO и JSON)
+setup_logging(env=APP_ENV)
 
 # --- Зависимости ---
 def get_db(): db = SessionLocal(); yield db; db.close()
@@ -66,10 +96,23 @@ app = FastAPI(
         {"name": "Content (Admin) - Lesson Blocks", "description": "Администрирование: Блоки Урока"},
         {"name": "Content (Admin) - Questions", "description": "Администрирование: Вопросы"},
         {"name": "Content (Admin) - Question Options", "description": "Администрирование: Опции Вопросов"},
+        {"name": "Content (Admin) - Import/Export", "description": "Администрирование: Массовый импорт и экспорт контента"},
+        {"name": "Analytics (Admin)", "description": "Администрирование: Аналитика обучения по интервалам"},
         {"name": "User Progress", "description": "Отслеживание прогресса пользователя"},
+        {"name": "Leaderboard", "description": "Рейтинги пользователей по XP"},
         {"name": "Default", "description": "Служебные эндпоинты"}
     ]
 )
+# --- Idempotency-Key для эндпоинтов прогресса (повторы клиентов отвечаются из памяти) ---
+# Добавляется до CORS: последний добавленный middleware - внешний, и заголовки CORS
+# должны попадать и в повторенные ответы, и в собственные ответы 409/422
+idempotency_store = IdempotencyStore(ttl=constants.IDEMPOTENCY_KEY_TTL, max_size=constants.IDEMPOTENCY_MAX_KEYS)
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    paths=[r"/users/me/progress/lessons/\d+/complete", r"/lessons/questions/\d+/submit_answer"],
+    resolve_identity=security.decode_access_token
+)
 # --- CORS Middleware ---
 app.add_middleware(
     CORSMiddleware,
@@ -86,6 +129,66 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"]
 )
+# --- Бюджет SQL-запросов и поиск N+1 (только разработка и тесты; в тестах превышение - ошибка) ---
+if APP_ENV in ("development", "test"):
+    app.add_middleware(
+        query_budget.QueryBudgetMiddleware,
+        default_budget=constants.QUERY_BUDGET_DEFAULT,
+        n_plus_one_threshold=constants.QUERY_BUDGET_N_PLUS_ONE_THRESHOLD,
+        strict=APP_ENV == "test"
+    )
+    query_budget.instrument_engine(engine)
+# --- Сжатие ответов (gzip; br и zstd - если установлены brotli и zstandard), сжатые варианты кэшируются ---
+app.add_middleware(
+    compression.CompressionMiddleware,
+    minimum_size=constants.COMPRESSION_MINIMUM_SIZE,
+    levels={
+        compression.GZIP: constants.COMPRESSION_GZIP_LEVEL,
+        compression.BROTLI: constants.COMPRESSION_BROTLI_QUALITY,
+        compression.ZSTD: constants.COMPRESSION_ZSTD_LEVEL,
+    },
+    variant_cache=Cache(ttl=constants.COMPRESSION_CACHE_TTL, max_size=constants.COMPRESSION_CACHE_MAX_ENTRIES, name="compressed_responses"),
+    max_cached_size=constants.COMPRESSION_CACHE_MAX_BODY,
+    threadpool_min_size=constants.COMPRESSION_THREADPOOL_MIN_SIZE
+)
+# --- Контекст запроса для логов (метод и шаблон маршрута в записях, прореживание DEBUG) ---
+app.add_middleware(LogContextMiddleware)
+# --- Метрики Prometheus (внешний слой: учитывает и ответы остальных middleware) ---
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+# --- Периодические фоновые задачи (сверка статистики, свертка аналитики) ---
+def _run_with_session(job):
+    db = SessionLocal()
+    try:
+        job(db)
+    finally:
+        db.close()
+
+async def _run_periodically(job, interval: int):
+    while True:
+        try:
+            await run_in_threadpool(_run_with_session, job)
+        except Exception as e:
+            logger.error(f"Periodic job {job.__name__} failed: {e}")
+        await asyncio.sleep(interval)
+
+@app.on_event("startup")
+async def start_periodic_jobs():
+    app.state.periodic_tasks = [
+        asyncio.create_task(_run_periodically(crud_statistics.reconcile, constants.STATISTICS_RECONCILE_INTERVAL)),
+        asyncio.create_task(_run_periodically(crud_analytics.run_rollup, constants.ANALYTICS_ROLLUP_INTERVAL)),
+        asyncio.create_task(_run_periodically(crud_question_stats.recompute_question_stats, constants.QUESTION_STATS_INTERVAL)),
+        asyncio.create_task(_run_periodically(crud_answer_attempts.ensure_partitions, constants.ANSWER_ATTEMPTS_MAINTENANCE_INTERVAL)),
+        asyncio.create_task(_run_periodically(crud_leaderboard.load_boards, constants.LEADERBOARD_REFRESH_INTERVAL)),
+        asyncio.create_task(_run_periodically(crud_suggest.load_index, constants.SUGGEST_REFRESH_INTERVAL)),
+    ]
+
+@app.on_event("shutdown")
+async def stop_periodic_jobs():
+    for task in app.state.periodic_tasks:
+        task.cancel()
+    metrics.mark_process_dead()
 
 # --- Обработчик для исключений из CRUD-слоя ---
 @app.exception_handler(CrudException)
@@ -96,11 +199,27 @@ async def crud_exception_handler(request, exc: CrudException):
         content={"detail": exc.message}
     )
 
+# --- Постраничные списки: тело остается списком, курсор следующей страницы - в заголовке ---
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+def _page_items(page, response: Response):
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
+
+# --- Деревья контента сериализуются pydantic-core напрямую (response_model в декораторе - для OpenAPI) ---
+def _json(annotation, content, response: Optional[Response] = None):
+    fast_response = serialization.PydanticJSONResponse(content, annotation)
+    if response is not None:
+        # Готовый Response FastAPI не дополняет заголовками из зависимостей (ETag) и эндпоинта (курсор)
+        fast_response.headers.raw.extend(response.headers.raw)
+    return fast_response
+
 # --- Эндпоинты Аутентификации и Пользователей ---
 @app.post("/token", response_model=schemas.Token, tags=["Authentication"])
 async def login_for_access_token_endpoint(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = crud_users.get_user_by_email(db, email=form_data.username)
-    if not user or not security.verify_password(form_data.password, user.hashed_password): raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    # bcrypt занимает сотни миллисекунд - выполняем в пуле потоков, а не в цикле событий
+    if not user or not await run_in_threadpool(security.verify_password, form_data.password, user.hashed_password): raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
     if not user.is_email_verified: raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Email not verified. Please verify your email first.")
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES); access_token = security.create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
@@ -114,7 +233,9 @@ async def verify_user_email_endpoint(verification_data: schemas.EmailVerificatio
 @app.get("/users/me/", response_model=schemas.User, tags=["Users"], summary="Get current authenticated user")
 async def read_current_user_me_endpoint(current_user: models.User = Depends(get_current_active_user)): return current_user
 @app.get("/users/", response_model=List[schemas.User], tags=["Users"], summary="Read users list (admin only)")
-def read_users_list_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), admin: models.User = Depends(get_current_superuser)): return crud_users.get_users(db, skip, limit)
+@budget(3)
+def read_users_list_endpoint(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db), admin: models.User = Depends(get_current_superuser)):
+    return _page_items(crud_users.get_users(db, skip, limit, cursor), response)
 @app.get("/users/{user_id}", response_model=schemas.User, tags=["Users"], summary="Read a single user by ID (admin or self)")
 def read_single_user_endpoint(user_id: int, db: Session = Depends(get_db), current_user_for_check: models.User = Depends(get_current_active_user)):
     if not current_user_for_check.is_superuser and current_user_for_check.id != user_id: raise HTTPException(status.HTTP_403_FORBIDDEN, "Not enough permissions")
@@ -122,31 +243,95 @@ def read_single_user_endpoint(user_id: int, db: Session = Depends(get_db), curre
 
 # --- Эндпоинты Учебного Контента (Публичное Чтение - GET) ---
 TAG_CONTENT_PUBLIC = "Content (Public)"
-@app.get("/disciplines/", response_model=List[schemas.Discipline], tags=[TAG_CONTENT_PUBLIC])
-def public_read_disciplines(s: int = 0, l: int = 10, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+# Условный GET: валидаторы из ревизии контента и прогресса пользователя (один запрос), 304 - до загрузки дерева
+def content_validators(request: Request, response: Response, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    user_id = current_user.id if current_user else None
+    revision = crud_content_revision.get_revision(db, user_id)
+    etag = conditional.strong_etag((revision.revision, user_id, revision.completed_lessons, revision.last_completed_at))
+    last_modified = conditional.latest(revision.revised_at, revision.last_completed_at)
+    headers = conditional.validator_headers(etag, last_modified)
+    if conditional.is_not_modified(request.headers, etag, last_modified):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+# fields= (поля каждого уровня через запятую) и depth= (уровни вложенности) задают и загрузку, и схему ответа
+@app.get("/disciplines/", response_model=List[schemas.Discipline], tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(12)
+def public_read_disciplines(response: Response, s: int = 0, l: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
     user_id = current_user.id if current_user else None
-    return crud_disciplines.get_disciplines(db, s, l, user_id)
-@app.get("/disciplines/{d_id}", response_model=schemas.Discipline, tags=[TAG_CONTENT_PUBLIC])
-def public_read_discipline(d_id: int, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    view = content_view.parse_view(models.Discipline, fields, depth)
+    return _json(List[content_view.response_schema(schemas.Discipline, view)], _page_items(crud_disciplines.get_disciplines(db, s, l, user_id, cursor, view), response), response)
+@app.get("/disciplines/{d_id}", response_model=schemas.Discipline, tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(12)
+def public_read_discipline(d_id: int, response: Response, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
     user_id = current_user.id if current_user else None
-    return crud_disciplines.get_discipline(db, d_id, user_id)
-@app.get("/disciplines/{d_id}/modules/", response_model=List[schemas.Module], tags=[TAG_CONTENT_PUBLIC])
-def public_read_modules_for_discipline(d_id: int, s: int = 0, l: int = 10, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
-    crud_disciplines.get_discipline(db, d_id)
+    view = content_view.parse_view(models.Discipline, fields, depth)
+    return _json(content_view.response_schema(schemas.Discipline, view), crud_disciplines.get_discipline(db, d_id, user_id, view), response)
+@app.get("/disciplines/{d_id}/modules/", response_model=List[schemas.Module], tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(11)
+def public_read_modules_for_discipline(d_id: int, response: Response, s: int = 0, l: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    view = content_view.parse_view(models.Module, fields, depth)
+    crud_disciplines.get_discipline(db, d_id, view=content_view.IDS_ONLY)
     user_id_for_call = current_user.id if current_user else None
-    return crud_modules.get_modules_by_discipline(db, d_id, s, l, user_id=user_id_for_call)
-@app.get("/modules/{m_id}", response_model=schemas.Module, tags=[TAG_CONTENT_PUBLIC])
-def public_read_module(m_id: int, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    return _json(List[content_view.response_schema(schemas.Module, view)], _page_items(crud_modules.get_modules_by_discipline(db, d_id, s, l, user_id=user_id_for_call, cursor=cursor, view=view), response), response)
+@app.get("/modules/{m_id}", response_model=schemas.Module, tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(10)
+def public_read_module(m_id: int, response: Response, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
     user_id = current_user.id if current_user else None
-    return crud_modules.get_module(db, m_id, user_id)
-@app.get("/modules/{m_id}/lessons/", response_model=List[schemas.Lesson], tags=[TAG_CONTENT_PUBLIC])
-def public_read_lessons_for_module(m_id: int, s: int = 0, l: int = 10, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
-    crud_modules.get_module(db, m_id)
-    return crud_lessons.get_lessons_by_module(db, m_id, user_id=current_user.id if current_user else None, skip=s, limit=l)
-@app.get("/lessons/{l_id}", response_model=schemas.Lesson, tags=[TAG_CONTENT_PUBLIC])
-def public_read_lesson(l_id: int, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    view = content_view.parse_view(models.Module, fields, depth)
+    return _json(content_view.response_schema(schemas.Module, view), crud_modules.get_module(db, m_id, user_id, view), response)
+@app.get("/modules/{m_id}/lessons/", response_model=List[schemas.Lesson], tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(9)
+def public_read_lessons_for_module(m_id: int, response: Response, s: int = 0, l: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    view = content_view.parse_view(models.Lesson, fields, depth)
+    crud_modules.get_module(db, m_id, view=content_view.IDS_ONLY)
+    return _json(List[content_view.response_schema(schemas.Lesson, view)], _page_items(crud_lessons.get_lessons_by_module(db, m_id, user_id=current_user.id if current_user else None, skip=s, limit=l, cursor=cursor, view=view), response), response)
+# Оглавление модуля для списка уроков: без теории, текстов вопросов и вариантов
+@app.get("/modules/{m_id}/outline", response_model=schemas.ModuleOutline, tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(8)
+def public_read_module_outline(m_id: int, response: Response, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    return _json(schemas.ModuleOutline, crud_modules.get_module_outline(db, m_id, current_user.id if current_user else None), response)
+@app.get("/lessons/{l_id}", response_model=schemas.Lesson, tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(8)
+def public_read_lesson(l_id: int, response: Response, fields: Optional[str] = None, depth: Optional[int] = None, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
     user_id = current_user.id if current_user else None
-    return crud_lessons.get_lesson(db, l_id, user_id)
+    view = content_view.parse_view(models.Lesson, fields, depth)
+    return _json(content_view.response_schema(schemas.Lesson, view), crud_lessons.get_lesson(db, l_id, user_id, view), response)
+# Длинная теория блока: text/plain по частям, Range в байтах UTF-8 (длина - theory_size в JSON урока)
+def _stream_theory(b_id: int, start: int, end: int):
+    # Отдельная сессия: зависимость get_db закрывается до начала отправки тела ответа
+    db = SessionLocal()
+    try:
+        yield from crud_lesson_blocks.iter_theory(db, b_id, start, end)
+    finally:
+        db.close()
+@app.get("/lessons/blocks/{b_id}/theory", response_class=StreamingResponse, tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(5)
+def public_read_block_theory(b_id: int, request: Request, response: Response, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    size = crud_lesson_blocks.get_theory_size(db, b_id)
+    headers = {"Accept-Ranges": "bytes"}
+    try:
+        requested = conditional.byte_range(request.headers.get("range"), size) if conditional.if_range_matches(request.headers, response.headers) else None
+    except conditional.RangeNotSatisfiable:
+        error_response = Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={**headers, "Content-Range": f"bytes */{size}"})
+        error_response.headers.raw.extend(response.headers.raw)
+        return error_response
+    start, end = requested or (0, size)
+    headers["Content-Length"] = str(end - start)
+    if requested is not None:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    theory_response = StreamingResponse(_stream_theory(b_id, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT if requested is not None else status.HTTP_200_OK, media_type="text/plain; charset=utf-8", headers=headers)
+    theory_response.headers.raw.extend(response.headers.raw)
+    return theory_response
+# Поиск по названиям уроков, теории и вопросам (индексы FTS5), лучшие совпадения первыми
+@app.get("/search", response_model=List[schemas.SearchHit], tags=[TAG_CONTENT_PUBLIC], dependencies=[Depends(content_validators)])
+@budget(7)
+def public_search(q: str, response: Response, kind: Optional[schemas.SearchKind] = None, s: int = 0, l: int = 20, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    return _json(List[schemas.SearchHit], crud_search.search(db, q, [kind.value] if kind else None, skip=s, limit=l), response)
+# Подсказки при наборе по названиям дисциплин, модулей и уроков - из индекса в памяти, без запросов к контенту.
+# Синхронный обработчик (пул потоков): холодный индекс (старт, invalidate()) перестраивается запросами к БД
+@app.get("/suggest", response_model=List[schemas.SuggestItem], tags=[TAG_CONTENT_PUBLIC])
+def public_suggest(q: str, kind: Optional[schemas.SuggestKind] = None, l: int = 10, db: Session = Depends(get_db), current_user: Optional[models.User] = Depends(get_current_active_user)):
+    return _json(List[schemas.SuggestItem], crud_suggest.suggest(db, q, [kind.value] if kind else None, limit=l))
 
 # === АДМИНИСТРАТИВНЫЕ CRUD ЭНДПОИНТЫ ДЛЯ КОНТЕНТА ===
 # --- Disciplines (Admin) ---
@@ -158,10 +343,12 @@ async def ad_create_d(d:schemas.DisciplineCreate,db:Session=Depends(get_db),su:m
     logger.debug("crud_disciplines.create_discipline returned: %s", created_discipline)
     return created_discipline
 @app.get("/admin/disciplines/",response_model=List[schemas.Discipline],tags=[TAG_DISCIPLINE_ADMIN])
-async def ad_read_ds(s:int=0,l:int=100,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):return crud_disciplines.get_disciplines(db,s,l)
+async def ad_read_ds(response:Response,s:int=0,l:int=100,cursor:Optional[str]=None,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return _json(List[schemas.Discipline],_page_items(crud_disciplines.get_disciplines(db,s,l,cursor=cursor),response),response)
 @app.get("/admin/disciplines/{d_id}",response_model=schemas.Discipline,tags=[TAG_DISCIPLINE_ADMIN])
+@budget(8)
 async def ad_read_d(d_id:int,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
-    return crud_disciplines.get_discipline(db,d_id)
+    return _json(schemas.Discipline,crud_disciplines.get_discipline(db,d_id))
 @app.put("/admin/disciplines/{d_id}",response_model=schemas.Discipline,tags=[TAG_DISCIPLINE_ADMIN])
 async def ad_update_d(d_id:int,d_upd:schemas.DisciplineUpdate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     return crud_disciplines.update_discipline(db,d_id,d_upd)
@@ -174,15 +361,18 @@ async def ad_delete_d(d_id:int,db:Session=Depends(get_db),su:models.User=Depends
 TAG_MODULE_ADMIN = "Content (Admin) - Modules"
 @app.post("/admin/modules/",response_model=schemas.Module,status_code=status.HTTP_201_CREATED,tags=[TAG_MODULE_ADMIN])
 async def ad_create_m(m:schemas.ModuleCreate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
-    logger.debug("main.ad_create_m: Received module data: %s", m.model_dump())
+    logger.debug("main.ad_create_m: Received module data: %s", lazy(m.model_dump))
     created_module = crud_modules.create_module(db,m)
     logger.debug("main.ad_create_m: crud_modules.create_module returned: %s", created_module)
     return created_module
 @app.get("/admin/modules/",response_model=List[schemas.Module],tags=[TAG_MODULE_ADMIN])
-async def ad_read_ms(s:int=0,l:int=100,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):return crud_modules.get_all_modules(db,s,l)
+@budget(8)
+async def ad_read_ms(response:Response,s:int=0,l:int=100,cursor:Optional[str]=None,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return _json(List[schemas.Module],_page_items(crud_modules.get_all_modules(db,s,l,cursor),response),response)
 @app.get("/admin/modules/{m_id}",response_model=schemas.Module,tags=[TAG_MODULE_ADMIN])
+@budget(8)
 async def ad_read_m(m_id:int,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
-    return crud_modules.get_module(db,m_id)
+    return _json(schemas.Module,crud_modules.get_module(db,m_id))
 @app.put("/admin/modules/{m_id}",response_model=schemas.Module,tags=[TAG_MODULE_ADMIN])
 async def ad_update_m(m_id:int,m_upd:schemas.ModuleUpdate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     if m_upd.discipline_id:
@@ -197,19 +387,21 @@ async def ad_delete_m(m_id:int,db:Session=Depends(get_db),su:models.User=Depends
 TAG_LESSON_ADMIN = "Content (Admin) - Lessons"
 @app.post("/admin/lessons/", response_model=schemas.Lesson, status_code=status.HTTP_201_CREATED, tags=[TAG_LESSON_ADMIN])
 async def ad_create_l(l_data: schemas.LessonCreate, db: Session = Depends(get_db), su: models.User = Depends(get_current_superuser)):
-    logger.debug("main.ad_create_l: Received lesson data: %s", l_data.model_dump_json(indent=2))
+    # Модель форматируется только если запись действительно пишется (уровень DEBUG и не отброшена выборкой)
+    logger.debug("main.ad_create_l: Received lesson data: %s", lazy(l_data.model_dump_json))
     created_lesson = crud_lessons.create_lesson(db, l_data)
     logger.debug("main.ad_create_l: crud_lessons.create_lesson returned: %s", type(created_lesson))
     return created_lesson
 @app.get("/admin/lessons/",response_model=List[schemas.Lesson],tags=[TAG_LESSON_ADMIN])
-async def ad_read_ls(m_id:Optional[int]=None,s:int=0,l:int=100,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+@budget(8)
+async def ad_read_ls(response:Response,m_id:Optional[int]=None,s:int=0,l:int=100,cursor:Optional[str]=None,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     if m_id:
         crud_modules.get_module(db, m_id)
-        return crud_lessons.get_lessons_by_module(db, m_id,user_id=None, skip=s, limit=l)
-    return crud_lessons.get_all_lessons(db, s, l)
+        return _json(List[schemas.Lesson], _page_items(crud_lessons.get_lessons_by_module(db, m_id,user_id=None, skip=s, limit=l, cursor=cursor), response), response)
+    return _json(List[schemas.Lesson], _page_items(crud_lessons.get_all_lessons(db, s, l, cursor), response), response)
 @app.get("/admin/lessons/{l_id}",response_model=schemas.Lesson,tags=[TAG_LESSON_ADMIN])
 async def ad_read_l(l_id:int,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
-    return crud_lessons.get_lesson(db,l_id)
+    return _json(schemas.Lesson,crud_lessons.get_lesson(db,l_id))
 @app.put("/admin/lessons/{l_id}",response_model=schemas.Lesson,tags=[TAG_LESSON_ADMIN])
 async def ad_update_l(l_id:int,l_upd:schemas.LessonUpdate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     if l_upd.module_id:
@@ -222,13 +414,13 @@ async def ad_delete_l(l_id:int,db:Session=Depends(get_db),su:models.User=Depends
 
 # --- LessonBlocks (Admin) ---
 TAG_BLOCK_ADMIN = "Content (Admin) - Lesson Blocks"
-@app.post("/admin/lessons/{l_id}/blocks/",response_model=schemas.LessonBlock,status_code=status.HTTP_201_CREATED,tags=[TAG_BLOCK_ADMIN])
+@app.post("/admin/lessons/{l_id}/blocks/",response_model=schemas.LessonBlockAdmin,status_code=status.HTTP_201_CREATED,tags=[TAG_BLOCK_ADMIN])
 async def ad_create_lb(l_id:int,b_data:schemas.LessonBlockCreate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     return crud_lesson_blocks.create_lesson_block(db,l_id,b_data)
-@app.get("/admin/blocks/{b_id}",response_model=schemas.LessonBlock,tags=[TAG_BLOCK_ADMIN])
+@app.get("/admin/blocks/{b_id}",response_model=schemas.LessonBlockAdmin,tags=[TAG_BLOCK_ADMIN])
 async def ad_read_lb(b_id:int,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     return crud_lesson_blocks.get_lesson_block(db,b_id)
-@app.put("/admin/blocks/{b_id}",response_model=schemas.LessonBlock,tags=[TAG_BLOCK_ADMIN])
+@app.put("/admin/blocks/{b_id}",response_model=schemas.LessonBlockAdmin,tags=[TAG_BLOCK_ADMIN])
 async def ad_update_lb(b_id:int,b_upd:schemas.LessonBlockUpdate,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
     return crud_lesson_blocks.update_lesson_block(db,b_id,b_upd)
 @app.delete("/admin/blocks/{b_id}",status_code=status.HTTP_204_NO_CONTENT,tags=[TAG_BLOCK_ADMIN])
@@ -254,12 +446,145 @@ async def ad_delete_qo(opt_id:int,db:Session=Depends(get_db),su:models.User=Depe
 
 # (Эндпоинты для Questions можно добавить по аналогии, если нужно управлять ими отдельно от блоков)
 
+# --- Import/Export (Admin) ---
+TAG_IMPORT_EXPORT_ADMIN = "Content (Admin) - Import/Export"
+def _chunked(lines):
+    # Строки склеиваются во фрагменты: каждый фрагмент - отдельный шаг в пуле потоков и отдельная запись в сокет.
+    # Следующий фрагмент не читается из БД, пока предыдущий не принят транспортом (await send)
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= constants.EXPORT_CHUNK_ROWS:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+def _stream_ndjson(records_factory):
+    # Отдельная сессия: зависимость get_db закрывается до начала отправки тела ответа
+    db = SessionLocal()
+    try:
+        yield from _chunked(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records_factory(db))
+    finally:
+        db.close()
+def _csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return buffer.getvalue()
+def _stream_csv(records_factory, columns):
+    db = SessionLocal()
+    try:
+        yield _csv_line(columns)
+        yield from _chunked(_csv_line([record[column] for column in columns]) for record in records_factory(db))
+    finally:
+        db.close()
+def _stream_rows(records_factory, columns, file_format: schemas.RowExportFormat, filename: str):
+    if file_format == schemas.RowExportFormat.CSV:
+        body, media_type = _stream_csv(records_factory, columns), "text/csv; charset=utf-8"
+    else:
+        body, media_type = _stream_ndjson(records_factory), "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{file_format.value}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+@app.post("/admin/import/content",response_model=schemas.ContentImportReport,tags=[TAG_IMPORT_EXPORT_ADMIN])
+@budget(100, allow_repeats=True)
+def ad_import_content(file:UploadFile=File(...),file_format:schemas.ContentFileFormat=schemas.ContentFileFormat.NDJSON,atomic:bool=True,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    text_stream = io.TextIOWrapper(file.file, encoding="utf-8")
+    if file_format == schemas.ContentFileFormat.JSON:
+        try:
+            records = crud_bulk.iter_tree_records(json.load(text_stream))
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Некорректный JSON: {e.msg}")
+    else:
+        records = crud_bulk.iter_ndjson_records(text_stream)
+    progress = lambda report: logger.info("Content import progress: %s lessons, %s blocks, %s questions", report.lessons, report.blocks, report.questions)
+    return crud_bulk.import_content(db, records, atomic=atomic, progress=progress)
+@app.get("/admin/export/content",tags=[TAG_IMPORT_EXPORT_ADMIN])
+@budget(15)
+def ad_export_content(su:models.User=Depends(get_current_superuser)):
+    return StreamingResponse(_stream_ndjson(crud_bulk.iter_content_records), media_type="application/x-ndjson")
+@app.get("/admin/export/users",tags=[TAG_IMPORT_EXPORT_ADMIN])
+@budget(5)
+def ad_export_users(file_format:schemas.RowExportFormat=schemas.RowExportFormat.NDJSON,su:models.User=Depends(get_current_superuser)):
+    return _stream_rows(crud_users.iter_user_records, crud_users.USER_EXPORT_COLUMNS, file_format, "users")
+@app.get("/admin/export/progress",tags=[TAG_IMPORT_EXPORT_ADMIN])
+@budget(5)
+def ad_export_progress(kind:schemas.ProgressExportKind=schemas.ProgressExportKind.LESSONS,user_id:Optional[int]=None,file_format:schemas.RowExportFormat=schemas.RowExportFormat.NDJSON,su:models.User=Depends(get_current_superuser)):
+    records_factory = lambda db: crud_user_progress.iter_progress_records(db, kind=kind.value, user_id=user_id)
+    return _stream_rows(records_factory, crud_user_progress.PROGRESS_EXPORT_COLUMNS[kind.value], file_format, f"{kind.value}_progress")
+
+# --- Analytics (Admin) ---
+TAG_ANALYTICS_ADMIN = "Analytics (Admin)"
+def _stream_columnar(batches_factory, file_format):
+    db = SessionLocal()
+    try:
+        yield from columnar.iter_columnar(batches_factory(db), crud_analytics.EXPORT_COLUMNS, file_format)
+    finally:
+        db.close()
+@app.post("/admin/analytics/rollup",response_model=schemas.AnalyticsRollupReport,tags=[TAG_ANALYTICS_ADMIN])
+@budget(10)
+def ad_run_analytics_rollup(db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return crud_analytics.run_rollup(db)
+@app.get("/admin/analytics/export",tags=[TAG_ANALYTICS_ADMIN])
+@budget(5)
+def ad_export_analytics(file_format:schemas.AnalyticsExportFormat=schemas.AnalyticsExportFormat.PARQUET,bucket:Optional[schemas.AnalyticsBucket]=None,scope:Optional[schemas.AnalyticsScope]=None,start:Optional[datetime]=None,end:Optional[datetime]=None,su:models.User=Depends(get_current_superuser)):
+    if not columnar.is_available(): raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Колоночный экспорт недоступен: не установлен pyarrow.")
+    batches_factory = lambda db: crud_analytics.iter_rollup_columns(db, bucket=bucket and bucket.value, scope=scope and scope.value, start=start, end=end)
+    headers = {"Content-Disposition": f'attachment; filename="analytics_rollups.{columnar.FILE_EXTENSIONS[file_format.value]}"'}
+    return StreamingResponse(_stream_columnar(batches_factory, file_format.value), media_type=columnar.MEDIA_TYPES[file_format.value], headers=headers)
+@app.post("/admin/question-stats/recompute",response_model=schemas.QuestionStatsRecomputeReport,tags=[TAG_ANALYTICS_ADMIN])
+@budget(8)
+def ad_recompute_question_stats(db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return {"questions": crud_question_stats.recompute_question_stats(db)}
+@app.get("/admin/question-stats",response_model=List[schemas.QuestionStatsRead],tags=[TAG_ANALYTICS_ADMIN])
+def ad_get_question_stats(lesson_id:Optional[int]=None,order_by:schemas.QuestionStatsOrder=schemas.QuestionStatsOrder.P_VALUE,descending:bool=False,skip:int=0,limit:int=100,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return crud_question_stats.get_question_stats(db, lesson_id=lesson_id, order_by=order_by.value, descending=descending, skip=skip, limit=limit)
+@app.get("/admin/lessons/{l_id}/funnel",response_model=List[schemas.QuestionStatsRead],tags=[TAG_ANALYTICS_ADMIN])
+def ad_get_lesson_funnel(l_id:int,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return crud_question_stats.get_lesson_funnel(db, l_id)
+@app.get("/admin/answer-attempts/export",tags=[TAG_ANALYTICS_ADMIN])
+@budget(5)
+def ad_export_answer_attempts(start:Optional[datetime]=None,end:Optional[datetime]=None,su:models.User=Depends(get_current_superuser)):
+    return StreamingResponse(_stream_ndjson(lambda db: crud_answer_attempts.iter_attempt_records(db, start=start, end=end)), media_type="application/x-ndjson")
+@app.delete("/admin/answer-attempts",response_model=schemas.AnswerAttemptsPurgeReport,tags=[TAG_ANALYTICS_ADMIN])
+@budget(10, allow_repeats=True)
+def ad_purge_answer_attempts(before:datetime,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return {"deleted": crud_answer_attempts.purge_attempts_before(db, before)}
+@app.post("/admin/answer-attempts/rebuild-progress",response_model=schemas.QuestionProgressRebuildReport,tags=[TAG_ANALYTICS_ADMIN])
+@budget(10)
+def ad_rebuild_question_progress(db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return {"rows": crud_answer_attempts.rebuild_question_progress(db)}
+@app.post("/admin/resume-pointers/rebuild",response_model=schemas.ResumePointersRebuildReport,tags=[TAG_ANALYTICS_ADMIN])
+@budget(50, allow_repeats=True)
+def ad_rebuild_resume_pointers(db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return {"rows": crud_resume.rebuild_pointers(db)}
+@app.get("/admin/analytics/{scope}",response_model=List[schemas.AnalyticsScopeTotal],tags=[TAG_ANALYTICS_ADMIN])
+def ad_get_analytics_totals(scope:schemas.AnalyticsScope,bucket:schemas.AnalyticsBucket=schemas.AnalyticsBucket.DAY,start:Optional[datetime]=None,end:Optional[datetime]=None,skip:int=0,limit:int=100,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return crud_analytics.get_scope_totals(db, scope.value, bucket.value, start, end, skip=skip, limit=limit)
+@app.get("/admin/analytics/{scope}/{scope_id}",response_model=List[schemas.AnalyticsPoint],tags=[TAG_ANALYTICS_ADMIN])
+def ad_get_analytics_series(scope:schemas.AnalyticsScope,scope_id:int,bucket:schemas.AnalyticsBucket=schemas.AnalyticsBucket.DAY,start:Optional[datetime]=None,end:Optional[datetime]=None,db:Session=Depends(get_db),su:models.User=Depends(get_current_superuser)):
+    return crud_analytics.get_series(db, scope.value, scope_id, bucket.value, start, end)
+
 # --- Эндпоинты для Прогресса Пользователя ---
 @app.post("/users/me/progress/lessons/{l_id}/complete", response_model=schemas.UserLessonProgressResponse, tags=["User Progress"])
+@budget(20)
 async def mark_lesson_completed_for_current_user(l_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
     return crud_user_progress.mark_lesson_as_completed(db=db, user_id=current_user.id, lesson_id=l_id)
 
+@app.get("/users/me/progress/attempts", response_model=List[schemas.AnswerAttempt], tags=["User Progress"])
+async def get_my_answer_attempts(question_id: Optional[int] = None, limit: int = constants.ANSWER_ATTEMPTS_HISTORY_LIMIT, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    return crud_answer_attempts.get_user_attempts(db, current_user.id, question_id=question_id, limit=min(limit, constants.ANSWER_ATTEMPTS_HISTORY_LIMIT))
+
+@app.get("/users/me/resume", response_model=List[schemas.ResumePointer], tags=["User Progress"])
+@budget(4)
+async def get_my_resume_pointers(discipline_id: Optional[int] = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    return crud_resume.get_resume(db, current_user.id, discipline_id=discipline_id)
+
+@app.get("/users/me/review-queue", response_model=List[schemas.ReviewItem], tags=["User Progress"])
+@budget(3)
+async def get_my_review_queue(l: int = 20, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    return crud_review.get_review_queue(db, current_user.id, limit=l)
+
 @app.post("/lessons/questions/{question_id}/submit_answer", response_model=schemas.QuestionAnswerResponse, tags=["User Progress"])
+@budget(18)
 async def submit_question_answer_endpoint(
     question_id: int,
     answer: schemas.QuestionAnswerSubmit,
@@ -268,41 +593,46 @@ async def submit_question_answer_endpoint(
 ):
     return crud_user_progress.submit_question_answer(db, current_user.id, question_id, answer.user_answer)
     
+# --- Эндпоинты рейтингов ---
+@app.get("/leaderboard", response_model=List[schemas.LeaderboardEntry], tags=["Leaderboard"])
+async def get_leaderboard(board: schemas.LeaderboardType = schemas.LeaderboardType.GLOBAL, discipline_id: Optional[int] = None, skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    return crud_leaderboard.get_top(db, board.value, discipline_id, skip=max(skip, 0), limit=min(max(limit, 0), constants.LEADERBOARD_MAX_LIMIT))
+@app.get("/leaderboard/me", response_model=schemas.LeaderboardPosition, tags=["Leaderboard"])
+async def get_my_leaderboard_position(board: schemas.LeaderboardType = schemas.LeaderboardType.GLOBAL, discipline_id: Optional[int] = None, neighbours: int = 5, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
+    return crud_leaderboard.get_around(db, current_user.id, board.value, discipline_id, neighbours=min(max(neighbours, 0), constants.LEADERBOARD_MAX_NEIGHBOURS))
+
 # --- Стандартные эндпоинты ---
 @app.get("/", tags=["Default"])
 async def read_root_endpoint(): return {"message": "Добро пожаловать в Lexico API!"}
 @app.get("/healthcheck", tags=["Default"])
 async def health_check_endpoint(): return {"status": "OK", "message": "API работает!"}
+@app.get("/metrics", tags=["Default"], include_in_schema=False)
+async def metrics_endpoint():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
 
-@app.get("/admin/statistics", response_model=dict)
+@app.get("/admin/statistics", response_model=schemas.AdminStatistics)
+@budget(25)
 async def get_admin_statistics(
+    days: int = constants.STATISTICS_DAILY_WINDOW_DAYS,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_superuser)
 ):
     """
-    Получение статистики для панели администратора
+    Получение статистики для панели администратора (из поддерживаемых счетчиков, без COUNT по таблицам)
     """
-    try:
-        # Получаем количество активных пользователей
-        active_users_count = db.query(func.count(models.User.id)).filter(models.User.is_active == True).scalar() or 0
-
-        # Получаем общее количество уроков
-        total_lessons_count = db.query(func.count(models.Lesson.id)).scalar() or 0
-
-        # Получаем количество завершенных уроков
-        completed_lessons_count = db.query(func.count(models.UserLessonProgress.id)).scalar() or 0
-
-        # Вычисляем процент завершенных уроков
-        completion_percentage = round((completed_lessons_count / total_lessons_count * 100) if total_lessons_count > 0 else 0)
-
-        return {
-            "active_users": active_users_count,
-            "total_lessons": total_lessons_count,
-            "completed_lessons_percentage": completion_percentage
-        }
-    except Exception as e:
-        print(f"Error in get_admin_statistics: {str(e)}")  # Для отладки
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error getting statistics: {str(e)}"
-        )
\ No newline at end of file
+    if not 1 <= days <= constants.STATISTICS_LEARNER_RETENTION_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"days must be between 1 and {constants.STATISTICS_LEARNER_RETENTION_DAYS}")
+    return crud_statistics.get_statistics(db, days=days)
+
+@app.post("/admin/statistics/reconcile", response_model=schemas.AdminStatistics)
+@budget(12)
+async def reconcile_admin_statistics(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_superuser)
+):
+    """
+    Пересчет счетчиков статистики по исходным таблицам
+    """
+    crud_statistics.reconcile(db)
+    return crud_statistics.get_statistics(db)
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+project_root = Path(__file__).resolve().parent
+sys.path.append(str(project_root))
+
+import argparse
+import json
+import time
+
+from database import SessionLocal
+from app.crud import crud_bulk
+from app.crud import constants
+from app.exceptions.crud_exceptions import CrudException
+
+def run_import(path: str, file_format: str, atomic: bool, batch_size: int) -> int:
+    started = time.monotonic()
+
+    def report_progress(report) -> None:
+        elapsed = time.monotonic() - started
+        print(f"  уроков: {report.lessons}, блоков: {report.blocks}, вопросов: {report.questions} "
+              f"({report.lessons / elapsed if elapsed else 0:.0f} уроков/с)", flush=True)
+
+    db = SessionLocal()
+    try:
+        with open(path, encoding="utf-8") as f:
+            if file_format == "json":
+                records = crud_bulk.iter_tree_records(json.load(f))
+            else:
+                records = crud_bulk.iter_ndjson_records(f)
+            report = crud_bulk.import_content(db, records, atomic=atomic, batch_size=batch_size, progress=report_progress)
+    except CrudException as e:
+        print(f"Ошибка импорта: {e.message}")
+        return 1
+    finally:
+        db.close()
+
+    print(f"Импорт завершен за {time.monotonic() - started:.1f} с: "
+          f"дисциплин {report.disciplines}, модулей {report.modules}, уроков {report.lessons}, "
+          f"пропущено существующих уроков {report.skipped_lessons}, ошибок {report.failed_records}.")
+    for error in report.errors:
+        print(f"  {error}")
+    return 0 if not report.failed_records else 2
+
+def run_export(path: str) -> int:
+    db = SessionLocal()
+    count = 0
+    try:
+        with open(path, "w", encoding="utf-8") if path != "-" else sys.stdout as out:
+            for record in crud_bulk.iter_content_records(db):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        db.close()
+    print(f"Экспортировано записей: {count}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт и экспорт учебного контента.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Импортировать контент из NDJSON или JSON-дерева дисциплин.")
+    import_parser.add_argument("path", type=str, help="Путь к файлу.")
+    import_parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson", help="Формат файла.")
+    import_parser.add_argument("--incremental", action="store_true", help="Фиксировать каждый пакет и пропускать ошибочные записи (по умолчанию - все или ничего).")
+    import_parser.add_argument("--batch-size", type=int, default=constants.BULK_IMPORT_BATCH_SIZE, help="Уроков в одном пакете.")
+
+    export_parser = subparsers.add_parser("export", help="Экспортировать весь контент в NDJSON.")
+    export_parser.add_argument("path", type=str, help="Путь к файлу ('-' для stdout).")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        sys.exit(run_import(args.path, args.format, atomic=not args.incremental, batch_size=args.batch_size))
+    sys.exit(run_export(args.path))
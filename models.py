@@ -3,14 +3,15 @@ from sqlalchemy import (
     Column, Integer, String, Boolean, DateTime, ForeignKey, 
     Enum as DBEnum, Text, UniqueConstraint
 )
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func 
+from sqlalchemy.orm import relationship, column_property, deferred, validates
+from sqlalchemy.sql import func, case
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Enum, Float, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, DateTime, Enum, Float, Table, JSON, Date, BigInteger, Index, DDL, event
 from sqlalchemy.sql import func
 from datetime import datetime
 
 from database import Base
+from app.crud.constants import THEORY_INLINE_MAX_BYTES
 
 # --- Определения Enum ---
 class LessonBlockType(enum.Enum):
@@ -27,6 +28,11 @@ class QuestionType(enum.Enum):
     # FIND_ELEMENTS = "find_elements"
 
 
+def utf8_size(text):
+    """Длина текста в байтах UTF-8 (None для None) - в этих единицах считаются Range теории"""
+    return len(text.encode("utf-8")) if text is not None else None
+
+
 # --- Модель Пользователя ---
 class User(Base):
     __tablename__ = "users"
@@ -92,7 +98,11 @@ class Discipline(Base):
 
 class Module(Base):
     __tablename__ = "modules"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Постраничная выборка модулей дисциплины по (order, id)
+        Index('ix_modules_discipline_order_id', 'discipline_id', 'order', 'id'),
+        {'extend_existing': True}
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -113,7 +123,11 @@ class Module(Base):
 
 class Lesson(Base):
     __tablename__ = "lessons"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Постраничная выборка уроков модуля по (order, id)
+        Index('ix_lessons_module_order_id', 'module_id', 'order', 'id'),
+        {'extend_existing': True}
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -152,12 +166,22 @@ class LessonBlock(Base):
     order_in_lesson = Column(Integer, nullable=False, default=0)
     block_type = Column(DBEnum(LessonBlockType), nullable=False)
 
-    theory_text = Column(Text, nullable=True)
+    # Текст теории (бывает в мегабайтах) не грузится с блоком: в JSON урока идет theory_inline,
+    # длинный текст читается по частям через /lessons/blocks/{b_id}/theory
+    theory_text = deferred(Column(Text, nullable=True))
+    theory_size = Column(Integer, nullable=True) # Длина theory_text в байтах UTF-8
+    theory_inline = column_property(case((theory_size <= THEORY_INLINE_MAX_BYTES, theory_text), else_=None))
+    theory_truncated = column_property(func.coalesce(theory_size, 0) > THEORY_INLINE_MAX_BYTES) # Не встроена в theory_inline
     questions = relationship("Question", back_populates="lesson_block", cascade="all, delete-orphan")
 
     lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
     lesson = relationship("Lesson", back_populates="blocks")
 
+    @validates("theory_text")
+    def _set_theory_size(self, key, value):
+        self.theory_size = utf8_size(value)
+        return value
+
     def __repr__(self):
         return f"<LessonBlock(id={self.id}, type='{self.block_type.value}', order={self.order_in_lesson})>"
 
@@ -172,6 +196,12 @@ class Question(Base):
     correct_answer_text = Column(String, nullable=True) 
     general_explanation = Column(Text, nullable=True) 
 
+    # Настройки проверки FILL_IN_BLANK: дополнительные допустимые формы ответа,
+    # допустимое число опечаток (None - значение по умолчанию) и порядок слов
+    accepted_answers = Column(JSON, nullable=True)
+    answer_max_typos = Column(Integer, nullable=True)
+    answer_ignore_word_order = Column(Boolean, default=False, nullable=False)
+
     lesson_block_id = Column(Integer, ForeignKey("lesson_blocks.id"), nullable=False)
     lesson_block = relationship("LessonBlock", back_populates="questions")
 
@@ -208,7 +238,7 @@ class UserLessonProgress(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
     
-    completed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     attempts = Column(Integer, default=1, nullable=False)  # Количество попыток прохождения урока
     
     # Отношения для удобного доступа
@@ -223,6 +253,8 @@ class UserQuestionProgress(Base):
     __tablename__ = "user_question_progress"
     __table_args__ = (
         UniqueConstraint('user_id', 'question_id', name='_user_question_uc'),
+        # Очередь повторения: вопросы пользователя, срок которых наступил, - диапазон этого индекса
+        Index('ix_user_question_progress_user_due', 'user_id', 'due_at'),
         {'extend_existing': True}
     )
 
@@ -231,11 +263,203 @@ class UserQuestionProgress(Base):
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     
     is_correct = Column(Boolean, default=False, nullable=False)
-    answered_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    answered_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    # Интервальное повторение (SM-2): пересчитывается при каждом ответе
+    ease = Column(Float, server_default="2.5", nullable=False)
+    interval_days = Column(Float, server_default="0", nullable=False)
+    repetitions = Column(Integer, server_default="0", nullable=False) # Правильных ответов подряд
+    due_at = Column(DateTime(timezone=True), nullable=True) # NULL - вопрос не запланирован
     
     # Отношения для удобного доступа
     user = relationship("User", back_populates="question_progress")
     question = relationship("Question")
 
     def __repr__(self):
-        return f"<UserQuestionProgress(user_id={self.user_id}, question_id={self.question_id}, is_correct={self.is_correct})>"
\ No newline at end of file
+        return f"<UserQuestionProgress(user_id={self.user_id}, question_id={self.question_id}, is_correct={self.is_correct})>"
+
+# --- Модель для "продолжить обучение" ---
+class UserResumePointer(Base):
+    """
+    Следующий урок дисциплины для пользователя. Обновляется при завершении урока,
+    поэтому "где я остановился" - чтение по ключу (user_id, discipline_id).
+    Внешних ключей на модуль и урок нет: указатель на удаленный урок отбрасывается при чтении.
+    """
+    __tablename__ = "user_resume_pointers"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    discipline_id = Column(Integer, ForeignKey("disciplines.id"), primary_key=True)
+    module_id = Column(Integer, nullable=True)
+    lesson_id = Column(Integer, nullable=True) # NULL - все уроки дисциплины пройдены
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<UserResumePointer(user_id={self.user_id}, discipline_id={self.discipline_id}, lesson_id={self.lesson_id})>"
+
+# --- Модели для инкрементальной статистики админ-панели ---
+class AnswerAttempt(Base):
+    """
+    Попытка ответа на вопрос. Таблица только дополняется; последнее состояние пары
+    (пользователь, вопрос) выводится из нее в user_question_progress.
+    Внешних ключей нет, чтобы старые интервалы (партиции) можно было архивировать
+    независимо от изменений контента.
+    """
+    __tablename__ = "answer_attempts"
+    __table_args__ = (
+        Index('ix_answer_attempts_user_answered', 'user_id', 'answered_at'),
+        Index('ix_answer_attempts_question_answered', 'question_id', 'answered_at'),
+        {'extend_existing': True}
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    question_id = Column(Integer, nullable=False)
+    is_correct = Column(Boolean, nullable=False)
+    answer = Column(JSON, nullable=True) # Ответ в том виде, в каком его прислал пользователь
+    answered_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<AnswerAttempt(id={self.id}, user_id={self.user_id}, question_id={self.question_id}, is_correct={self.is_correct})>"
+
+
+class XpEvent(Base):
+    """Начисление XP. Таблица только дополняется; по ней строятся рейтинги по дисциплинам и за неделю."""
+    __tablename__ = "xp_events"
+    __table_args__ = (
+        Index('ix_xp_events_awarded_user', 'awarded_at', 'user_id'),
+        Index('ix_xp_events_discipline_user', 'discipline_id', 'user_id'),
+        {'extend_existing': True}
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    discipline_id = Column(Integer, nullable=True) # Дисциплина, в которой заработан XP
+    amount = Column(Integer, nullable=False)
+    awarded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<XpEvent(user_id={self.user_id}, discipline_id={self.discipline_id}, amount={self.amount})>"
+
+
+class StatCounter(Base):
+    """Накопительный счетчик, обновляемый путями записи (сверяется периодически)."""
+    __tablename__ = "stat_counters"
+    __table_args__ = {'extend_existing': True}
+
+    key = Column(String, primary_key=True)
+    value = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True)
+
+    def __repr__(self):
+        return f"<StatCounter(key='{self.key}', value={self.value})>"
+
+
+class StatDaily(Base):
+    """Дневной счетчик событий (завершения уроков, ответы, активные ученики)."""
+    __tablename__ = "stat_daily"
+    __table_args__ = {'extend_existing': True}
+
+    day = Column(Date, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<StatDaily(day={self.day}, key='{self.key}', value={self.value})>"
+
+
+class StatDailyLearner(Base):
+    """Отметка активности ученика за день - для подсчета уникальных активных учеников."""
+    __tablename__ = "stat_daily_learners"
+    __table_args__ = {'extend_existing': True}
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+
+class AnalyticsRollup(Base):
+    """Агрегат событий обучения за часовой или дневной интервал по дисциплине, модулю, уроку или вопросу."""
+    __tablename__ = "analytics_rollups"
+    __table_args__ = {'extend_existing': True}
+
+    bucket = Column(String, primary_key=True) # "hour" или "day"
+    scope = Column(String, primary_key=True) # "discipline", "module", "lesson", "question"
+    scope_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+
+    completions = Column(BigInteger, default=0, nullable=False)
+    answers = Column(BigInteger, default=0, nullable=False)
+    correct_answers = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<AnalyticsRollup(bucket='{self.bucket}', scope='{self.scope}', scope_id={self.scope_id}, bucket_start={self.bucket_start})>"
+
+
+class AnalyticsWatermark(Base):
+    """Отметка, до которой события источника уже свернуты в analytics_rollups."""
+    __tablename__ = "analytics_watermarks"
+    __table_args__ = {'extend_existing': True}
+
+    source = Column(String, primary_key=True) # "lesson_completions" или "question_answers"
+    high_water = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<AnalyticsWatermark(source='{self.source}', high_water={self.high_water})>"
+
+
+class QuestionStats(Base):
+    """Показатели трудности вопроса, пересчитываемые пакетной задачей."""
+    __tablename__ = "question_stats"
+    __table_args__ = {'extend_existing': True}
+
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), nullable=False, index=True)
+    funnel_position = Column(Integer, nullable=False) # Порядок вопроса в уроке, с 0
+
+    answers = Column(Integer, default=0, nullable=False)
+    correct_answers = Column(Integer, default=0, nullable=False)
+    learners = Column(Integer, default=0, nullable=False)
+    p_value = Column(Float, nullable=True) # Доля правильных ответов
+    discrimination = Column(Float, nullable=True) # Точечно-бисериальная корреляция с остальными ответами
+    reach_rate = Column(Float, nullable=True) # Доля учеников урока, дошедших до вопроса
+    drop_off_rate = Column(Float, nullable=True) # Доля ответивших на предыдущий вопрос, но не на этот
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<QuestionStats(question_id={self.question_id}, p_value={self.p_value}, discrimination={self.discrimination})>"
+
+
+# --- Полнотекстовый поиск (SQLite FTS5) ---
+# Индексы external content: текст хранится только в таблицах контента, FTS5 держит словарь и позиции.
+# Триггеры обновляют индекс при любой записи - ORM, пакетный импорт, дифф вопросов, каскадное удаление.
+# Правильные ответы (correct_answer_text, варианты) не индексируются, чтобы поиск их не раскрывал.
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+SEARCH_INDEXES = (
+    # (FTS-таблица, таблица контента, индексируемые столбцы)
+    ("lessons_fts", "lessons", ("title",)),
+    ("lesson_blocks_fts", "lesson_blocks", ("theory_text",)),
+    ("questions_fts", "questions", ("text", "general_explanation")),
+)
+
+def search_index_ddl(fts_table: str, content_table: str, columns) -> list:
+    """DDL виртуальной таблицы FTS5 и триггеров синхронизации с таблицей контента"""
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {fts_table}({fts_table}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert = f"INSERT INTO {fts_table}(rowid, {names}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({names}, content='{content_table}', "
+        f"content_rowid='id', tokenize='{SEARCH_TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {names} ON {content_table} BEGIN {delete} {insert} END",
+    ]
+
+for _fts_table, _content_table, _columns in SEARCH_INDEXES:
+    for _statement in search_index_ddl(_fts_table, _content_table, _columns):
+        event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    event.listen(Base.metadata, "before_drop", DDL(f"DROP TABLE IF EXISTS {_fts_table}").execute_if(dialect="sqlite"))
+
+# Ревизия контента (ETag) увеличивается в каждой сессии SessionLocal, изменившей контент: импорт после
+# определения моделей регистрирует обработчики в любом процессе, который пишет в базу
+from app.crud import crud_content_revision  # noqa: E402,F401
@@ -1,10 +1,11 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr, Field, validator
+from pydantic import AliasChoices, BaseModel, EmailStr, Field, model_validator, validator
 from typing import Optional, List, Union, Any, Dict
-from datetime import datetime
+from datetime import date, datetime
 import enum
 
 from models import LessonBlockType, QuestionType
+from app.crud.constants import FILL_IN_BLANK_MAX_TYPOS_LIMIT
 
 # --- Вспомогательные для CRUD вложенных сущностей ---
 class IdOnly(BaseModel):
@@ -74,6 +75,10 @@ class QuestionBase(BaseModel):
     question_type: QuestionType
     general_explanation: Optional[str] = None
     correct_answer_text: Optional[str] = None
+    # Только для FILL_IN_BLANK
+    accepted_answers: Optional[List[str]] = None
+    answer_max_typos: Optional[int] = Field(None, ge=0, le=FILL_IN_BLANK_MAX_TYPOS_LIMIT)
+    answer_ignore_word_order: bool = False
 
 class QuestionCreate(QuestionBase):
     options: List[QuestionOptionCreate] = Field(default_factory=list)
@@ -118,10 +123,23 @@ class LessonBlockUpdate(BaseModel):
 class LessonBlock(LessonBlockBase):
     id: int
     lesson_id: int
-    theory_text: Optional[str] = None
+    # Из ORM берется theory_inline: длинная теория не встраивается (None и theory_truncated),
+    # ее отдает /lessons/blocks/{id}/theory
+    theory_text: Optional[str] = Field(None, validation_alias=AliasChoices("theory_inline", "theory_text"))
+    theory_size: Optional[int] = None # Длина теории в байтах UTF-8 - единицы Range
+    theory_truncated: bool = False # Теория есть, но длиннее THEORY_INLINE_MAX_BYTES и в theory_text не встроена
     questions: List[Question] = []
     model_config = {"from_attributes": True}
 
+class LessonBlockAdmin(LessonBlock):
+    # Админке нужен полный текст: theory_text - вся теория, урезанной она не бывает
+    theory_text: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _full_theory(self):
+        self.theory_truncated = False
+        return self
+
 # --- Lesson ---
 class LessonBase(BaseModel):
     title: str = Field(..., min_length=1)
@@ -179,6 +197,58 @@ class Module(ModuleBase):
     updated_at: Optional[datetime] = None
     model_config = {"from_attributes": True}
 
+# --- Оглавление модуля: без теории, текстов вопросов и вариантов ---
+class LessonBlockOutline(BaseModel):
+    id: int
+    order_in_lesson: int
+    block_type: LessonBlockType
+    questions_count: int = 0
+    model_config = {"from_attributes": True}
+
+class LessonOutline(BaseModel):
+    id: int
+    title: str
+    order: int
+    is_completed_by_user: bool = False
+    blocks: List[LessonBlockOutline] = []
+    model_config = {"from_attributes": True}
+
+class ModuleOutline(BaseModel):
+    id: int
+    discipline_id: int
+    title: str
+    order: int
+    progress: Optional[ModuleProgress] = None
+    lessons: List[LessonOutline] = []
+    model_config = {"from_attributes": True}
+
+# --- Схемы для полнотекстового поиска ---
+class SearchKind(str, enum.Enum):
+    LESSON = "lesson"
+    THEORY = "theory"
+    QUESTION = "question"
+
+class SearchHit(BaseModel):
+    kind: SearchKind
+    id: int # id урока, блока теории или вопроса - по kind
+    lesson_id: int
+    lesson_title: str
+    snippet: str # HTML: текст экранирован, совпадения в <mark>
+    rank: float # bm25 с весом вида: меньше - выше в выдаче
+
+# --- Схемы для подсказок по названиям ---
+class SuggestKind(str, enum.Enum):
+    DISCIPLINE = "discipline"
+    MODULE = "module"
+    LESSON = "lesson"
+
+class SuggestItem(BaseModel):
+    kind: SuggestKind
+    id: int
+    title: str
+    discipline_id: Optional[int] = None
+    module_id: Optional[int] = None
+
 # --- Discipline ---
 class DisciplineBase(BaseModel):
     title: str = Field(..., min_length=1) # Уникальность будет проверяться в CRUD
@@ -212,6 +282,18 @@ class UserLessonProgress(UserLessonProgressBase):
     attempts: int
     model_config = {"from_attributes": True}
 
+# --- Схемы для "продолжить обучение" ---
+class ResumePointer(BaseModel):
+    discipline_id: int
+    module_id: Optional[int] = None
+    lesson_id: Optional[int] = None # Следующий урок; None - дисциплина пройдена
+    lesson_title: Optional[str] = None
+    finished: bool = False
+    updated_at: datetime
+
+class ResumePointersRebuildReport(BaseModel):
+    rows: int
+
 # --- Схемы для ответов на вопросы ---
 class QuestionAnswerSubmit(BaseModel):
     question_id: int
@@ -232,4 +314,162 @@ class UserLessonProgressResponse(BaseModel):
     attempts: int
     xp_earned_for_this_completion: int
     current_total_user_xp: int
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+# --- Схемы для массового импорта/экспорта контента ---
+class ContentFileFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+class ContentImportModule(ModuleBase):
+    discipline: str = Field(..., min_length=1)
+
+class ContentImportLesson(LessonBase):
+    discipline: str = Field(..., min_length=1)
+    module: str = Field(..., min_length=1)
+    blocks: List[LessonBlockCreate] = Field(default_factory=list)
+
+class ContentImportReport(BaseModel):
+    records: int = 0
+    disciplines: int = 0
+    modules: int = 0
+    lessons: int = 0
+    blocks: int = 0
+    questions: int = 0
+    options: int = 0
+    skipped_lessons: int = 0
+    failed_records: int = 0
+    errors: List[str] = Field(default_factory=list)
+
+# --- Схемы для статистики админ-панели ---
+class DailyStatistics(BaseModel):
+    day: date
+    active_learners: int
+    completions: int
+    answers: int
+    correct_answers: int
+
+class QuestionTypeAccuracy(BaseModel):
+    answers: int
+    correct_answers: int
+    accuracy_percentage: int
+
+class AdminStatistics(BaseModel):
+    active_users: int
+    total_lessons: int
+    completed_lessons_percentage: int
+    daily: List[DailyStatistics] = []
+    accuracy_by_question_type: Dict[str, QuestionTypeAccuracy] = {}
+    reconciled_at: Optional[datetime] = None
+
+# --- Схемы для аналитики обучения ---
+class AnalyticsBucket(str, enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class AnalyticsScope(str, enum.Enum):
+    DISCIPLINE = "discipline"
+    MODULE = "module"
+    LESSON = "lesson"
+    QUESTION = "question"
+
+class AnalyticsExportFormat(str, enum.Enum):
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+class AnalyticsPoint(BaseModel):
+    bucket_start: datetime
+    completions: int
+    answers: int
+    correct_answers: int
+    accuracy_percentage: int
+
+class AnalyticsScopeTotal(BaseModel):
+    scope_id: int
+    completions: int
+    answers: int
+    correct_answers: int
+    accuracy_percentage: int
+
+class AnalyticsRollupReport(BaseModel):
+    processed_events: Dict[str, int]
+    high_water: Dict[str, datetime]
+
+# --- Схемы для статистики трудности вопросов ---
+class QuestionStatsOrder(str, enum.Enum):
+    P_VALUE = "p_value"
+    DISCRIMINATION = "discrimination"
+    DROP_OFF_RATE = "drop_off_rate"
+    ANSWERS = "answers"
+
+class QuestionStatsRead(BaseModel):
+    question_id: int
+    lesson_id: int
+    funnel_position: int
+    answers: int
+    correct_answers: int
+    learners: int
+    p_value: Optional[float] = None
+    discrimination: Optional[float] = None
+    reach_rate: Optional[float] = None
+    drop_off_rate: Optional[float] = None
+    computed_at: datetime
+
+    model_config = {"from_attributes": True}
+
+class QuestionStatsRecomputeReport(BaseModel):
+    questions: int
+
+# --- Схемы для истории попыток ответа ---
+class AnswerAttempt(BaseModel):
+    id: int
+    question_id: int
+    is_correct: bool
+    answer: Any = None
+    answered_at: datetime
+
+    model_config = {"from_attributes": True}
+
+# --- Схемы для очереди повторения ---
+class ReviewItem(BaseModel):
+    question_id: int
+    lesson_id: int
+    due_at: datetime
+    interval_days: float # Интервал, после которого вопрос снова попал в очередь
+    repetitions: int # Правильных ответов подряд
+    ease: float
+    is_correct: bool # Последний ответ
+    answered_at: datetime
+
+class AnswerAttemptsPurgeReport(BaseModel):
+    deleted: int
+
+class QuestionProgressRebuildReport(BaseModel):
+    rows: int
+
+# --- Схемы для рейтингов ---
+class LeaderboardType(str, enum.Enum):
+    GLOBAL = "global"
+    WEEKLY = "weekly"
+    DISCIPLINE = "discipline"
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    full_name: Optional[str] = None
+    xp: int
+
+class LeaderboardPosition(BaseModel):
+    rank: int
+    xp: int
+    total: int
+    entries: List[LeaderboardEntry]
+
+# --- Схемы для потоковой выгрузки пользователей и прогресса ---
+class RowExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ProgressExportKind(str, enum.Enum):
+    LESSONS = "lessons"
+    QUESTIONS = "questions"
@@ -8,6 +8,8 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from core import metrics
+
 # --- Загрузка переменных окружения ---
 # Определяем путь к корневой директории проекта.
 # __file__ это путь к текущему файлу (security.py)
@@ -69,10 +71,12 @@ if not SECRET_KEY:
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.track_password_hash("verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with metrics.track_password_hash("hash"):
+        return pwd_context.hash(password)
 
 # --- Новые функции для JWT ---
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -0,0 +1,109 @@
+"""
+Общие фикстуры тестов API.
+
+Приложение поднимается с APP_ENV=test: QueryBudgetMiddleware работает в строгом режиме,
+и превышение бюджета маршрута или N+1 (core/query_budget.py) роняет тест, вызвавший запрос.
+База - временный файл SQLite, схема создается из моделей.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Окружение задается до импорта приложения: database.py и main.py читают его при импорте
+_TMP_DIR = tempfile.mkdtemp(prefix="lexico_tests_")
+os.environ["APP_ENV"] = "test"
+os.environ["DB_NAME"] = str(Path(_TMP_DIR) / "test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from fastapi.testclient import TestClient
+
+import main
+import models
+import security
+from core import query_budget
+from database import SessionLocal, engine
+
+
+@pytest.fixture(scope="session")
+def client():
+    models.Base.metadata.create_all(bind=engine)
+    with TestClient(main.app) as test_client:
+        yield test_client
+    models.Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db(client):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def content(client):
+    """Дисциплина из 2 модулей по 4 урока; в каждом уроке блок теории и блок из 2 вопросов с 3 вариантами."""
+    session = SessionLocal()
+    try:
+        discipline = models.Discipline(title="Гражданское право", description="Тестовая дисциплина")
+        for module_order in range(2):
+            module = models.Module(title=f"Модуль {module_order + 1}", order=module_order, discipline=discipline)
+            for lesson_order in range(4):
+                lesson = models.Lesson(title=f"Урок {module_order + 1}.{lesson_order + 1}", order=lesson_order, module=module)
+                models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.THEORY,
+                                   theory_text="Договор - соглашение двух или нескольких лиц.")
+                block = models.LessonBlock(lesson=lesson, order_in_lesson=1, block_type=models.LessonBlockType.EXERCISE)
+                for question_number in range(2):
+                    question = models.Question(lesson_block=block, text=f"Вопрос {question_number + 1}",
+                                               question_type=models.QuestionType.SINGLE_CHOICE)
+                    for option_number in range(3):
+                        models.QuestionOption(question=question, text=f"Вариант {option_number + 1}", is_correct=option_number == 0)
+        session.add(discipline)
+        session.commit()
+        return {
+            "discipline_id": discipline.id,
+            "module_ids": [module.id for module in discipline.modules],
+            "lesson_ids": [lesson.id for module in discipline.modules for lesson in module.lessons],
+        }
+    finally:
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    session = SessionLocal()
+    try:
+        user = models.User(email="learner@example.com", hashed_password=security.get_password_hash("password"),
+                           is_active=True, is_superuser=True)
+        session.add(user)
+        session.commit()
+    finally:
+        session.close()
+    return {"Authorization": f"Bearer {security.create_access_token(data={'sub': 'learner@example.com'})}"}
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Проверка числа SQL-запросов
+
+    Вызовы CRUD - блоком (core.query_budget.assert_max_queries):
+        with max_queries(5):
+            crud_lessons.get_lesson(db, lesson_id)
+    Ответы API - по заголовку X-Query-Count (запросы, выполненные до отправки заголовков):
+        max_queries.response(client.get("/disciplines/", headers=auth_headers), 12)
+    """
+    class _MaxQueries:
+        def __call__(self, limit: int, n_plus_one_threshold: int = None):
+            return query_budget.assert_max_queries(limit, n_plus_one_threshold)
+
+        @staticmethod
+        def response(response, limit: int) -> int:
+            count = int(response.headers[query_budget.QUERY_COUNT_HEADER])
+            assert count <= limit, f"{response.request.method} {response.request.url.path}: {count} SQL statements, expected at most {limit}"
+            return count
+
+    return _MaxQueries()
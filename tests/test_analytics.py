@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import models
+from app.crud import crud_analytics, crud_answer_attempts
+
+
+@pytest.fixture
+def rollup_db():
+    # Отдельная база: периодическая свертка приложения не должна сдвигать отметки посреди теста
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    session = Session(engine)
+    lesson = models.Lesson(title="Урок", order=0, module=models.Module(
+        title="Модуль", order=0, discipline=models.Discipline(title="Дисциплина")))
+    block = models.LessonBlock(lesson=lesson, order_in_lesson=0, block_type=models.LessonBlockType.EXERCISE)
+    question = models.Question(lesson_block=block, text="Вопрос", question_type=models.QuestionType.SINGLE_CHOICE)
+    session.add(question)
+    session.commit()
+    yield session, question.id
+    session.close()
+    engine.dispose()
+
+
+def _answers_total(db) -> int:
+    rollup = models.AnalyticsRollup
+    return db.execute(select(func.coalesce(func.sum(rollup.answers), 0)).where(
+        rollup.bucket == crud_analytics.BUCKET_DAY, rollup.scope == crud_analytics.SCOPE_DISCIPLINE
+    )).scalar()
+
+
+def _record_answers(db, question_id: int, answered_at: datetime, count: int) -> None:
+    for number in range(count):
+        crud_answer_attempts.record_attempt(db, 1, question_id, number % 2 == 0, None, answered_at)
+    db.commit()
+
+
+def test_concurrent_rollup_does_not_count_events_twice(rollup_db, monkeypatch):
+    db, question_id = rollup_db
+    answered_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    _record_answers(db, question_id, answered_at, 3)
+
+    # Вторая свертка прочитала отметки до того, как первая их записала или сдвинула (другой воркер)
+    stale = crud_analytics._stored_watermarks(db)
+    crud_analytics.run_rollup(db)
+    assert _answers_total(db) == 3
+    with monkeypatch.context() as patch:
+        patch.setattr(crud_analytics, "_stored_watermarks", lambda session: stale)
+        report = crud_analytics.run_rollup(db)
+    assert report["processed_events"][crud_analytics.SOURCE_ANSWERS] == 0
+    assert _answers_total(db) == 3
+
+    # То же для уже существующей отметки: новые события позже нее считаются один раз
+    db.execute(update(models.AnalyticsWatermark).values(high_water=answered_at + timedelta(seconds=30)))
+    db.commit()
+    _record_answers(db, question_id, answered_at + timedelta(minutes=1), 2)
+    stale = crud_analytics._stored_watermarks(db)
+    crud_analytics.run_rollup(db)
+    assert _answers_total(db) == 5
+    with monkeypatch.context() as patch:
+        patch.setattr(crud_analytics, "_stored_watermarks", lambda session: stale)
+        report = crud_analytics.run_rollup(db)
+    assert report["processed_events"][crud_analytics.SOURCE_ANSWERS] == 0
+    assert _answers_total(db) == 5
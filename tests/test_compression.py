@@ -0,0 +1,40 @@
+import pytest
+
+from core import conditional
+
+
+@pytest.fixture
+def long_theory_block(client, content, auth_headers):
+    theory = "Статья 1. Гражданское законодательство. " * 200
+    created = client.post(f"/admin/lessons/{content['lesson_ids'][1]}/blocks/", headers=auth_headers,
+                          json={"order_in_lesson": 5, "block_type": "theory", "theory_text": theory})
+    block_id = created.json()["id"]
+    yield block_id, theory.encode("utf-8")
+    client.delete(f"/admin/blocks/{block_id}", headers=auth_headers)
+
+
+def test_compressed_theory_has_its_own_etag_and_no_ranges(client, auth_headers, long_theory_block):
+    block_id, theory = long_theory_block
+    url = f"/lessons/blocks/{block_id}/theory"
+    identity = client.get(url, headers={**auth_headers, "Accept-Encoding": "identity"})
+    assert identity.headers["Accept-Ranges"] == "bytes"
+
+    compressed = client.get(url, headers={**auth_headers, "Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.content == theory
+    assert "Accept-Ranges" not in compressed.headers
+    assert compressed.headers["ETag"] == conditional.encoded_etag(identity.headers["ETag"], "gzip")
+
+    # If-None-Match с ETag сжатого варианта - та же ревизия, 304
+    revalidated = client.get(url, headers={**auth_headers, "Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    # Докачка с If-Range от сжатого ответа получает тело целиком, а не несжатые байты с середины
+    resumed = client.get(url, headers={**auth_headers, "Accept-Encoding": "identity", "Range": "bytes=100-",
+                                       "If-Range": compressed.headers["ETag"]})
+    assert resumed.status_code == 200
+    assert resumed.content == theory
+    partial = client.get(url, headers={**auth_headers, "Accept-Encoding": "identity", "Range": "bytes=100-",
+                                       "If-Range": identity.headers["ETag"]})
+    assert partial.status_code == 206
+    assert partial.content == theory[100:]
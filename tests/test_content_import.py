@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+
+def _import_tree(client, auth_headers, tree, atomic=True):
+    return client.post("/admin/import/content", params={"file_format": "json", "atomic": atomic}, headers=auth_headers,
+                       files={"file": ("content.json", json.dumps(tree, ensure_ascii=False).encode("utf-8"))})
+
+
+@pytest.mark.parametrize("tree, message", [
+    ([1, 2], "Запись 1: запись должна быть объектом JSON."),
+    (5, "JSON-дерево должно быть объектом дисциплины или списком дисциплин."),
+    ({"title": "Трудовое право", "modules": "Трудовой договор"}, "Запись 1: поле modules должно быть списком."),
+    ({"title": "Трудовое право", "modules": [{"title": "Трудовой договор", "lessons": [None]}]},
+     "Запись 3: запись должна быть объектом JSON."),
+])
+def test_malformed_tree_is_rejected_with_400(client, auth_headers, tree, message):
+    response = _import_tree(client, auth_headers, tree)
+    assert response.status_code == 400
+    assert response.json()["detail"] == message
+
+
+def test_malformed_entries_are_reported_per_record_without_atomic(client, auth_headers):
+    response = _import_tree(client, auth_headers, [1, "Трудовое право"], atomic=False)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["failed_records"] == 2
+    assert report["errors"] == ["Запись 1: запись должна быть объектом JSON.", "Запись 2: запись должна быть объектом JSON."]
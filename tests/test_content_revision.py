@@ -0,0 +1,25 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_cli_import_changes_content_etag(client, content, auth_headers, tmp_path):
+    etag = client.get("/disciplines/", headers=auth_headers).headers["ETag"]
+    assert client.get("/disciplines/", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    # manage_content.py - отдельный процесс без main.py: ревизию увеличивают обработчики, зарегистрированные models.py
+    path = tmp_path / "content.json"
+    path.write_text(json.dumps({
+        "title": "Уголовное право",
+        "modules": [{"title": "Общая часть", "order": 0, "lessons": [{"title": "Понятие преступления", "order": 0}]}],
+    }, ensure_ascii=False), encoding="utf-8")
+    result = subprocess.run([sys.executable, "manage_content.py", "import", str(path), "--format", "json"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    after = client.get("/disciplines/", headers={**auth_headers, "If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
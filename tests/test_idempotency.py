@@ -0,0 +1,82 @@
+import hashlib
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+import main
+import models
+import security
+from core.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+
+
+@pytest.fixture
+def question_id(db, content):
+    return db.scalar(
+        select(models.Question.id)
+        .join(models.LessonBlock, models.LessonBlock.id == models.Question.lesson_block_id)
+        .where(models.LessonBlock.lesson_id == content["lesson_ids"][0])
+        .order_by(models.Question.id)
+    )
+
+
+def _body(question_id, user_answer=0) -> bytes:
+    # Тело передается готовыми байтами: от них считается отпечаток запроса
+    return json.dumps({"question_id": question_id, "user_answer": user_answer}).encode()
+
+
+def _submit(client, auth_headers, question_id, key, user_answer=0):
+    headers = {**auth_headers, IDEMPOTENCY_HEADER: key, "Content-Type": "application/json"}
+    return client.post(f"/lessons/questions/{question_id}/submit_answer", headers=headers,
+                       content=_body(question_id, user_answer))
+
+
+def _attempts(db, question_id):
+    return db.scalar(select(func.count()).select_from(models.AnswerAttempt).where(models.AnswerAttempt.question_id == question_id))
+
+
+def test_repeated_key_replays_stored_response(client, db, auth_headers, question_id):
+    key = str(uuid.uuid4())
+    first = _submit(client, auth_headers, question_id, key)
+    assert first.status_code == 200
+    assert REPLAYED_HEADER not in first.headers
+    attempts = _attempts(db, question_id)
+
+    replay = _submit(client, auth_headers, question_id, key)
+    assert replay.status_code == 200
+    assert replay.headers[REPLAYED_HEADER] == "true"
+    assert replay.json() == first.json()
+    # Эндпоинт не выполнялся повторно: новой попытки нет
+    assert _attempts(db, question_id) == attempts
+
+
+def test_key_reused_with_other_body_is_rejected(client, auth_headers, question_id):
+    key = str(uuid.uuid4())
+    assert _submit(client, auth_headers, question_id, key).status_code == 200
+    response = _submit(client, auth_headers, question_id, key, user_answer=1)
+    assert response.status_code == 422
+
+
+def test_key_of_pending_request_is_conflict(client, auth_headers, question_id):
+    key = str(uuid.uuid4())
+    path = f"/lessons/questions/{question_id}/submit_answer"
+    identity = security.decode_access_token(auth_headers["Authorization"].removeprefix("Bearer "))
+    # Исходный запрос "еще выполняется": ключ зарезервирован, ответ не сохранен
+    store_key = (identity, "POST", path, key)
+    assert main.idempotency_store.reserve(store_key, hashlib.sha256(_body(question_id)).hexdigest()) is None
+    try:
+        response = _submit(client, auth_headers, question_id, key)
+        assert response.status_code == 409
+    finally:
+        main.idempotency_store.release(store_key)
+
+
+def test_error_responses_are_not_stored(client, auth_headers):
+    key = str(uuid.uuid4())
+    missing_question_id = 10 ** 9
+    first = _submit(client, auth_headers, missing_question_id, key)
+    assert first.status_code == 404
+    retry = _submit(client, auth_headers, missing_question_id, key)
+    assert retry.status_code == 404
+    assert REPLAYED_HEADER not in retry.headers
@@ -0,0 +1,34 @@
+from app.crud import constants
+
+
+def test_long_theory_is_flagged_and_served_in_full_to_admin(client, content, auth_headers):
+    lesson_id = content["lesson_ids"][0]
+    theory = "Статья 1. " * (constants.THEORY_INLINE_MAX_BYTES // 10 + 1)
+    created = client.post(f"/admin/lessons/{lesson_id}/blocks/", headers=auth_headers,
+                          json={"order_in_lesson": 5, "block_type": "theory", "theory_text": theory})
+    assert created.status_code == 201
+    block_id = created.json()["id"]
+
+    try:
+        # Админка отдает полный текст, урок - без длинной теории, но с признаком theory_truncated
+        block = client.get(f"/admin/blocks/{block_id}", headers=auth_headers).json()
+        assert block["theory_text"] == theory
+        assert block["theory_truncated"] is False
+        lesson = client.get(f"/lessons/{lesson_id}", headers=auth_headers).json()
+        lesson_block = next(item for item in lesson["blocks"] if item["id"] == block_id)
+        assert lesson_block["theory_text"] is None
+        assert lesson_block["theory_truncated"] is True
+        assert lesson_block["theory_size"] == len(theory.encode("utf-8"))
+        short_block = next(item for item in lesson["blocks"] if item["theory_text"])
+        assert short_block["theory_truncated"] is False
+
+        sparse = client.get(f"/lessons/{lesson_id}?fields=theory_truncated&depth=1", headers=auth_headers).json()
+        assert {item["id"]: item["theory_truncated"] for item in sparse["blocks"]}[block_id] is True
+
+        # null в PUT очищает теорию при любой длине
+        updated = client.put(f"/admin/blocks/{block_id}", headers=auth_headers, json={"theory_text": None})
+        assert updated.status_code == 200
+        assert updated.json()["theory_text"] is None
+        assert updated.json()["theory_size"] is None
+    finally:
+        client.delete(f"/admin/blocks/{block_id}", headers=auth_headers)
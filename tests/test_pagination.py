@@ -0,0 +1,60 @@
+import pytest
+
+import models
+from app.crud.utils import decode_cursor, encode_cursor, paginate
+from app.exceptions.crud_exceptions import InvalidInputException
+
+
+def _walk(fetch_page):
+    items, cursor, pages = [], None, 0
+    while True:
+        page_items, cursor = fetch_page(cursor)
+        items.extend(page_items)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor([3, 17]), 2) == [3, 17]
+
+
+def test_cursor_pages_break_ties_by_id(db, content):
+    # Уроки двух модулей: у каждого значения order - по два урока, порядок внутри пары задает id
+    query = db.query(models.Lesson).filter(models.Lesson.module_id.in_(content["module_ids"]))
+    expected = [lesson.id for lesson in sorted(query.all(), key=lambda lesson: (lesson.order, lesson.id))]
+
+    def fetch_page(cursor):
+        page = paginate(query, [models.Lesson.order, models.Lesson.id], limit=3, cursor=cursor)
+        return [lesson.id for lesson in page.items], page.next_cursor
+
+    items, pages = _walk(fetch_page)
+    assert items == expected
+    assert pages == 3
+
+
+def test_cursor_pages_through_api(client, content, auth_headers):
+    module_id = content["module_ids"][0]
+
+    def fetch_page(cursor):
+        params = {"l": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/modules/{module_id}/lessons/", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        return [lesson["id"] for lesson in response.json()], response.headers.get("X-Next-Cursor")
+
+    items, _ = _walk(fetch_page)
+    assert items == content["lesson_ids"][:4]
+
+
+def test_empty_page_has_no_next_cursor(db):
+    cursor = encode_cursor([0, 1])
+    page = paginate(db.query(models.Lesson), [models.Lesson.order, models.Lesson.id], limit=0, cursor=cursor)
+    assert page == ([], None)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor([1]), encode_cursor(["1", 2]), encode_cursor({"a": 1})])
+def test_malformed_cursor_is_rejected(client, db, content, auth_headers, cursor):
+    with pytest.raises(InvalidInputException):
+        paginate(db.query(models.Lesson), [models.Lesson.order, models.Lesson.id], limit=0, cursor=cursor)
+    response = client.get(f"/modules/{content['module_ids'][0]}/lessons/", params={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+
+from app.crud import crud_disciplines, crud_modules
+from core.query_budget import QueryBudgetExceeded, assert_max_queries
+
+
+def test_content_reads_fit_declared_budgets(client, content, auth_headers, max_queries):
+    discipline_id, module_id = content["discipline_id"], content["module_ids"][0]
+    reads = [
+        ("/disciplines/", 12),
+        (f"/disciplines/{discipline_id}", 12),
+        (f"/disciplines/{discipline_id}/modules/", 11),
+        (f"/modules/{module_id}", 10),
+        (f"/modules/{module_id}/lessons/", 9),
+        (f"/modules/{module_id}/outline", 8),
+        (f"/lessons/{content['lesson_ids'][0]}", 8),
+    ]
+    for path, budget in reads:
+        response = client.get(path, headers=auth_headers)
+        assert response.status_code == 200, path
+        max_queries.response(response, budget)
+
+
+def test_discipline_tree_query_count_does_not_grow_with_lessons(db, content, max_queries):
+    # Прогресс и дерево грузятся по запросу на уровень: 8 уроков и 16 вопросов не дают N+1
+    with max_queries(10, n_plus_one_threshold=3):
+        discipline = crud_disciplines.get_discipline(db, content["discipline_id"], user_id=1)
+        assert all(len(lesson.blocks) == 2 for module in discipline.modules for lesson in module.lessons)
+    with max_queries(8, n_plus_one_threshold=3):
+        crud_modules.get_modules_by_discipline(db, content["discipline_id"], user_id=1)
+
+
+def test_repeated_statement_is_reported_as_n_plus_one(db, content):
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1 suspect x4"):
+        with assert_max_queries(10, n_plus_one_threshold=4):
+            for lesson_id in content["lesson_ids"][:4]:
+                crud_disciplines.get_discipline_by_title(db, f"Урок {lesson_id}")
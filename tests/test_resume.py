@@ -0,0 +1,39 @@
+import json
+
+from sqlalchemy import select
+
+import models
+
+
+def _import(client, auth_headers, lessons):
+    tree = {"title": "Семейное право", "modules": [{"title": "Брак", "order": 0, "lessons": lessons}]}
+    response = client.post("/admin/import/content", params={"file_format": "json"}, headers=auth_headers,
+                           files={"file": ("content.json", json.dumps(tree, ensure_ascii=False).encode("utf-8"))})
+    assert response.status_code == 200, response.text
+
+
+def _resume(client, auth_headers, discipline_id):
+    response = client.get("/users/me/resume", params={"discipline_id": discipline_id}, headers=auth_headers)
+    assert response.status_code == 200
+    return response
+
+
+def test_resume_pointer_follows_content_changes(client, db, auth_headers, max_queries):
+    _import(client, auth_headers, [{"title": "Заключение брака", "order": 0}])
+    discipline_id = db.execute(select(models.Discipline.id).where(models.Discipline.title == "Семейное право")).scalar()
+    first = db.execute(select(models.Lesson.id).where(models.Lesson.title == "Заключение брака")).scalar()
+    assert client.post(f"/users/me/progress/lessons/{first}/complete", headers=auth_headers).status_code == 200
+    assert _resume(client, auth_headers, discipline_id).json()[0]["finished"] is True
+
+    # Новые уроки пройденной дисциплины: указатель снова ведет к первому непройденному
+    _import(client, auth_headers, [{"title": "Прекращение брака", "order": 1}, {"title": "Брачный договор", "order": 2}])
+    pointer = _resume(client, auth_headers, discipline_id).json()[0]
+    assert (pointer["lesson_title"], pointer["finished"]) == ("Прекращение брака", False)
+
+    # Удаленный урок указателя не прячет его: указатель ведет к следующему непройденному
+    assert client.delete(f"/admin/lessons/{pointer['lesson_id']}", headers=auth_headers).status_code == 204
+    response = _resume(client, auth_headers, discipline_id)
+    max_queries.response(response, 4)
+    assert response.json()[0]["lesson_title"] == "Брачный договор"
+
+    client.delete(f"/admin/disciplines/{discipline_id}", headers=auth_headers)
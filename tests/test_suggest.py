@@ -0,0 +1,14 @@
+import inspect
+
+import main
+from app.crud import crud_suggest
+
+
+def test_suggest_runs_in_threadpool_and_rebuilds_cold_index(client, content, auth_headers):
+    # Перестроение холодного индекса - запросы к БД: обработчик не должен выполняться в цикле событий
+    assert not inspect.iscoroutinefunction(main.public_suggest)
+
+    crud_suggest.invalidate()
+    response = client.get("/suggest", params={"q": "гражд"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [(item["kind"], item["id"]) for item in response.json()] == [("discipline", content["discipline_id"])]
@@ -0,0 +1,37 @@
+import pytest
+
+import models
+
+
+@pytest.fixture
+def fill_in_blank_question(client, db, content, auth_headers):
+    """Вопрос FILL_IN_BLANK в отдельном блоке урока; блок удаляется после теста."""
+    block = models.LessonBlock(lesson_id=content["lesson_ids"][-1], order_in_lesson=7,
+                               block_type=models.LessonBlockType.EXERCISE)
+    question = models.Question(lesson_block=block, text="Как называется соглашение сторон?",
+                               question_type=models.QuestionType.FILL_IN_BLANK,
+                               correct_answer_text="гражданско-правовой договор",
+                               accepted_answers=["сделка", "договор по статье 432"],
+                               answer_max_typos=1, answer_ignore_word_order=True)
+    db.add(block)
+    db.commit()
+    yield question.id
+    assert client.delete(f"/admin/blocks/{block.id}", headers=auth_headers).status_code == 204
+
+
+@pytest.mark.parametrize("answer, is_correct", [
+    ("Сделка", True),                          # допустимый вариант, регистр не важен
+    ("гражданско-правовой договор", True),
+    ("гражданско-правовой доовор", True),      # одна опечатка
+    ("гражданско-правовй доовор", False),      # две опечатки
+    ("договор по статье 432", True),
+    ("договор по статье 433", False),          # ошибка в числе опечаткой не считается
+    ("договор гражданско-правовой", True),     # порядок слов не важен
+    ("", False),
+])
+def test_fill_in_blank_answers(client, auth_headers, fill_in_blank_question, answer, is_correct):
+    response = client.post(f"/lessons/questions/{fill_in_blank_question}/submit_answer", headers=auth_headers,
+                           json={"question_id": fill_in_blank_question, "user_answer": answer})
+    assert response.status_code == 200
+    assert response.json()["is_correct"] is is_correct
+    assert response.json()["correct_answer_details"] == {"correct_text_answer": "гражданско-правовой договор"}